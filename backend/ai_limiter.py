@@ -0,0 +1,201 @@
+"""
+Bounded concurrency for blocking AI model calls.
+
+Gemini calls block for seconds, so they run on a dedicated thread pool
+instead of the event loop (or FastAPI's shared threadpool). A semaphore
+caps how many run at once; callers beyond that wait in a bounded queue.
+Each tenant (user id, or client IP for public endpoints) may only have a
+few calls in flight or waiting, so one client cannot take every slot.
+
+A slot is held until the model call's thread actually finishes: a caller
+that is cancelled (client disconnect) stops waiting for the result, but
+the thread keeps running and keeps its slot until it returns.
+
+Queue wait times are recorded and exposed via `metrics()`.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AIBusyError(Exception):
+    """Raised when an AI call is rejected for capacity reasons."""
+
+    def __init__(self, status_code: int, code: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+        self.retry_after = retry_after
+
+
+class AIConcurrencyLimiter:
+    """Semaphore-guarded thread pool with per-tenant caps and a bounded wait queue."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        max_queue: int = 32,
+        per_tenant: int = 2,
+        queue_timeout: float = 30.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.per_tenant = per_tenant
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ai")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        self._tenants: Dict[str, int] = {}
+        self._waiting = 0
+        self._running = 0
+        self._started = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._recent_waits: deque = deque(maxlen=500)
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            # Semaphores are bound to one event loop (only changes in tests)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._semaphore
+
+    def _release_tenant(self, tenant: Optional[str]) -> None:
+        if tenant is None:
+            return
+        with self._lock:
+            self._tenants[tenant] -= 1
+            if self._tenants[tenant] <= 0:
+                del self._tenants[tenant]
+
+    def _finish(self, semaphore: asyncio.Semaphore, tenant: Optional[str]) -> None:
+        """Free the slot of a call whose thread has returned."""
+        semaphore.release()
+        with self._lock:
+            self._running -= 1
+            self._completed += 1
+        self._release_tenant(tenant)
+
+    @staticmethod
+    def _release_if_acquired(semaphore: asyncio.Semaphore) -> Callable[[asyncio.Future], None]:
+        def callback(acquire: asyncio.Future) -> None:
+            if not acquire.cancelled():
+                semaphore.release()
+        return callback
+
+    def _reject(self, status_code: int, code: str, message: str) -> None:
+        with self._lock:
+            self._rejected += 1
+        raise AIBusyError(status_code, code, message, retry_after=max(1.0, self.queue_timeout / 6))
+
+    async def run(self, tenant: Optional[str], fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run `fn(*args)` on the AI thread pool once a slot is free.
+
+        `tenant=None` skips the per-tenant cap and the queue limit; it is for
+        internal callers (background workers) that are already bounded.
+        """
+        semaphore = self._get_semaphore()
+        with self._lock:
+            over_tenant = tenant is not None and self._tenants.get(tenant, 0) >= self.per_tenant
+            over_queue = tenant is not None and semaphore.locked() and self._waiting >= self.max_queue
+        if over_tenant:
+            self._reject(429, "AI_TENANT_BUSY", "Too many analyses in progress for this client; try again shortly")
+        if over_queue:
+            self._reject(503, "AI_BUSY", "AI analysis capacity is exhausted; try again shortly")
+
+        with self._lock:
+            if tenant is not None:
+                self._tenants[tenant] = self._tenants.get(tenant, 0) + 1
+            self._waiting += 1
+        enqueued = time.monotonic()
+        acquire = asyncio.ensure_future(semaphore.acquire())
+        interrupted = False
+        try:
+            # Unlike wait_for, a timeout here never cancels an acquire that has
+            # just succeeded, so no permit can be lost
+            await asyncio.wait((acquire,), timeout=self.queue_timeout)
+        except BaseException:
+            interrupted = True
+            raise
+        finally:
+            acquired = acquire.done() and not acquire.cancelled()
+            if not acquired:
+                # Timed out or cancelled: withdraw, returning a permit granted meanwhile
+                acquire.cancel()
+                acquire.add_done_callback(self._release_if_acquired(semaphore))
+                self._release_tenant(tenant)
+            waited = time.monotonic() - enqueued
+            with self._lock:
+                self._waiting -= 1
+                if acquired:
+                    self._started += 1
+                    self._running += 1
+                    self._wait_total += waited
+                    self._wait_max = max(self._wait_max, waited)
+                    self._recent_waits.append(waited)
+            if acquired and interrupted:
+                # Granted, but the caller was cancelled before it resumed
+                self._finish(semaphore, tenant)
+        if not acquired:
+            self._reject(503, "AI_BUSY", "Timed out waiting for AI analysis capacity; try again shortly")
+
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._finish(semaphore, tenant)
+            raise
+
+        def on_done(_) -> None:
+            try:
+                loop.call_soon_threadsafe(self._finish, semaphore, tenant)
+            except RuntimeError:
+                # Event loop already closed (shutdown); nothing waits on it
+                self._finish(semaphore, tenant)
+
+        # Registered before wrap_future's own callback, so the slot is free
+        # by the time the caller resumes
+        future.add_done_callback(on_done)
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Current load and queue-wait statistics (seconds)."""
+        with self._lock:
+            recent = sorted(self._recent_waits)
+            samples = len(recent)
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "waiting": self._waiting,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "queue_wait_avg": self._wait_total / self._started if self._started else 0.0,
+                "queue_wait_max": self._wait_max,
+                "queue_wait_p95_recent": recent[min(samples - 1, int(samples * 0.95))] if samples else 0.0,
+            }
+
+
+ai_limiter = AIConcurrencyLimiter(
+    max_concurrency=settings.AI_MAX_CONCURRENCY,
+    max_queue=settings.AI_MAX_QUEUE,
+    per_tenant=settings.AI_MAX_PER_TENANT,
+    queue_timeout=settings.AI_QUEUE_TIMEOUT_SECONDS,
+)
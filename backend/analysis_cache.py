@@ -0,0 +1,187 @@
+"""
+Content-addressed cache for AI analysis results.
+
+Results are keyed by a hash of the normalized input plus the model and
+prompt version that produced them, so changing either invalidates old
+entries without a flush. Lookups hit a per-process LRU first, then a
+SQLite file (shared by all workers) whose rows expire after a TTL.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[\W_]+", re.UNICODE)
+
+# Expired SQLite rows are deleted every this many writes
+PRUNE_EVERY = 200
+
+
+def normalize_symptoms(text: str) -> str:
+    """Fold case, punctuation and whitespace: "Fever, headache!" -> "fever headache"."""
+    return _NON_WORD.sub(" ", text.casefold()).strip()
+
+
+def content_key(*parts: str) -> str:
+    """SHA-256 over the given parts (model, prompt version, normalized input...)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """Two-tier (memory LRU + SQLite with TTL) cache of JSON-serializable results."""
+
+    def __init__(
+        self,
+        db_path: Optional[str],
+        max_entries: int = 2000,
+        ttl_seconds: float = 7 * 24 * 3600,
+        enabled: bool = True,
+    ):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # key -> (expires_at wall clock, value)
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if enabled and db_path:
+            self._init_db()
+
+    # -- SQLite tier ---------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+    def _db_get(self, key: str) -> Optional[Tuple[float, Any]]:
+        try:
+            row = self._connect().execute(
+                "SELECT expires_at, value FROM analysis_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Analysis cache read failed: {e}")
+            return None
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _db_put(self, key: str, value: Any, expires_at: float) -> None:
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            if self._writes % PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM analysis_cache WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            logger.warning(f"Analysis cache write failed: {e}")
+
+    # -- Memory tier ---------------------------------------------------
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    # -- Public API ----------------------------------------------------
+
+    @property
+    def persistent(self) -> bool:
+        """Whether get/put may touch the SQLite tier (blocking file I/O)."""
+        return bool(self.enabled and self.db_path)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value for `key`, or None on a miss."""
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                if cached[0] > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return cached[1]
+                del self._memory[key]
+        if self.db_path:
+            stored = self._db_get(key)
+            if stored is not None:
+                self._remember(key, *stored)
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                return stored[1]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value)
+        if self.db_path:
+            with self._lock:
+                self._writes += 1
+            self._db_put(key, value, expires_at)
+
+    def clear(self) -> None:
+        """Drop the memory tier (SQLite rows expire on their own)."""
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+analysis_cache = AnalysisCache(
+    db_path=settings.local_db_path(settings.ANALYSIS_CACHE_DB_PATH, "analysis_cache.db"),
+    max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANALYSIS_CACHE_TTL_SECONDS,
+    enabled=settings.ANALYSIS_CACHE_ENABLED,
+)
@@ -0,0 +1,321 @@
+"""
+Persistent queue for asynchronous AI analysis jobs.
+
+POST /api/analysis-jobs stores the submission in a local SQLite table and
+returns its id at once; GET /api/analysis-jobs/{id} reports its status
+and, once finished, its result. A pool of worker tasks claims queued jobs
+in priority order and runs them, so long image analyses no longer hold
+an HTTP connection open for their whole duration.
+
+Jobs go into one of two lanes: submissions whose symptoms look like an
+emergency are always claimed before normal ones. Claims are leases, so a
+job whose worker died (or whose process restarted) is picked up again
+once the lease runs out. Finished jobs are kept for a retention period
+and then deleted; their uploaded payload is dropped as soon as they finish.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    from .config import settings
+    from .local_triage import local_triage
+except ImportError:
+    from config import settings
+    from local_triage import local_triage
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+EMERGENCY_LANE = 0
+NORMAL_LANE = 1
+LANE_NAMES = {EMERGENCY_LANE: "emergency", NORMAL_LANE: "normal"}
+
+
+def lane_for(symptoms: Optional[str]) -> int:
+    """EMERGENCY_LANE if local triage finds an emergency sign in the symptoms, else NORMAL_LANE."""
+    return EMERGENCY_LANE if symptoms and local_triage.is_emergency(symptoms) else NORMAL_LANE
+
+
+class AnalysisJobStore:
+    """SQLite-backed job table plus the worker tasks that drain it."""
+
+    # How long a worker holds a job before another may retry it
+    LEASE_SECONDS = 300.0
+    MAX_ATTEMPTS = 3
+
+    def __init__(
+        self,
+        db_path: str,
+        workers: int = 2,
+        retention_seconds: float = 24 * 3600,
+        poll_interval: float = 1.0,
+    ):
+        self.db_path = db_path
+        self.workers = workers
+        self.retention_seconds = retention_seconds
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._run_job: Optional[Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS analysis_jobs (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    lane INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    input TEXT NOT NULL,
+                    payload BLOB,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    lease_until REAL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_claim "
+                "ON analysis_jobs(status, lane, created_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_analysis_jobs_user "
+                "ON analysis_jobs(user_id, status)"
+            )
+        finally:
+            conn.close()
+
+    # -- Submitting and reading ----------------------------------------
+
+    def submit(
+        self,
+        user_id: str,
+        kind: str,
+        job_input: Dict[str, Any],
+        payload: Optional[bytes] = None,
+        lane: int = NORMAL_LANE,
+    ) -> Dict[str, Any]:
+        """Store a new queued job and return its public representation."""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO analysis_jobs (id, user_id, kind, lane, status, input, payload, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, kind, lane, QUEUED, json.dumps(job_input), payload, now),
+            )
+        finally:
+            conn.close()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return self.get(user_id, job_id)
+
+    def count_active(self, user_id: Optional[str] = None) -> int:
+        """Queued or running jobs, for one user or overall."""
+        sql = "SELECT COUNT(*) FROM analysis_jobs WHERE status IN (?, ?)"
+        params: List[Any] = [QUEUED, RUNNING]
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            params.append(user_id)
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def get(self, user_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """A user's job (without its payload), or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT id, kind, lane, status, result, error, attempts, created_at, started_at, finished_at "
+                "FROM analysis_jobs WHERE id = ? AND user_id = ?",
+                (job_id, user_id),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "priority": LANE_NAMES.get(row["lane"], "normal"),
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+
+    # -- Claiming and finishing ----------------------------------------
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next job: emergency lane first, then oldest. Expired leases
+        count as queued until the job has been tried MAX_ATTEMPTS times.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            self._fail_exhausted_rows(conn, now)
+            row = conn.execute(
+                """
+                UPDATE analysis_jobs
+                SET status = ?, attempts = attempts + 1, started_at = ?, lease_until = ?
+                WHERE id = (
+                    SELECT id FROM analysis_jobs
+                    WHERE status = ? OR (status = ? AND lease_until < ? AND attempts < ?)
+                    ORDER BY lane, created_at
+                    LIMIT 1
+                )
+                RETURNING id, user_id, kind, input, payload, attempts
+                """,
+                (RUNNING, now, now + self.LEASE_SECONDS, QUEUED, RUNNING, now, self.MAX_ATTEMPTS),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "user_id": row["user_id"],
+            "kind": row["kind"],
+            "input": json.loads(row["input"]),
+            "payload": row["payload"],
+            "attempts": row["attempts"],
+        }
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE analysis_jobs SET status = ?, result = ?, error = ?, finished_at = ?, "
+                "lease_until = NULL, payload = NULL WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id),
+            )
+        finally:
+            conn.close()
+
+    def prune(self) -> int:
+        """Delete finished jobs past the retention period."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "DELETE FROM analysis_jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (COMPLETED, FAILED, time.time() - self.retention_seconds),
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    # -- Workers -------------------------------------------------------
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self, run_job: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]) -> None:
+        """Start the workers; `run_job(job)` returns the result dict or raises."""
+        self._run_job = run_job
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._cleanup_loop()))
+        logger.info(f"Analysis job workers started ({self.workers})")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    async def run_once(self) -> bool:
+        """Claim and run one job; False if none was waiting."""
+        job = await asyncio.to_thread(self._claim)
+        if job is None:
+            return False
+        try:
+            result = await self._run_job(job)
+        except asyncio.CancelledError:
+            # Shutting down: the lease expires and another worker retries it
+            raise
+        except Exception as e:
+            logger.error(f"Analysis job {job['id']} failed (attempt {job['attempts']}): {str(e)}")
+            await asyncio.to_thread(self._finish, job["id"], FAILED, None, str(e))
+        else:
+            await asyncio.to_thread(self._finish, job["id"], COMPLETED, result)
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                if await self.run_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Analysis job worker error: {str(e)}")
+            # Idle: wait for a local submission, or poll for jobs from other workers
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _cleanup_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self._fail_exhausted)
+                removed = await asyncio.to_thread(self.prune)
+                if removed:
+                    logger.info(f"Pruned {removed} finished analysis jobs")
+            except Exception as e:
+                logger.warning(f"Analysis job cleanup failed: {str(e)}")
+            await asyncio.sleep(60)
+
+    def _fail_exhausted(self) -> None:
+        """Give up on jobs whose lease expired MAX_ATTEMPTS times (e.g. crash loops)."""
+        conn = self._connect()
+        try:
+            self._fail_exhausted_rows(conn, time.time())
+        finally:
+            conn.close()
+
+    def _fail_exhausted_rows(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute(
+            "UPDATE analysis_jobs SET status = ?, error = ?, finished_at = ?, lease_until = NULL, payload = NULL "
+            "WHERE status = ? AND lease_until < ? AND attempts >= ?",
+            (FAILED, "Analysis did not finish", now, RUNNING, now, self.MAX_ATTEMPTS),
+        )
+
+
+analysis_jobs = AnalysisJobStore(
+    db_path=settings.local_db_path(settings.ANALYSIS_JOBS_DB_PATH, "analysis_jobs.db"),
+    workers=settings.ANALYSIS_JOB_WORKERS,
+    retention_seconds=settings.ANALYSIS_JOB_RETENTION_SECONDS,
+)
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Security, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Security, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel, EmailStr, Field
 import logging
@@ -6,11 +7,15 @@ import os
 from supabase import create_client, Client
 
 try:
-    from .auth_utils import verify_jwt, hash_password, verify_password, create_access_token
-    from .database import create_user, get_user_by_email
+    from .auth_utils import verify_jwt, hash_password, verify_password_or_dummy, create_access_token
+    from .database import create_user
+    from .rate_limiter import check_login_allowed, get_client_ip, record_login_failure, reset_login_failures
+    from .user_cache import user_lookup
 except ImportError:
-    from auth_utils import verify_jwt, hash_password, verify_password, create_access_token
-    from database import create_user, get_user_by_email
+    from auth_utils import verify_jwt, hash_password, verify_password_or_dummy, create_access_token
+    from database import create_user
+    from rate_limiter import check_login_allowed, get_client_ip, record_login_failure, reset_login_failures
+    from user_cache import user_lookup
 
 router = APIRouter()
 security = HTTPBearer(auto_error=False)
@@ -126,7 +131,7 @@ async def register(request: RegisterRequest):
     logger.info(f"Registration attempt for email: {request.email}")
     
     # Check if user already exists
-    existing_user = get_user_by_email(request.email)
+    existing_user = await run_in_threadpool(user_lookup.lookup, request.email)
     if existing_user:
         logger.warning(f"Registration failed: User already exists for email {request.email}")
         raise HTTPException(
@@ -138,9 +143,10 @@ async def register(request: RegisterRequest):
         )
     
     # Hash password and create user in local database
-    password_hash = hash_password(request.password)
+    password_hash = await run_in_threadpool(hash_password, request.password)
     try:
         user_id, email = create_user(request.email, password_hash)
+        user_lookup.add(email)
         logger.info(f"User created successfully: {user_id} ({email})")
     except ValueError as e:
         logger.error(f"User creation failed: {str(e)}")
@@ -168,27 +174,30 @@ async def register(request: RegisterRequest):
 
 
 @router.post("/login", response_model=AuthResponse)
-async def login(request: LoginRequest):
+async def login(request: LoginRequest, http_request: Request):
     """
     Login with email and password.
     """
     logger.info(f"Login attempt for email: {request.email}")
     
-    # Get user by email
-    user = get_user_by_email(request.email)
-    if not user:
-        logger.warning(f"Login failed: User not found for email {request.email}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail={
-                "code": "INVALID_CREDENTIALS",
-                "message": "Invalid email or password",
-            },
-        )
+    # Reject brute-force floods before paying for a bcrypt verify
+    email_key = request.email.lower()
+    client_ip = get_client_ip(http_request)
+    # The limiters may be SQLite-backed, so they are called off the event loop
+    await run_in_threadpool(check_login_allowed, email_key, client_ip)
     
-    # Verify password
-    if not verify_password(request.password, user["password_hash"]):
-        logger.warning(f"Login failed: Invalid password for email {request.email}")
+    # Get user by email; unknown emails still pay a (dummy) bcrypt verify so
+    # misses and wrong passwords take the same time
+    user = await run_in_threadpool(user_lookup.lookup, request.email)
+    password_hash = user["password_hash"] if user else None
+    password_ok = await run_in_threadpool(verify_password_or_dummy, request.password, password_hash)
+    
+    if not password_ok:
+        if user:
+            logger.warning(f"Login failed: Invalid password for email {request.email}")
+        else:
+            logger.warning(f"Login failed: User not found for email {request.email}")
+        await run_in_threadpool(record_login_failure, email_key, client_ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail={
@@ -197,6 +206,8 @@ async def login(request: LoginRequest):
             },
         )
     
+    await run_in_threadpool(reset_login_failures, email_key)
+    
     # Sync user to Supabase (in case they registered before this fix)
     sync_user_to_supabase(user["id"], user["email"])
     
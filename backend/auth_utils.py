@@ -1,6 +1,7 @@
 from datetime import datetime, timezone, timedelta
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 import logging
+import secrets
 
 from fastapi import HTTPException, status
 from jose import JWTError, jwt
@@ -26,6 +27,26 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
+# Hash of a random password, verified against when the account does not exist
+_dummy_password_hash: Optional[str] = None
+
+
+def verify_password_or_dummy(plain_password: str, hashed_password: Optional[str]) -> bool:
+    """
+    Verify a password, paying the same bcrypt cost when there is no hash.
+
+    Unknown accounts are checked against a throwaway hash so a miss takes as
+    long as a wrong password and does not reveal whether the email exists.
+    """
+    global _dummy_password_hash
+    if hashed_password is None:
+        if _dummy_password_hash is None:
+            _dummy_password_hash = hash_password(secrets.token_urlsafe(16))
+        verify_password(plain_password, _dummy_password_hash)
+        return False
+    return verify_password(plain_password, hashed_password)
+
+
 def create_access_token(user_id: str, email: str) -> str:
     """Create a JWT access token."""
     now = datetime.now(timezone.utc)
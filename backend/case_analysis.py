@@ -0,0 +1,221 @@
+"""
+Background AI analysis of new health cases.
+
+`create_case` stores the case with `ai_analysis = {"status": "pending"}`
+and submits it here. A small pool of worker tasks runs the text triage
+agent on the shared AI thread pool and writes the result back into the case:
+
+    {"status": "completed", "analysis": "...", "model": "...", "completed_at": "..."}
+    {"status": "failed", "error": "...", "retryable": true, "attempts": 1}
+
+Clients poll GET /api/cases/{id} or follow the SSE stream until the status
+leaves "pending". Cases still pending after a restart (or when the queue
+was full) are picked up again by a periodic recovery sweep, as are failed
+analyses marked retryable, until MAX_ANALYSIS_ATTEMPTS runs have failed.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    from .config import settings
+    from .ai_limiter import ai_limiter
+    from .symptom_triage import NO_ANALYSIS, TRIAGE_MODEL_ID, TriageRunError, gemini_api_key, run_text_triage
+except ImportError:
+    from config import settings
+    from ai_limiter import ai_limiter
+    from symptom_triage import NO_ANALYSIS, TRIAGE_MODEL_ID, TriageRunError, gemini_api_key, run_text_triage
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class CaseAnalysisQueue:
+    """Bounded in-process job queue feeding the case analysis workers."""
+
+    # Delays before retrying a job whose case has not reached Supabase yet
+    # (e.g. it is still in the write-behind outbox)
+    MISSING_CASE_RETRY_DELAYS = (2.0, 5.0, 15.0, 30.0, 60.0)
+    # Pending cases older than this are considered lost and re-submitted
+    RECOVERY_AGE_SECONDS = 300.0
+    # Failed model runs are retried by the recovery sweep up to this many runs
+    MAX_ANALYSIS_ATTEMPTS = 3
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queued: int = 1000,
+        analyze: Callable[[str], str] = run_text_triage,
+    ):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.analyze = analyze
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._events: Dict[str, asyncio.Event] = {}
+        self._pool = None
+        self._on_written: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def enabled(self) -> bool:
+        """True if new cases should be queued for analysis."""
+        return settings.CASE_AUTO_ANALYSIS and self.running and bool(gemini_api_key())
+
+    # -- Lifecycle -----------------------------------------------------
+
+    def start(self, pool, on_written: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None) -> None:
+        """Start the workers on the running event loop."""
+        self._pool = pool
+        self._on_written = on_written
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._recovery_loop()))
+        logger.info(f"Case analysis workers started ({self.workers})")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    # -- Jobs ----------------------------------------------------------
+
+    def submit(self, case: Dict[str, Any], attempt: int = 0) -> bool:
+        """Queue a case for analysis; False if the workers are not running or the queue is full."""
+        if not self.running or self._queue is None:
+            return False
+        previous = case.get("ai_analysis") or {}
+        job = {
+            "id": case["id"],
+            "user_id": case["user_id"],
+            "symptoms": case["symptoms"],
+            "attempt": attempt,
+            # Model runs that already failed for this case
+            "runs": case.get("runs", previous.get("attempts", 0) if previous.get("status") == FAILED else 0),
+        }
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            logger.warning(f"Case analysis queue full; case {case['id']} left pending for recovery")
+            return False
+        self._events.setdefault(case["id"], asyncio.Event())
+        return True
+
+    def is_tracked(self, case_id: str) -> bool:
+        """True if this process has an unfinished job for the case."""
+        return case_id in self._events
+
+    async def wait(self, case_id: str, timeout: float) -> bool:
+        """Wait for this process's job on a case to finish; False on timeout or if untracked."""
+        event = self._events.get(case_id)
+        if event is None:
+            return False
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def _finish(self, case_id: str) -> None:
+        event = self._events.pop(case_id, None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Case analysis job for {job['id']} crashed: {str(e)}")
+                self._finish(job["id"])
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        try:
+            # No tenant: the worker count already bounds background jobs
+            analysis = await ai_limiter.run(None, self.analyze, job["symptoms"])
+            if analysis == NO_ANALYSIS:
+                raise TriageRunError("The model returned no analysis")
+            result = {
+                "status": COMPLETED,
+                "analysis": analysis,
+                "model": TRIAGE_MODEL_ID,
+                "completed_at": datetime.now(timezone.utc).isoformat(),
+            }
+        except Exception as e:
+            logger.error(f"Case analysis for {job['id']} failed: {str(e)}")
+            runs = job["runs"] + 1
+            result = {"status": FAILED, "error": str(e), "retryable": runs < self.MAX_ANALYSIS_ATTEMPTS, "attempts": runs}
+
+        response = await self._pool.execute(
+            self._pool.table("health_cases")
+            .update({"ai_analysis": result, "updated_at": datetime.now(timezone.utc).isoformat()})
+            .eq("id", job["id"])
+            .eq("user_id", job["user_id"])
+        )
+        if not response.data:
+            if job["attempt"] < len(self.MISSING_CASE_RETRY_DELAYS):
+                delay = self.MISSING_CASE_RETRY_DELAYS[job["attempt"]]
+                asyncio.get_running_loop().call_later(delay, self.submit, job, job["attempt"] + 1)
+            else:
+                logger.warning(f"Case {job['id']} never appeared upstream; analysis dropped")
+                self._finish(job["id"])
+            return
+
+        if self._on_written:
+            await self._on_written(response.data[0])
+        self._finish(job["id"])
+
+    # -- Recovery ------------------------------------------------------
+
+    async def recover(self) -> int:
+        """
+        Re-submit cases that have been pending, or failed with a retryable
+        error, for longer than RECOVERY_AGE_SECONDS.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.RECOVERY_AGE_SECONDS)
+        response = await self._pool.execute(
+            self._pool.table("health_cases")
+            .select("id,user_id,symptoms,ai_analysis")
+            .or_(f"ai_analysis->>status.eq.{PENDING},ai_analysis->>retryable.eq.true")
+            .lt("updated_at", cutoff.isoformat())
+            .order("updated_at")
+            .limit(100)
+        )
+        submitted = 0
+        for case in response.data or []:
+            if not self.is_tracked(case["id"]) and self.submit(case):
+                submitted += 1
+        return submitted
+
+    async def _recovery_loop(self) -> None:
+        while True:
+            try:
+                if gemini_api_key():
+                    submitted = await self.recover()
+                    if submitted:
+                        logger.info(f"Re-submitted {submitted} pending case analyses")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Case analysis recovery failed: {str(e)}")
+            await asyncio.sleep(self.RECOVERY_AGE_SECONDS)
+
+
+case_analysis = CaseAnalysisQueue(
+    workers=settings.CASE_ANALYSIS_WORKERS,
+    max_queued=settings.CASE_ANALYSIS_QUEUE_SIZE,
+)
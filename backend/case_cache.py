@@ -0,0 +1,247 @@
+"""
+Per-user read cache for the health case endpoints.
+
+Case lists and single cases are cached in memory per user for a short TTL
+and dropped whenever this process writes a case for that user. Every entry
+is tagged with the user's cache version; writes bump the version, so a read
+that raced with a write never repopulates stale data.
+
+When CASE_CACHE_DB_PATH is set, entries and versions are also kept in a
+SQLite file shared by all workers, so a write in one worker invalidates
+the others. Writes made outside this API are only picked up after the TTL.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(payload: Any) -> str:
+    """Weak entity tag over the JSON form of a response payload."""
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """True if an If-None-Match header value lists `etag` (or is `*`)."""
+    if not if_none_match or not etag:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return "*" in candidates or any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+
+class _UserEntry:
+    __slots__ = ("version", "lists", "cases")
+
+    def __init__(self, version: int):
+        self.version = version
+        # key -> (expires_at, payload)
+        self.lists: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self.cases: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+
+class CaseCache:
+    """In-memory (plus optional SQLite) cache of case reads, keyed per user."""
+
+    def __init__(self, ttl_seconds: float = 15.0, max_users: int = 5000, db_path: Optional[str] = None):
+        self.ttl = ttl_seconds
+        self.max_users = max_users
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[str, _UserEntry]" = OrderedDict()
+        self._local_versions: Dict[str, int] = {}
+        if db_path:
+            self._init_db()
+
+    # -- SQLite tier ---------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS case_cache_versions (
+                    user_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS case_cache_entries (
+                    user_id TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (user_id, key)
+                )
+            """)
+        finally:
+            conn.close()
+
+    def _db_version(self, conn: sqlite3.Connection, user_id: str) -> int:
+        row = conn.execute(
+            "SELECT version FROM case_cache_versions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _db_get(self, user_id: str, key: str, version: int) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT payload FROM case_cache_entries "
+                "WHERE user_id = ? AND key = ? AND version = ? AND expires_at > ?",
+                (user_id, key, version, time.time()),
+            ).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+
+    def _db_put(self, user_id: str, key: str, version: int, payload: Dict[str, Any]) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO case_cache_entries (user_id, key, version, expires_at, payload) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, key, version, time.time() + self.ttl, json.dumps(payload, default=str)),
+            )
+        finally:
+            conn.close()
+
+    # -- Versions ------------------------------------------------------
+
+    def version(self, user_id: str) -> int:
+        """Current cache version for a user; capture it before reading upstream."""
+        if self._db_path:
+            conn = self._connect()
+            try:
+                return self._db_version(conn, user_id)
+            finally:
+                conn.close()
+        with self._lock:
+            return self._local_versions.get(user_id, 0)
+
+    def invalidate_user(self, user_id: str) -> None:
+        """Drop everything cached for a user after a write."""
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._local_versions[user_id] = self._local_versions.get(user_id, 0) + 1
+        if self._db_path:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT INTO case_cache_versions (user_id, version) VALUES (?, 1) "
+                    "ON CONFLICT(user_id) DO UPDATE SET version = version + 1",
+                    (user_id,),
+                )
+                conn.execute("DELETE FROM case_cache_entries WHERE user_id = ?", (user_id,))
+            finally:
+                conn.close()
+
+    # -- Memory tier ---------------------------------------------------
+
+    def _entry(self, user_id: str, version: int, create: bool) -> Optional[_UserEntry]:
+        entry = self._users.get(user_id)
+        if entry is not None and entry.version != version:
+            del self._users[user_id]
+            entry = None
+        if entry is None and create:
+            entry = self._users[user_id] = _UserEntry(version)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        if entry is not None:
+            self._users.move_to_end(user_id)
+        return entry
+
+    def _get(self, user_id: str, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        version = self.version(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(user_id, version, create=False)
+            if entry is not None:
+                bucket = getattr(entry, kind)
+                cached = bucket.get(key)
+                if cached is not None:
+                    if cached[0] > now:
+                        return cached[1]
+                    del bucket[key]
+        if self._db_path:
+            payload = self._db_get(user_id, f"{kind}:{key}", version)
+            if payload is not None:
+                self._remember(user_id, kind, key, version, payload)
+            return payload
+        return None
+
+    def _remember(self, user_id: str, kind: str, key: str, version: int, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            entry = self._entry(user_id, version, create=True)
+            getattr(entry, kind)[key] = (time.monotonic() + self.ttl, payload)
+
+    def _put(self, user_id: str, kind: str, key: str, version: int, payload: Dict[str, Any]) -> None:
+        if self.version(user_id) != version:
+            # A write happened while this read was in flight
+            return
+        self._remember(user_id, kind, key, version, payload)
+        if self._db_path:
+            self._db_put(user_id, f"{kind}:{key}", version, payload)
+
+    # -- Public API ----------------------------------------------------
+
+    @property
+    def persistent(self) -> bool:
+        """Whether calls may touch the SQLite tier (blocking file I/O)."""
+        return bool(self._db_path)
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (the SQLite tier expires on its own)."""
+        with self._lock:
+            self._users.clear()
+
+    def get_list(self, user_id: str, key: str) -> Optional[Dict[str, Any]]:
+        """Cached list page: {"rows", "next_cursor", "etag"}."""
+        return self._get(user_id, "lists", key)
+
+    def put_list(
+        self,
+        user_id: str,
+        key: str,
+        version: int,
+        rows: List[Dict[str, Any]],
+        next_cursor: Optional[str],
+    ) -> Dict[str, Any]:
+        payload = {
+            "rows": rows,
+            "next_cursor": next_cursor,
+            "etag": make_etag({"rows": rows, "next_cursor": next_cursor}),
+        }
+        self._put(user_id, "lists", key, version, payload)
+        return payload
+
+    def get_case(self, user_id: str, case_id: str) -> Optional[Dict[str, Any]]:
+        return self._get(user_id, "cases", case_id)
+
+    def put_case(self, user_id: str, version: int, case: Dict[str, Any]) -> None:
+        self._put(user_id, "cases", case["id"], version, case)
+
+
+case_cache = CaseCache(
+    ttl_seconds=settings.CASE_CACHE_TTL_SECONDS,
+    max_users=settings.CASE_CACHE_MAX_USERS,
+    db_path=settings.CASE_CACHE_DB_PATH,
+)
@@ -0,0 +1,337 @@
+"""
+Durable local outbox for health case writes.
+
+When Supabase is slow or unreachable (or CASE_WRITE_BEHIND is on), new
+cases are appended to a local SQLite table and the client gets a 202 with
+the case's final id right away. A background task flushes the outbox to
+Supabase in batches, oldest first, retrying with backoff. Cases from the
+same user are always sent in the order they were accepted: once one of a
+user's rows fails, that user's later rows wait for it.
+
+Rows Supabase rejects (an error response, as opposed to a timeout or a
+connection failure) cannot wait forever: a permanent error such as a
+constraint violation, or MAX_REJECTIONS rejections of any kind, moves the
+row to a dead-letter state. It is logged, reported by `get_pending` with
+`sync_status: "failed"`, and no longer holds back the user's later cases.
+Outages never dead-letter a row; it is retried until Supabase is back.
+
+Rows are upserted on `id` with duplicates ignored, so a flush that is
+retried (or raced by another worker sharing the file) never creates a
+second copy of a case.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from postgrest.exceptions import APIError
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Error codes no retry can fix: Postgres data exceptions (22) and integrity
+# violations (23: check, not-null, foreign key), malformed requests (PGRST1)
+PERMANENT_ERROR_PREFIXES = ("22", "23", "PGRST1")
+# Client errors that are worth retrying
+RETRYABLE_HTTP_STATUSES = {408, 425, 429}
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """True for a Supabase rejection that retrying cannot fix."""
+    if not isinstance(error, APIError):
+        return False
+    code = error.code
+    if isinstance(code, int):
+        # No PostgREST error body: postgrest-py reports the HTTP status instead
+        return 400 <= code < 500 and code not in RETRYABLE_HTTP_STATUSES
+    return isinstance(code, str) and code.startswith(PERMANENT_ERROR_PREFIXES)
+
+
+class CaseOutbox:
+    """Append-only SQLite outbox plus the flush loop that drains it."""
+
+    # How long a worker holds rows it is flushing before others may retry them
+    LEASE_SECONDS = 60.0
+    # Rejections (error responses) after which a row is dead-lettered
+    MAX_REJECTIONS = 5
+
+    def __init__(
+        self,
+        db_path: str,
+        batch_size: int = 100,
+        flush_interval: float = 2.0,
+        max_backoff: float = 300.0,
+        retention_seconds: float = 7 * 24 * 3600,
+    ):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.retention_seconds = retention_seconds
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS case_outbox (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    case_id TEXT UNIQUE NOT NULL,
+                    user_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    accepted_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    flushed_at REAL,
+                    rejections INTEGER NOT NULL DEFAULT 0,
+                    failed_at REAL
+                )
+            """)
+            # Outbox files created before dead-lettering existed
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(case_outbox)")}
+            if "rejections" not in columns:
+                conn.execute("ALTER TABLE case_outbox ADD COLUMN rejections INTEGER NOT NULL DEFAULT 0")
+            if "failed_at" not in columns:
+                conn.execute("ALTER TABLE case_outbox ADD COLUMN failed_at REAL")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_case_outbox_pending "
+                "ON case_outbox(flushed_at, seq)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_case_outbox_user_pending "
+                "ON case_outbox(user_id, flushed_at)"
+            )
+        finally:
+            conn.close()
+
+    # -- Accepting writes ----------------------------------------------
+
+    def enqueue(self, case_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Durably record a new case and return its provisional representation.
+
+        `case_data` must already carry its final `id`.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        row = {"created_at": now, "updated_at": now, "ai_analysis": None, **case_data}
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO case_outbox (case_id, user_id, payload, accepted_at) VALUES (?, ?, ?, ?)",
+                (row["id"], row["user_id"], json.dumps(row), time.time()),
+            )
+        finally:
+            conn.close()
+        return row
+
+    def has_pending(self, user_id: str) -> bool:
+        """True if the user still has unflushed cases (new ones must queue behind them)."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT 1 FROM case_outbox WHERE user_id = ? AND flushed_at IS NULL AND failed_at IS NULL LIMIT 1",
+                (user_id,),
+            ).fetchone()
+        finally:
+            conn.close()
+        return row is not None
+
+    def get_pending(self, user_id: str, case_id: str) -> Optional[Dict[str, Any]]:
+        """
+        The provisional row for a case that has not reached Supabase, with its
+        `sync_status`: "pending", or "failed" (plus `sync_error`) once dead-lettered.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT payload, failed_at, last_error FROM case_outbox "
+                "WHERE case_id = ? AND user_id = ? AND flushed_at IS NULL",
+                (case_id, user_id),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        if row["failed_at"] is not None:
+            return {**json.loads(row["payload"]), "sync_status": "failed", "sync_error": row["last_error"]}
+        return {**json.loads(row["payload"]), "sync_status": "pending"}
+
+    # -- Flushing ------------------------------------------------------
+
+    def _claim_batch(self) -> List[sqlite3.Row]:
+        """Lease the next batch of sendable rows, preserving per-user order."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT seq, case_id, user_id, payload, attempts, rejections, next_attempt_at FROM case_outbox "
+                "WHERE flushed_at IS NULL AND failed_at IS NULL ORDER BY seq LIMIT ?",
+                (self.batch_size * 4,),
+            ).fetchall()
+            blocked_users = set()
+            batch = []
+            for row in rows:
+                if row["user_id"] in blocked_users:
+                    continue
+                if row["next_attempt_at"] > now:
+                    # Waiting on backoff or leased elsewhere: hold this user's later rows too
+                    blocked_users.add(row["user_id"])
+                    continue
+                batch.append(row)
+                if len(batch) >= self.batch_size:
+                    break
+            if batch:
+                conn.executemany(
+                    "UPDATE case_outbox SET next_attempt_at = ? WHERE seq = ?",
+                    [(now + self.LEASE_SECONDS, row["seq"]) for row in batch],
+                )
+            conn.execute("COMMIT")
+            return batch
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _mark_flushed(self, seqs: List[int]) -> None:
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "UPDATE case_outbox SET flushed_at = ?, last_error = NULL WHERE seq = ?",
+                [(time.time(), seq) for seq in seqs],
+            )
+        finally:
+            conn.close()
+
+    def _mark_failed(self, rows: List[sqlite3.Row], error: str, rejected: bool = False) -> None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "UPDATE case_outbox SET attempts = attempts + 1, rejections = rejections + ?, "
+                "next_attempt_at = ?, last_error = ? WHERE seq = ?",
+                [
+                    (int(rejected), now + min(self.max_backoff, 2 ** row["attempts"]), error[:500], row["seq"])
+                    for row in rows
+                ],
+            )
+        finally:
+            conn.close()
+
+    def _mark_dead(self, row: sqlite3.Row, error: str) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE case_outbox SET attempts = attempts + 1, rejections = rejections + 1, "
+                "failed_at = ?, last_error = ? WHERE seq = ?",
+                (time.time(), error[:500], row["seq"]),
+            )
+        finally:
+            conn.close()
+        logger.error(
+            f"Case {row['case_id']} of user {row['user_id']} was rejected by Supabase "
+            f"after {row['rejections'] + 1} attempt(s) and will not be retried: {error}"
+        )
+
+    def prune(self) -> None:
+        """Delete flushed and dead-lettered rows older than the retention period."""
+        cutoff = time.time() - self.retention_seconds
+        conn = self._connect()
+        try:
+            conn.execute(
+                "DELETE FROM case_outbox WHERE (flushed_at IS NOT NULL AND flushed_at < ?) "
+                "OR (failed_at IS NOT NULL AND failed_at < ?)",
+                (cutoff, cutoff),
+            )
+        finally:
+            conn.close()
+
+    async def flush_once(self, pool) -> List[str]:
+        """Send one batch to Supabase; returns the user id of every row flushed."""
+        batch = await asyncio.to_thread(self._claim_batch)
+        if not batch:
+            return []
+
+        async def send(rows):
+            # Stamp updated_at at flush time so incremental readers of
+            # updated_at (the local replica) see late-arriving cases
+            flushed_at = datetime.now(timezone.utc).isoformat()
+            await pool.execute(
+                pool.table("health_cases").upsert(
+                    [{**json.loads(row["payload"]), "updated_at": flushed_at} for row in rows],
+                    on_conflict="id",
+                    ignore_duplicates=True,
+                )
+            )
+
+        try:
+            await send(batch)
+            await asyncio.to_thread(self._mark_flushed, [row["seq"] for row in batch])
+            return [row["user_id"] for row in batch]
+        except Exception as e:
+            logger.warning(f"Case outbox batch flush failed, retrying per row: {str(e)}")
+
+        # Per-row fallback in order; a failure holds back that user's later rows
+        flushed, failed_users = [], set()
+        for row in batch:
+            if row["user_id"] in failed_users:
+                await asyncio.to_thread(self._mark_failed, [row], "waiting on an earlier case")
+                continue
+            try:
+                await send([row])
+                flushed.append(row)
+            except Exception as e:
+                rejected = isinstance(e, APIError)
+                if rejected and (is_permanent_error(e) or row["rejections"] + 1 >= self.MAX_REJECTIONS):
+                    # Dead-lettered: the user's later rows go ahead
+                    await asyncio.to_thread(self._mark_dead, row, str(e))
+                    continue
+                failed_users.add(row["user_id"])
+                await asyncio.to_thread(self._mark_failed, [row], str(e), rejected)
+        if flushed:
+            await asyncio.to_thread(self._mark_flushed, [row["seq"] for row in flushed])
+        return [row["user_id"] for row in flushed]
+
+    async def run(self, pool, on_flush: Optional[Callable[[str], None]] = None) -> None:
+        """Flush until cancelled; `on_flush(user_id)` runs (in a thread) for each user whose rows landed."""
+        logger.info("Case outbox flusher started")
+        last_prune = 0.0
+        while True:
+            try:
+                flushed = await self.flush_once(pool)
+                if on_flush:
+                    for user_id in set(flushed):
+                        await asyncio.to_thread(on_flush, user_id)
+                if time.time() - last_prune > 3600:
+                    await asyncio.to_thread(self.prune)
+                    last_prune = time.time()
+                if len(flushed) >= self.batch_size:
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Case outbox flusher error: {str(e)}")
+            await asyncio.sleep(self.flush_interval)
+
+
+case_outbox = CaseOutbox(
+    db_path=settings.local_db_path(settings.CASE_OUTBOX_DB_PATH, "case_outbox.db"),
+    batch_size=settings.CASE_OUTBOX_BATCH_SIZE,
+    flush_interval=settings.CASE_OUTBOX_FLUSH_INTERVAL_SECONDS,
+)
@@ -0,0 +1,303 @@
+"""
+Optional local SQLite mirror of the Supabase `health_cases` table.
+
+A background task pulls rows changed since the last sync (keyset on
+`updated_at`, `id`) and upserts them locally. While the mirror has caught
+up within CASE_REPLICA_MAX_STALENESS_SECONDS, the case read endpoints are
+answered from it instead of Supabase; if Supabase errors, any synced
+mirror is used as a fallback. Writes made through this API are applied to
+the mirror immediately, so users always read their own writes.
+
+Rows deleted in Supabase (only possible outside this API) stay in the
+mirror until it is rebuilt.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+logger = logging.getLogger(__name__)
+
+REPLICA_COLUMNS = [
+    "id", "user_id", "symptoms", "ai_analysis", "severity",
+    "category", "status", "created_at", "updated_at",
+]
+
+
+def _sort_key(value: Optional[str]) -> str:
+    """
+    Fixed-width UTC form of a timestamp so SQLite can order it as text.
+
+    PostgREST trims trailing zeros from fractional seconds, so the raw
+    strings do not sort correctly.
+    """
+    if not value:
+        return ""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+class CaseReplica:
+    """Local mirror of health_cases plus its incremental sync loop."""
+
+    # Re-read this far behind the watermark to catch late-committing rows
+    LOOKBACK_SECONDS = 5.0
+
+    def __init__(
+        self,
+        db_path: str,
+        enabled: bool = False,
+        max_staleness: float = 30.0,
+        sync_interval: float = 5.0,
+        batch_size: int = 1000,
+    ):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.max_staleness = max_staleness
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self._sync_lock = asyncio.Lock()
+        self._local = threading.local()
+        if enabled:
+            self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS replica_cases (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                symptoms TEXT,
+                ai_analysis TEXT,
+                severity TEXT,
+                category TEXT,
+                status TEXT,
+                created_at TEXT,
+                updated_at TEXT,
+                created_key TEXT NOT NULL,
+                updated_key TEXT NOT NULL
+            )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_replica_cases_user_created "
+            "ON replica_cases(user_id, created_key DESC, id DESC)"
+        )
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS replica_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """)
+
+    # -- Metadata ------------------------------------------------------
+
+    def _get_meta(self, key: str) -> Optional[str]:
+        row = self._connect().execute("SELECT value FROM replica_meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _set_meta(self, key: str, value: str) -> None:
+        self._connect().execute(
+            "INSERT INTO replica_meta (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value),
+        )
+
+    def last_synced_at(self) -> Optional[float]:
+        value = self._get_meta("last_synced_at")
+        return float(value) if value else None
+
+    def is_fresh(self) -> bool:
+        """True if the mirror caught up with Supabase within the staleness bound."""
+        if not self.enabled:
+            return False
+        synced = self.last_synced_at()
+        return synced is not None and time.time() - synced <= self.max_staleness
+
+    def is_available(self) -> bool:
+        """True if the mirror has completed at least one sync (for outage fallback)."""
+        return self.enabled and self.last_synced_at() is not None
+
+    # -- Writes --------------------------------------------------------
+
+    def apply(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Upsert full case rows into the mirror (sync pages and local writes)."""
+        if not self.enabled:
+            return
+        params = []
+        for row in rows:
+            params.append((
+                row["id"],
+                row["user_id"],
+                row.get("symptoms"),
+                json.dumps(row.get("ai_analysis")),
+                row.get("severity"),
+                row.get("category"),
+                row.get("status"),
+                row.get("created_at"),
+                row.get("updated_at"),
+                _sort_key(row.get("created_at")),
+                _sort_key(row.get("updated_at")),
+            ))
+        if not params:
+            return
+        conn = self._connect()
+        conn.executemany(
+            "INSERT INTO replica_cases (id, user_id, symptoms, ai_analysis, severity, category, status, "
+            "created_at, updated_at, created_key, updated_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET user_id = excluded.user_id, symptoms = excluded.symptoms, "
+            "ai_analysis = excluded.ai_analysis, severity = excluded.severity, category = excluded.category, "
+            "status = excluded.status, created_at = excluded.created_at, updated_at = excluded.updated_at, "
+            "created_key = excluded.created_key, updated_key = excluded.updated_key "
+            # Never let an older copy (e.g. a slow sync page) overwrite a newer local write
+            "WHERE excluded.updated_key >= replica_cases.updated_key",
+            params,
+        )
+
+    def rebuild(self) -> None:
+        """Drop the mirror so the next sync reloads every row."""
+        if not self.enabled:
+            return
+        conn = self._connect()
+        conn.execute("DELETE FROM replica_cases")
+        conn.execute("DELETE FROM replica_meta")
+
+    # -- Reads ---------------------------------------------------------
+
+    @staticmethod
+    def _to_case(row: sqlite3.Row, columns: List[str]) -> Dict[str, Any]:
+        case = {}
+        for column in columns:
+            value = row[column]
+            case[column] = json.loads(value) if column == "ai_analysis" and value is not None else value
+        return case
+
+    def list_cases(
+        self,
+        user_id: str,
+        columns: List[str],
+        cursor: Optional[Tuple[str, str]],
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """One page of a user's cases, newest first, keyset-paginated like the API."""
+        sql = f"SELECT {', '.join(REPLICA_COLUMNS)} FROM replica_cases WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if cursor:
+            created_key = _sort_key(cursor[0])
+            sql += " AND (created_key < ? OR (created_key = ? AND id < ?))"
+            params += [created_key, created_key, cursor[1]]
+        sql += " ORDER BY created_key DESC, id DESC LIMIT ?"
+        params.append(limit)
+        rows = self._connect().execute(sql, params).fetchall()
+        return [self._to_case(row, columns) for row in rows]
+
+    def get_case(self, user_id: str, case_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            f"SELECT {', '.join(REPLICA_COLUMNS)} FROM replica_cases WHERE id = ? AND user_id = ?",
+            (case_id, user_id),
+        ).fetchone()
+        return self._to_case(row, REPLICA_COLUMNS) if row else None
+
+    # -- Sync ----------------------------------------------------------
+
+    def _store_page(self, rows: List[Dict[str, Any]], watermark_key: str, value: str) -> None:
+        self.apply(rows)
+        self._set_meta(watermark_key, value)
+
+    async def sync(self, pool) -> int:
+        """Pull everything changed since the last sync; returns rows applied."""
+        if not self.enabled:
+            return 0
+        async with self._sync_lock:
+            started = time.time()
+            applied = 0
+            if await asyncio.to_thread(self._get_meta, "updated_watermark") is None:
+                applied += await self._initial_load(pool)
+            applied += await self._incremental(pool)
+            await asyncio.to_thread(self._set_meta, "last_synced_at", str(started))
+            return applied
+
+    async def _initial_load(self, pool) -> int:
+        """Copy every row, paging by id (rows with no updated_at are included)."""
+        applied, last_id, newest = 0, await asyncio.to_thread(self._get_meta, "initial_last_id"), ""
+        while True:
+            query = pool.table("health_cases").select(",".join(REPLICA_COLUMNS))
+            if last_id:
+                query = query.gt("id", last_id)
+            result = await pool.execute(query.order("id").limit(self.batch_size))
+            rows = result.data or []
+            if rows:
+                last_id = rows[-1]["id"]
+                newest = max([newest] + [row["updated_at"] for row in rows if row.get("updated_at")])
+                await asyncio.to_thread(self._store_page, rows, "initial_last_id", last_id)
+                applied += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        # Start incremental syncs from the newest change seen (or the epoch)
+        await asyncio.to_thread(
+            self._set_meta, "updated_watermark", newest or "1970-01-01T00:00:00+00:00"
+        )
+        return applied
+
+    async def _incremental(self, pool) -> int:
+        watermark = await asyncio.to_thread(self._get_meta, "updated_watermark")
+        since = (datetime.fromisoformat(watermark) - timedelta(seconds=self.LOOKBACK_SECONDS)).isoformat()
+        applied, last_id, newest = 0, "", watermark
+        while True:
+            query = pool.table("health_cases").select(",".join(REPLICA_COLUMNS))
+            if last_id:
+                query = query.or_(f'updated_at.gt."{since}",and(updated_at.eq."{since}",id.gt."{last_id}")')
+            else:
+                query = query.gte("updated_at", since)
+            result = await pool.execute(query.order("updated_at").order("id").limit(self.batch_size))
+            rows = result.data or []
+            if rows:
+                since, last_id = rows[-1]["updated_at"], rows[-1]["id"]
+                if _sort_key(since) > _sort_key(newest):
+                    newest = since
+                await asyncio.to_thread(self._store_page, rows, "updated_watermark", newest)
+                applied += len(rows)
+            if len(rows) < self.batch_size:
+                return applied
+
+    async def run(self, pool) -> None:
+        """Sync until cancelled."""
+        logger.info("Case replica sync started")
+        while True:
+            try:
+                applied = await self.sync(pool)
+                if applied:
+                    logger.debug(f"Case replica applied {applied} rows")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Case replica sync failed: {str(e)}")
+            await asyncio.sleep(self.sync_interval)
+
+
+case_replica = CaseReplica(
+    db_path=settings.local_db_path(settings.CASE_REPLICA_DB_PATH, "case_replica.db"),
+    enabled=settings.CASE_REPLICA_ENABLED,
+    max_staleness=settings.CASE_REPLICA_MAX_STALENESS_SECONDS,
+    sync_interval=settings.CASE_REPLICA_SYNC_INTERVAL_SECONDS,
+)
@@ -0,0 +1,295 @@
+"""
+Incrementally maintained daily rollups of health cases.
+
+Counts of cases per day by severity, category and status are kept in a
+SQLite table, both per user and across all users (scope "*"). Every case
+written through the API is passed to `record`, which remembers the case's
+current dimensions and moves its contribution between buckets, so
+recording the same row twice (retries, outbox flushes) never double
+counts. Reading a date range is a single indexed range scan, independent
+of how many cases exist.
+
+`rebuild` recomputes everything from Supabase with a projected scan of
+just the indexed dimension columns. Cases recorded while the scan runs are
+marked dirty; their recorded dimensions win over the (possibly older)
+scanned ones when the rebuilt counts are swapped in, so no write is lost.
+"""
+
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+logger = logging.getLogger(__name__)
+
+ALL_USERS = "*"
+DIMENSIONS = ("severity", "category", "status")
+UNSPECIFIED = "unspecified"
+
+
+def _case_day(created_at: Optional[str]) -> str:
+    if not created_at:
+        return datetime.now(timezone.utc).date().isoformat()
+    parsed = datetime.fromisoformat(created_at)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).date().isoformat()
+
+
+def _dims(row: Dict[str, Any]) -> Tuple[str, str, str, str, str]:
+    return (
+        row["user_id"],
+        _case_day(row.get("created_at")),
+        row.get("severity") or UNSPECIFIED,
+        row.get("category") or UNSPECIFIED,
+        row.get("status") or UNSPECIFIED,
+    )
+
+
+class CaseStats:
+    """SQLite-backed rollup counters for health cases."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS case_stat_counts (
+                    scope TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    dimension TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (scope, day, dimension, value)
+                )
+            """)
+            # Last recorded dimensions of each case, so updates can move counts
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS case_stat_members (
+                    case_id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    severity TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    status TEXT NOT NULL
+                )
+            """)
+            # Cases recorded while a rebuild's scan is running
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS case_stat_dirty (
+                    case_id TEXT PRIMARY KEY
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS case_stat_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+            """)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _bump(conn: sqlite3.Connection, dims: Tuple[str, str, str, str, str], delta: int) -> None:
+        user_id, day, severity, category, status = dims
+        buckets = [("total", ""), ("severity", severity), ("category", category), ("status", status)]
+        conn.executemany(
+            "INSERT INTO case_stat_counts (scope, day, dimension, value, count) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(scope, day, dimension, value) DO UPDATE SET count = count + excluded.count",
+            [(scope, day, dimension, value, delta) for scope in (user_id, ALL_USERS) for dimension, value in buckets],
+        )
+
+    def record(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """Count new cases and move updated ones between buckets (idempotent per row)."""
+        rows = [row for row in rows if row and row.get("id") and row.get("user_id")]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                rebuilding = conn.execute("SELECT 1 FROM case_stat_meta WHERE key = 'rebuilding'").fetchone()
+                if rebuilding:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO case_stat_dirty (case_id) VALUES (?)",
+                        [(row["id"],) for row in rows],
+                    )
+                for row in rows:
+                    new = _dims(row)
+                    old = conn.execute(
+                        "SELECT user_id, day, severity, category, status FROM case_stat_members WHERE case_id = ?",
+                        (row["id"],),
+                    ).fetchone()
+                    if old is not None:
+                        old = tuple(old)
+                        if old == new:
+                            continue
+                        self._bump(conn, old, -1)
+                    self._bump(conn, new, 1)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO case_stat_members "
+                        "(case_id, user_id, day, severity, category, status) VALUES (?, ?, ?, ?, ?, ?)",
+                        (row["id"], *new),
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    def is_built(self) -> bool:
+        """True once a full rebuild has completed."""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM case_stat_meta WHERE key = 'built_at'").fetchone()
+        finally:
+            conn.close()
+        return row is not None
+
+    def _begin_rebuild(self) -> None:
+        """From here until `_replace_all`, `record` marks the cases it touches dirty."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM case_stat_dirty")
+                conn.execute("INSERT OR REPLACE INTO case_stat_meta (key, value) VALUES ('rebuilding', '1')")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    def _abort_rebuild(self) -> None:
+        """Stop tracking dirty cases after a failed scan; live counts were kept up to date."""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM case_stat_dirty")
+                conn.execute("DELETE FROM case_stat_meta WHERE key = 'rebuilding'")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    def _replace_all(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                members = {row["id"]: _dims(row) for row in rows}
+                # Cases recorded during the scan keep their recorded dimensions
+                recorded = conn.execute(
+                    "SELECT m.case_id, m.user_id, m.day, m.severity, m.category, m.status "
+                    "FROM case_stat_dirty d JOIN case_stat_members m ON m.case_id = d.case_id"
+                ).fetchall()
+                for case_id, *dims in recorded:
+                    members[case_id] = tuple(dims)
+                conn.execute("DELETE FROM case_stat_counts")
+                conn.execute("DELETE FROM case_stat_members")
+                conn.execute("DELETE FROM case_stat_dirty")
+                conn.execute("DELETE FROM case_stat_meta WHERE key = 'rebuilding'")
+                totals: Dict[Tuple[str, str, str, str], int] = defaultdict(int)
+                for user_id, day, severity, category, status in members.values():
+                    for scope in (user_id, ALL_USERS):
+                        totals[(scope, day, "total", "")] += 1
+                        totals[(scope, day, "severity", severity)] += 1
+                        totals[(scope, day, "category", category)] += 1
+                        totals[(scope, day, "status", status)] += 1
+                conn.executemany(
+                    "INSERT INTO case_stat_counts (scope, day, dimension, value, count) VALUES (?, ?, ?, ?, ?)",
+                    [(*key, count) for key, count in totals.items()],
+                )
+                conn.executemany(
+                    "INSERT INTO case_stat_members (case_id, user_id, day, severity, category, status) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(case_id, *dims) for case_id, dims in members.items()],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO case_stat_meta (key, value) VALUES ('built_at', ?)",
+                    (datetime.now(timezone.utc).isoformat(),),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+    async def rebuild(self, pool, batch_size: int = 1000) -> int:
+        """Recount every case from Supabase; returns the number of cases seen."""
+        await asyncio.to_thread(self._begin_rebuild)
+        rows: List[Dict[str, Any]] = []
+        last_id = None
+        try:
+            while True:
+                query = pool.table("health_cases").select("id,user_id,created_at,severity,category,status")
+                if last_id:
+                    query = query.gt("id", last_id)
+                result = await pool.execute(query.order("id").limit(batch_size))
+                page = result.data or []
+                rows.extend(page)
+                if len(page) < batch_size:
+                    break
+                last_id = page[-1]["id"]
+        except BaseException:
+            await asyncio.shield(asyncio.to_thread(self._abort_rebuild))
+            raise
+        await asyncio.to_thread(self._replace_all, rows)
+        logger.info(f"Case stats rebuilt from {len(rows)} cases")
+        return len(rows)
+
+    async def ensure_built(self, pool) -> None:
+        """Run the initial rebuild if the rollups have never been built."""
+        try:
+            if not await asyncio.to_thread(self.is_built):
+                await self.rebuild(pool)
+        except Exception as e:
+            logger.warning(f"Case stats rebuild failed: {str(e)}")
+
+    def daily(self, scope: str, start: date, end: date) -> List[Dict[str, Any]]:
+        """Per-day counts for `scope` between `start` and `end` inclusive, oldest first."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT day, dimension, value, count FROM case_stat_counts "
+                "WHERE scope = ? AND day >= ? AND day <= ? AND count != 0 ORDER BY day",
+                (scope, start.isoformat(), end.isoformat()),
+            ).fetchall()
+        finally:
+            conn.close()
+        days: Dict[str, Dict[str, Any]] = {}
+        for day, dimension, value, count in rows:
+            entry = days.setdefault(day, {"date": day, "total": 0, **{d: {} for d in DIMENSIONS}})
+            if dimension == "total":
+                entry["total"] = count
+            else:
+                entry[dimension][value] = count
+        return list(days.values())
+
+
+case_stats = CaseStats(
+    db_path=settings.local_db_path(settings.CASE_STATS_DB_PATH, "case_stats.db"),
+)
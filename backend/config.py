@@ -41,6 +41,100 @@ class Settings(BaseSettings):
     # Comma-separated list of allowed origins for CORS
     BACKEND_CORS_ORIGINS: str = "http://localhost:5173,http://localhost:5174,http://localhost:3000"
 
+    # Sliding-window rate limits (failed logins and unauthenticated AI endpoints)
+    LOGIN_MAX_FAILURES_PER_EMAIL: int = 5
+    LOGIN_MAX_FAILURES_PER_IP: int = 20
+    LOGIN_FAILURE_WINDOW_SECONDS: int = 900
+    PUBLIC_AI_MAX_REQUESTS: int = 10
+    PUBLIC_AI_WINDOW_SECONDS: int = 600
+    # Optional SQLite file so limits are shared across uvicorn workers
+    RATE_LIMIT_DB_PATH: str | None = None
+
+    # Auth user lookup cache (positive entries) and Bloom filter refresh interval
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    USER_BLOOM_REFRESH_SECONDS: float = 1.0
+
+    # Async Supabase (PostgREST) connection pool used by the health case routes
+    SUPABASE_HTTP2: bool = True
+    SUPABASE_POOL_MAX_CONNECTIONS: int = 20
+    SUPABASE_POOL_MAX_KEEPALIVE: int = 10
+    SUPABASE_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    SUPABASE_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    SUPABASE_TIMEOUT_SECONDS: float = 10.0
+
+    # Directory for the local SQLite stores whose *_DB_PATH is not set
+    # (default: backend/var, kept apart from the source files)
+    LOCAL_DATA_DIR: str | None = None
+
+    # Per-user health case read cache; set CASE_CACHE_DB_PATH to share it across workers
+    CASE_CACHE_TTL_SECONDS: float = 15.0
+    CASE_CACHE_MAX_USERS: int = 5000
+    CASE_CACHE_DB_PATH: str | None = None
+
+    # Write-behind outbox for new cases: always queue when CASE_WRITE_BEHIND is on,
+    # otherwise only when a direct insert times out or Supabase is unreachable
+    CASE_WRITE_BEHIND: bool = False
+    CASE_DIRECT_WRITE_TIMEOUT_SECONDS: float = 3.0
+    CASE_OUTBOX_DB_PATH: str | None = None
+    CASE_OUTBOX_BATCH_SIZE: int = 100
+    CASE_OUTBOX_FLUSH_INTERVAL_SECONDS: float = 2.0
+
+    # Optional local SQLite mirror of health_cases, synced by updated_at watermark;
+    # reads use it while it is no more than CASE_REPLICA_MAX_STALENESS_SECONDS behind
+    CASE_REPLICA_ENABLED: bool = False
+    CASE_REPLICA_DB_PATH: str | None = None
+    CASE_REPLICA_SYNC_INTERVAL_SECONDS: float = 5.0
+    CASE_REPLICA_MAX_STALENESS_SECONDS: float = 30.0
+
+    # Daily case rollups behind GET /api/cases/stats; comma-separated emails
+    # allowed to see counts across all users and to trigger a rebuild
+    CASE_STATS_DB_PATH: str | None = None
+    CASE_STATS_ADMIN_EMAILS: str = ""
+
+    # Background AI triage of new cases (needs a Gemini key)
+    CASE_AUTO_ANALYSIS: bool = True
+    CASE_ANALYSIS_WORKERS: int = 2
+    CASE_ANALYSIS_QUEUE_SIZE: int = 1000
+
+    # Blocking AI model calls: concurrent calls, waiting callers, per-client cap
+    AI_MAX_CONCURRENCY: int = 4
+    AI_MAX_QUEUE: int = 32
+    AI_MAX_PER_TENANT: int = 2
+    AI_QUEUE_TIMEOUT_SECONDS: float = 30.0
+
+    # Cache of AI analysis results (memory LRU + SQLite with TTL), keyed by
+    # normalized input plus model and prompt version
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_CACHE_DB_PATH: str | None = None
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 2000
+    ANALYSIS_CACHE_TTL_SECONDS: float = 604800.0
+
+    # Image results are matched by perceptual hash; uploads whose hashes differ
+    # in at most IMAGE_CACHE_MAX_DISTANCE of 64 bits share a cached analysis
+    IMAGE_CACHE_DB_PATH: str | None = None
+    IMAGE_CACHE_MAX_ENTRIES: int = 1000
+    IMAGE_CACHE_MAX_DISTANCE: int = 4
+
+    # Largest accepted image (decoded bytes), for base64 and multipart uploads
+    IMAGE_UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
+    # Most images accepted by /api/analyze-images (one model call per batch)
+    IMAGE_BATCH_MAX_IMAGES: int = 8
+
+    # Rule-based triage ahead of the model on /api/analyze: emergency and
+    # minor verdicts at least this confident are answered without waiting for
+    # it; the full analysis of a minor one is queued as an analysis job
+    LOCAL_TRIAGE_ENABLED: bool = True
+    LOCAL_TRIAGE_MIN_CONFIDENCE: float = 0.9
+    LOCAL_TRIAGE_DEFER_MINOR: bool = True
+
+    # Asynchronous analysis jobs (POST /api/analysis-jobs), kept in SQLite
+    ANALYSIS_JOBS_DB_PATH: str | None = None
+    ANALYSIS_JOB_WORKERS: int = 2
+    ANALYSIS_JOB_MAX_ACTIVE_PER_USER: int = 5
+    ANALYSIS_JOB_MAX_QUEUED: int = 500
+    ANALYSIS_JOB_RETENTION_SECONDS: float = 86400.0
+
     @property
     def allowed_origins(self) -> List[str]:
         return [
@@ -49,6 +143,22 @@ class Settings(BaseSettings):
             if origin.strip()
         ]
 
+    def local_db_path(self, configured: str | None, filename: str) -> str:
+        """`configured` if set, else `filename` in LOCAL_DATA_DIR (created on demand)."""
+        if configured:
+            return configured
+        directory = self.LOCAL_DATA_DIR or os.path.join(BACKEND_DIR, "var")
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, filename)
+
+    @property
+    def case_stats_admin_emails(self) -> List[str]:
+        return [
+            email.strip().lower()
+            for email in self.CASE_STATS_ADMIN_EMAILS.split(",")
+            if email.strip()
+        ]
+
     class Config:
         case_sensitive = False
         extra = "ignore"
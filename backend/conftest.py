@@ -0,0 +1,236 @@
+"""
+Shared pytest fixtures.
+
+`stub_postgrest` replaces the Supabase connection pool used by the health
+case routes with an in-memory PostgREST stand-in, so case endpoints can be
+tested offline.
+"""
+
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# The module-level stores open their default SQLite files on import; give the
+# test run its own directory for them
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="medilens-tests-")
+os.environ["LOCAL_DATA_DIR"] = TEST_DATA_DIR
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_DATA_DIR, ignore_errors=True)
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split a PostgREST logic expression on commas outside parentheses and quotes."""
+    parts, depth, quoted, current = [], 0, False, ""
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and ch == "," and depth == 0:
+            parts.append(current)
+            current = ""
+            continue
+        current += ch
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _compare(actual: Any, op: str, raw: str) -> bool:
+    if op == "is":
+        return actual is None if raw == "null" else str(actual).lower() == raw
+    if op == "in":
+        return str(actual) in [_unquote(v) for v in _split_top_level(raw.strip("()"))]
+    if actual is None:
+        return False
+    expected = _unquote(raw)
+    actual = str(actual)
+    return {
+        "eq": actual == expected,
+        "neq": actual != expected,
+        "lt": actual < expected,
+        "lte": actual <= expected,
+        "gt": actual > expected,
+        "gte": actual >= expected,
+    }[op]
+
+
+def _match_condition(row: Dict[str, Any], condition: str) -> bool:
+    """Evaluate `col.op.value`, `and(...)` or `or(...)` against a row."""
+    logic = re.match(r"^(and|or)\((.*)\)$", condition)
+    if logic:
+        parts = [_match_condition(row, part) for part in _split_top_level(logic.group(2))]
+        return all(parts) if logic.group(1) == "and" else any(parts)
+    column, op, raw = condition.split(".", 2)
+    if "->>" in column:
+        # JSON field access, e.g. ai_analysis->>status
+        column, key = column.split("->>", 1)
+        value = row.get(column)
+        value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, bool):
+            # ->> renders JSON booleans as text
+            value = "true" if value else "false"
+        return _compare(value, op, raw)
+    return _compare(row.get(column), op, raw)
+
+
+class StubPostgrest:
+    """Minimal in-memory PostgREST server for a handful of tables."""
+
+    def __init__(self):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {"health_cases": []}
+        self.requests: List[httpx.Request] = []
+        self.fail_with: Optional[int] = None
+        # Simulate Supabase being down (connection refused)
+        self.unreachable = False
+        # Optional predicate over inserted rows; a match fails the whole request
+        self.reject_row = None
+
+    @staticmethod
+    def now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _filtered(self, rows, params) -> List[Dict[str, Any]]:
+        result = rows
+        for key, value in params.multi_items():
+            if key in ("select", "order", "limit", "offset", "columns", "on_conflict"):
+                continue
+            if key in ("or", "and"):
+                result = [row for row in result if _match_condition(row, f"{key}{value}")]
+            else:
+                result = [row for row in result if _match_condition(row, f"{key}.{value}")]
+        return result
+
+    @staticmethod
+    def _project(rows, select: Optional[str]):
+        if not select or select == "*":
+            return [dict(row) for row in rows]
+        columns = [c.strip() for c in select.split(",")]
+        return [{c: row.get(c) for c in columns} for row in rows]
+
+    @staticmethod
+    def _ordered(rows, order: Optional[str]):
+        if not order:
+            return rows
+        for term in reversed(order.split(",")):
+            column, _, direction = term.partition(".")
+            rows = sorted(rows, key=lambda r: str(r.get(column) or ""), reverse=direction.startswith("desc"))
+        return rows
+
+    def _new_row(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        now = self.now()
+        row = {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now}
+        if table == "health_cases":
+            row.update({"status": "open", "ai_analysis": None, "severity": None, "category": None})
+        row.update({k: v for k, v in data.items() if v is not None or k not in row})
+        return row
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.unreachable:
+            raise httpx.ConnectError("stub unreachable", request=request)
+        if self.fail_with:
+            return httpx.Response(self.fail_with, json={"message": "stub failure", "code": "STUB", "hint": None, "details": None})
+
+        table = request.url.path.rsplit("/", 1)[-1]
+        rows = self.tables.setdefault(table, [])
+        params = request.url.params
+        prefer = request.headers.get("prefer", "")
+
+        if request.method == "GET":
+            result = self._ordered(self._filtered(rows, params), params.get("order"))
+            if params.get("limit"):
+                result = result[: int(params["limit"])]
+            return httpx.Response(200, json=self._project(result, params.get("select")))
+
+        if request.method == "POST":
+            payload = json.loads(request.content)
+            items = payload if isinstance(payload, list) else [payload]
+            if self.reject_row and any(self.reject_row(item) for item in items):
+                return httpx.Response(400, json={"message": "row rejected by stub", "code": "23514", "hint": None, "details": None})
+            created = []
+            for item in items:
+                existing = next((r for r in rows if item.get("id") and r["id"] == item.get("id")), None)
+                if existing is not None:
+                    if "resolution=ignore-duplicates" in prefer:
+                        continue
+                    if "resolution=merge-duplicates" in prefer:
+                        existing.update(item)
+                        created.append(existing)
+                        continue
+                    return httpx.Response(409, json={"message": "duplicate key", "code": "23505"})
+                row = self._new_row(table, item)
+                rows.append(row)
+                created.append(row)
+            body = self._project(created, params.get("select")) if "return=representation" in prefer else []
+            return httpx.Response(201, json=body)
+
+        if request.method == "PATCH":
+            payload = json.loads(request.content)
+            matched = self._filtered(rows, params)
+            for row in matched:
+                row.update(payload)
+                row["updated_at"] = self.now()
+            body = self._project(matched, params.get("select")) if "return=representation" in prefer else []
+            return httpx.Response(200, json=body)
+
+        return httpx.Response(405, json={"message": "method not supported by stub"})
+
+
+@pytest.fixture
+def stub_postgrest(tmp_path):
+    """Route the app's Supabase pool to an in-memory PostgREST stub (with empty local case stores)."""
+    import main
+    from case_outbox import CaseOutbox
+    from case_stats import CaseStats
+
+    stub = StubPostgrest()
+
+    def build_http_client():
+        return httpx.AsyncClient(transport=httpx.MockTransport(stub.handler))
+
+    outbox = CaseOutbox(str(tmp_path / "case_outbox.db"), batch_size=10)
+    with patch.object(main.supabase_pool, "_build_http_client", build_http_client), \
+            patch.object(main, "case_outbox", outbox), \
+            patch.object(main, "case_stats", CaseStats(str(tmp_path / "case_stats.db"))):
+        main.supabase_pool._client = None
+        main.case_cache.clear()
+        yield stub
+        main.supabase_pool._client = None
+        main.case_cache.clear()
+
+
+@pytest.fixture
+def make_auth_headers():
+    """Build Authorization headers for an arbitrary (or random) user id."""
+    from auth_utils import create_access_token
+
+    def _make(user_id: Optional[str] = None, email: Optional[str] = None):
+        user_id = user_id or str(uuid.uuid4())
+        token = create_access_token(user_id, email or f"{user_id[:8]}@example.com")
+        return {"Authorization": f"Bearer {token}"}
+
+    return _make
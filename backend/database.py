@@ -6,7 +6,7 @@ import sqlite3
 import uuid
 import json
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 from pathlib import Path
 
 # Database file location
@@ -119,6 +119,18 @@ def get_user_by_email(email: str) -> Optional[dict]:
     return None
 
 
+def get_user_emails_since(last_rowid: int = 0) -> List[Tuple[int, str]]:
+    """Get (rowid, email) pairs for users inserted after `last_rowid`, oldest first."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT rowid, email FROM users WHERE rowid > ? ORDER BY rowid", (last_rowid,))
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return [(row[0], row[1]) for row in rows]
+
+
 def get_user_by_id(user_id: str) -> Optional[dict]:
     """Get a user by ID."""
     conn = get_db_connection()
@@ -10,8 +10,24 @@ from typing import Dict, Any, Optional, List
 import google.generativeai as genai
 from pydantic import BaseModel
 
+try:
+    from .keyword_automaton import VocabularyMatcher, load_vocabulary
+except ImportError:
+    from keyword_automaton import VocabularyMatcher, load_vocabulary
+
 logger = logging.getLogger(__name__)
 
+# Keywords looked for in free-text responses, matched anywhere in a word
+# (as `keyword in text`), all lists in one pass
+_ANALYSIS_VOCABULARY = load_vocabulary("analysis_vocabulary.json")
+_response_keywords = VocabularyMatcher(
+    {
+        name: _ANALYSIS_VOCABULARY[name]
+        for name in ("urgency_high", "urgency_low", "symptoms", "conditions")
+    },
+    whole_words=False,
+)
+
 
 class SymptomData(BaseModel):
     """Standardized symptom data structure"""
@@ -84,40 +100,28 @@ class GeminiService:
         # This is a simplified parser. In production, you might want to use
         # more sophisticated NLP or prompt engineering to get structured output
         
-        detected_symptoms = []
-        possible_conditions = []
-        recommendations = []
-        urgency_level = "medium"
-        
-        # Parse response text (simplified logic)
-        lines = response_text.lower().split('\n')
+        found = _response_keywords.match(response_text)
         
         # Extract urgency level
-        if any(word in response_text.lower() for word in ['emergency', 'urgent', 'immediate', 'severe']):
+        urgency_level = "medium"
+        if found["urgency_high"]:
             urgency_level = "high"
-        elif any(word in response_text.lower() for word in ['mild', 'minor', 'slight']):
+        elif found["urgency_low"]:
             urgency_level = "low"
         
         # Extract symptoms (simplified - looks for common symptom keywords)
-        symptom_keywords = ['rash', 'swelling', 'redness', 'pain', 'inflammation', 
-                           'lesion', 'bruise', 'cut', 'burn', 'infection']
-        
-        for keyword in symptom_keywords:
-            if keyword in response_text.lower():
-                detected_symptoms.append(SymptomData(
-                    symptom_name=keyword.capitalize(),
-                    severity="moderate",
-                    confidence=0.7,
-                    description=f"Detected {keyword} in image"
-                ))
+        detected_symptoms = [
+            SymptomData(
+                symptom_name=keyword.capitalize(),
+                severity="moderate",
+                confidence=0.7,
+                description=f"Detected {keyword} in image"
+            )
+            for keyword in found["symptoms"]
+        ]
         
         # Extract conditions (simplified)
-        condition_keywords = ['dermatitis', 'eczema', 'psoriasis', 'acne', 'infection',
-                             'allergy', 'injury', 'wound']
-        
-        for keyword in condition_keywords:
-            if keyword in response_text.lower():
-                possible_conditions.append(keyword.capitalize())
+        possible_conditions = [keyword.capitalize() for keyword in found["conditions"]]
         
         # Default recommendations
         recommendations = [
@@ -0,0 +1,305 @@
+"""
+Near-duplicate cache for image analysis results.
+
+Uploads are keyed by a 64-bit difference hash (dHash) of the decoded
+image, so a re-encoded, resized or lightly recompressed copy of a photo
+maps to the same or a nearby hash. A cached result is reused when the
+Hamming distance between hashes is at most `max_distance`.
+
+Lookups use a multi-index hash table: the hash is split into
+`max_distance + 1` bands, and by the pigeonhole principle any hash within
+the threshold matches at least one band exactly. Only hashes sharing a
+band are compared bit by bit. The memory tier is an LRU; results are also
+kept in SQLite (shared by all workers) with a TTL.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from PIL import Image as PILImage
+
+try:
+    from .analysis_cache import content_key
+    from .config import settings
+    from .models.decoding import open_image
+    from .models.prompts import IMAGE_ANALYSIS_PROMPT, IMAGE_MODEL_ID
+except ImportError:
+    from analysis_cache import content_key
+    from config import settings
+    from models.decoding import open_image
+    from models.prompts import IMAGE_ANALYSIS_PROMPT, IMAGE_MODEL_ID
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+PRUNE_EVERY = 200
+
+
+def dhash(image_bytes: bytes, size: int = 8) -> int:
+    """
+    64-bit difference hash: downscale to (size+1) x size grayscale and record
+    whether each pixel is brighter than its right-hand neighbour.
+    """
+    with open_image(image_bytes) as image:
+        # JPEGs can be decoded straight at a reduced scale
+        image.draft("L", (size * 8, size * 8))
+        gray = image.convert("L").resize((size + 1, size), PILImage.Resampling.BOX)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _band_slices(bands: int) -> List[Tuple[int, int]]:
+    """(shift, mask) for each band; bands differ by at most one bit in width."""
+    slices = []
+    shift = 0
+    for i in range(bands):
+        width = HASH_BITS // bands + (1 if i < HASH_BITS % bands else 0)
+        slices.append((shift, (1 << width) - 1))
+        shift += width
+    return slices
+
+
+class ImageAnalysisCache:
+    """Perceptual-hash keyed cache with memory LRU + SQLite tiers."""
+
+    def __init__(
+        self,
+        db_path: Optional[str],
+        version: str = "",
+        max_distance: int = 4,
+        max_entries: int = 1000,
+        ttl_seconds: float = 7 * 24 * 3600,
+        enabled: bool = True,
+    ):
+        self.db_path = db_path
+        self.version = version
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.enabled = enabled
+        self._slices = _band_slices(max_distance + 1)
+        self._lock = threading.Lock()
+        # phash -> (expires_at wall clock, value)
+        self._memory: "OrderedDict[int, Tuple[float, Any]]" = OrderedDict()
+        self._index: Dict[Tuple[int, int], Set[int]] = {}
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.near_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if enabled and db_path:
+            self._init_db()
+
+    def _bands(self, phash: int) -> List[Tuple[int, int]]:
+        return [(i, (phash >> shift) & mask) for i, (shift, mask) in enumerate(self._slices)]
+
+    @property
+    def _band_prefix(self) -> str:
+        # Band layout depends on max_distance; keep layouts apart in SQLite
+        return f"{len(self._slices)}:"
+
+    # -- SQLite tier ---------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_cache_entries (
+                version TEXT NOT NULL,
+                phash TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (version, phash)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_cache_bands (
+                version TEXT NOT NULL,
+                band TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                phash TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (version, band, value, phash)
+            )
+        """)
+
+    def _db_find(self, phash: int) -> Optional[Tuple[int, float, Any]]:
+        bands = self._bands(phash)
+        condition = " OR ".join("(b.band = ? AND b.value = ?)" for _ in bands)
+        params: List[Any] = [self.version, time.time()]
+        for i, value in bands:
+            params.extend([f"{self._band_prefix}{i}", value])
+        try:
+            rows = self._connect().execute(
+                "SELECT DISTINCT e.phash, e.expires_at, e.value FROM image_cache_bands b "
+                "JOIN image_cache_entries e ON e.version = b.version AND e.phash = b.phash "
+                f"WHERE b.version = ? AND e.expires_at > ? AND ({condition})",
+                params,
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Image cache read failed: {e}")
+            return None
+        best = None
+        for stored_hash, expires_at, value in rows:
+            candidate = int(stored_hash, 16)
+            distance = hamming(candidate, phash)
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, candidate, expires_at, value)
+        return (best[1], best[2], json.loads(best[3])) if best else None
+
+    def _db_put(self, phash: int, value: Any, expires_at: float) -> None:
+        key = f"{phash:016x}"
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO image_cache_entries (version, phash, value, expires_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (self.version, key, json.dumps(value), expires_at),
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO image_cache_bands (version, band, value, phash, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(self.version, f"{self._band_prefix}{i}", band, key, expires_at) for i, band in self._bands(phash)],
+                )
+                if self._writes % PRUNE_EVERY == 0:
+                    now = time.time()
+                    conn.execute("DELETE FROM image_cache_entries WHERE expires_at <= ?", (now,))
+                    conn.execute("DELETE FROM image_cache_bands WHERE expires_at <= ?", (now,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Image cache write failed: {e}")
+
+    # -- Memory tier ---------------------------------------------------
+
+    def _forget(self, phash: int) -> None:
+        self._memory.pop(phash, None)
+        for band in self._bands(phash):
+            bucket = self._index.get(band)
+            if bucket is not None:
+                bucket.discard(phash)
+                if not bucket:
+                    del self._index[band]
+
+    def _remember(self, phash: int, expires_at: float, value: Any) -> None:
+        with self._lock:
+            if phash not in self._memory:
+                for band in self._bands(phash):
+                    self._index.setdefault(band, set()).add(phash)
+            self._memory[phash] = (expires_at, value)
+            self._memory.move_to_end(phash)
+            while len(self._memory) > self.max_entries:
+                self._forget(next(iter(self._memory)))
+
+    def _memory_find(self, phash: int) -> Optional[Tuple[int, Any]]:
+        now = time.time()
+        candidates: Set[int] = set()
+        for band in self._bands(phash):
+            candidates |= self._index.get(band, set())
+        best = None
+        for candidate in candidates:
+            expires_at, value = self._memory[candidate]
+            if expires_at <= now:
+                self._forget(candidate)
+                continue
+            distance = hamming(candidate, phash)
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, candidate, value)
+        if best is None:
+            return None
+        self._memory.move_to_end(best[1])
+        return best[1], best[2]
+
+    # -- Public API ----------------------------------------------------
+
+    @property
+    def persistent(self) -> bool:
+        """Whether get/put may touch the SQLite tier (blocking file I/O)."""
+        return bool(self.enabled and self.db_path)
+
+    def get(self, phash: int) -> Optional[Any]:
+        """Cached result for the nearest stored hash within `max_distance`, or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            found = self._memory_find(phash)
+            if found is not None:
+                self.hits += 1
+                if found[0] != phash:
+                    self.near_hits += 1
+                return found[1]
+        if self.db_path:
+            stored = self._db_find(phash)
+            if stored is not None:
+                stored_hash, expires_at, value = stored
+                self._remember(stored_hash, expires_at, value)
+                with self._lock:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    if stored_hash != phash:
+                        self.near_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, phash: int, value: Any) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl
+        self._remember(phash, expires_at, value)
+        if self.db_path:
+            with self._lock:
+                self._writes += 1
+            self._db_put(phash, value, expires_at)
+
+    def clear(self) -> None:
+        """Drop the memory tier (SQLite rows expire on their own)."""
+        with self._lock:
+            self._memory.clear()
+            self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+image_cache = ImageAnalysisCache(
+    db_path=settings.local_db_path(settings.IMAGE_CACHE_DB_PATH, "image_cache.db"),
+    version=content_key("image", IMAGE_MODEL_ID, IMAGE_ANALYSIS_PROMPT),
+    max_distance=settings.IMAGE_CACHE_MAX_DISTANCE,
+    max_entries=settings.IMAGE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANALYSIS_CACHE_TTL_SECONDS,
+    enabled=settings.ANALYSIS_CACHE_ENABLED,
+)
@@ -0,0 +1,138 @@
+"""
+Multi-keyword matching with an Aho-Corasick automaton.
+
+The automaton is compiled once from a vocabulary (keyword -> payload) and
+then finds every keyword occurrence in a text in a single left-to-right
+pass, so matching cost grows with the text length rather than with the
+number of keywords. Text is case-folded once per call. Matches can be
+restricted to whole words (`"fever"` does not match inside `"feverish"`)
+or allowed anywhere, like `keyword in text`.
+
+`VocabularyMatcher` wraps one automaton over several named term lists
+and reports, per list, which terms occur. Vocabularies live in JSON data
+files (see `load_vocabulary`) so they can grow without code changes.
+"""
+
+import json
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, NamedTuple, Tuple, Union
+
+DATA_DIR = Path(__file__).parent / "data"
+
+# Typographic apostrophes are folded so "can’t" matches "can't"
+_FOLD = str.maketrans({"‘": "'", "’": "'", "ʼ": "'"})
+
+
+def normalize_text(text: str) -> str:
+    """Case-fold and unify apostrophes; keywords and texts both go through this."""
+    return text.casefold().translate(_FOLD)
+
+
+def load_vocabulary(name: str) -> Dict[str, Any]:
+    """Load a JSON vocabulary file from DATA_DIR (or an explicit path)."""
+    path = Path(name)
+    if not path.is_absolute():
+        path = DATA_DIR / path
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class KeywordMatch(NamedTuple):
+    start: int
+    end: int
+    keyword: str
+    payload: Any
+
+
+class KeywordAutomaton:
+    """Compiled keyword set; `find_all(text)` reports every occurrence in one pass."""
+
+    def __init__(self, keywords: Union[Mapping[str, Any], Iterable[Tuple[str, Any]]]):
+        items = keywords.items() if isinstance(keywords, Mapping) else keywords
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state: (keyword, payload) pairs ending there, including via fail links
+        self._out: List[List[Tuple[str, Any]]] = [[]]
+        self.size = 0
+        for keyword, payload in items:
+            keyword = normalize_text(keyword).strip()
+            if keyword:
+                self._add(keyword, payload)
+        self._build_fail_links()
+
+    def _add(self, keyword: str, payload: Any) -> None:
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((keyword, payload))
+        self.size += 1
+
+    def _build_fail_links(self) -> None:
+        # Breadth-first, so a state's fail target (a shorter suffix) is done before it
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, normalized: str, whole_words: bool = True) -> Iterator[KeywordMatch]:
+        """Matches in already-normalized text (see `normalize_text`), ordered by end offset."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        length = len(normalized)
+        for index, ch in enumerate(normalized):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            end = index + 1
+            for keyword, payload in out[state]:
+                start = end - len(keyword)
+                if whole_words and (
+                    (start > 0 and normalized[start - 1].isalnum())
+                    or (end < length and normalized[end].isalnum())
+                ):
+                    continue
+                yield KeywordMatch(start, end, keyword, payload)
+
+    def find_all(self, text: str, whole_words: bool = True) -> List[KeywordMatch]:
+        """Every keyword occurrence in `text` (normalized once here)."""
+        return list(self.iter_matches(normalize_text(text), whole_words))
+
+
+class VocabularyMatcher:
+    """
+    Several named term lists matched together in one pass.
+
+    `match(text)` returns, for each vocabulary, the terms that occur in the
+    text, once each and in vocabulary order.
+    """
+
+    def __init__(self, vocabularies: Mapping[str, Iterable[str]], whole_words: bool = True):
+        self.whole_words = whole_words
+        self.names = list(vocabularies)
+        self._terms: Dict[str, List[str]] = {name: list(terms) for name, terms in vocabularies.items()}
+        self._automaton = KeywordAutomaton(
+            (term, (name, index)) for name, terms in self._terms.items() for index, term in enumerate(terms)
+        )
+
+    def match(self, text: str) -> Dict[str, List[str]]:
+        found: Dict[str, set] = {name: set() for name in self.names}
+        for m in self._automaton.iter_matches(normalize_text(text), self.whole_words):
+            name, index = m.payload
+            found[name].add(index)
+        return {name: [self._terms[name][i] for i in sorted(found[name])] for name in self.names}
@@ -0,0 +1,178 @@
+"""
+Rule-based symptom triage that runs locally, before any model call.
+
+Symptom text is scanned once by a keyword automaton (see
+`keyword_automaton`) built from `data/triage_rules.json`; matches are
+weighed together with the profile's chronic conditions and allergies to
+give an urgency verdict in microseconds:
+
+- emergency terms ("chest pain", "can't breathe") -> emergency
+- symptoms that are dangerous given a chronic condition (wheezing with
+  asthma, confusion with diabetes) -> escalated
+- allergic-reaction signs for a user with known allergies -> high
+- otherwise the most urgent matched term decides; text made up only of
+  minor complaints ("runny nose") -> low
+
+Each verdict carries a confidence. /api/analyze answers confident
+emergency and minor verdicts directly and leaves the rest to the model.
+Negated mentions ("no chest pain") are ignored.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+try:
+    from .keyword_automaton import KeywordAutomaton, load_vocabulary, normalize_text
+except ImportError:
+    from keyword_automaton import KeywordAutomaton, load_vocabulary, normalize_text
+
+LEVELS = ("unknown", "low", "medium", "high", "emergency")
+
+# Confidence of a verdict by what produced it
+EMERGENCY_TERM_CONFIDENCE = 0.95
+CONDITION_EMERGENCY_CONFIDENCE = 0.9
+HIGH_CONFIDENCE = 0.75
+ALLERGY_CONFIDENCE = 0.8
+MEDIUM_CONFIDENCE = 0.6
+# Minor-only text: from this (nothing else said) up to +0.45 (every word accounted for)
+LOW_BASE_CONFIDENCE = 0.5
+
+# Negation cues only count within a few words before a term, in the same clause
+NEGATION_WINDOW_WORDS = 4
+
+_CLAUSE_END = re.compile(r"[.;!?,]|\bbut\b")
+_WORD = re.compile(r"[\w']+")
+
+# Free-text profile fields that mean "nothing to report"
+_EMPTY_ANSWERS = {"", "none", "no", "n/a", "na", "nil", "nka", "nkda", "no known allergies", "-"}
+
+
+def _level_rank(level: str) -> int:
+    return LEVELS.index(level)
+
+
+class LocalTriage:
+    """Compiled triage rules; `assess(symptoms, profile)` returns a verdict dict."""
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.version = rules.get("version", 1)
+        self.guidance = rules.get("guidance", {})
+        self.filler_words = set(rules.get("filler_words", []))
+
+        terms = []
+        for level, words in rules["levels"].items():
+            terms.extend((word, ("level", level)) for word in words)
+        terms.extend((word, ("allergy", None)) for word in rules.get("allergy_reaction_terms", []))
+        aliases = []
+        for condition in rules.get("conditions", []):
+            aliases.extend((alias, condition["name"]) for alias in condition["aliases"])
+            for level, words in condition.get("escalate", {}).items():
+                terms.extend((word, ("condition", (condition["name"], level))) for word in words)
+        self._symptoms = KeywordAutomaton(terms)
+        self._conditions = KeywordAutomaton(aliases)
+        cues = sorted(rules.get("negation_cues", []), key=len, reverse=True)
+        self._negation = re.compile(r"\b(" + "|".join(re.escape(normalize_text(c)) for c in cues) + r")\b") if cues else None
+
+    def _negated(self, text: str, start: int) -> bool:
+        if self._negation is None:
+            return False
+        before = text[:start]
+        clause_ends = list(_CLAUSE_END.finditer(before))
+        if clause_ends:
+            before = before[clause_ends[-1].end():]
+        window = " ".join(before.split()[-NEGATION_WINDOW_WORDS:])
+        return bool(self._negation.search(window))
+
+    @staticmethod
+    def _profile_text(profile: Optional[Dict[str, Any]], field: str) -> str:
+        value = (profile or {}).get(field) or ""
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(v) for v in value)
+        value = normalize_text(str(value)).strip()
+        return "" if value in _EMPTY_ANSWERS else value
+
+    def assess(self, symptoms: str, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Urgency verdict for `symptoms`, using the profile's `chronic_conditions`
+        and `allergies` when given:
+        {"urgency", "confidence", "matched", "reasons", "guidance"}.
+        """
+        text = normalize_text(symptoms)
+        matches = [m for m in self._symptoms.iter_matches(text) if not self._negated(text, m.start)]
+
+        conditions_text = self._profile_text(profile, "chronic_conditions")
+        conditions = {m.payload for m in self._conditions.iter_matches(conditions_text)}
+        has_allergies = bool(self._profile_text(profile, "allergies"))
+
+        # A level term inside a longer one ("headache" in "mild headache") defers to it
+        level_spans = [(m.start, m.end) for m in matches if m.payload[0] == "level"]
+        level_matches = [
+            m for m in matches
+            if m.payload[0] == "level" and not any(
+                s <= m.start and m.end <= e and (e - s) > (m.end - m.start) for s, e in level_spans
+            )
+        ]
+
+        urgency, confidence, reasons = "unknown", 0.0, []
+
+        def raise_to(level: str, level_confidence: float, reason: str) -> None:
+            nonlocal urgency, confidence
+            if _level_rank(level) > _level_rank(urgency) or (level == urgency and level_confidence > confidence):
+                urgency, confidence = level, level_confidence
+            reasons.append(reason)
+
+        by_level: Dict[str, List[str]] = {}
+        for m in level_matches:
+            by_level.setdefault(m.payload[1], []).append(m.keyword)
+
+        if "emergency" in by_level:
+            terms = by_level["emergency"]
+            raise_to("emergency", EMERGENCY_TERM_CONFIDENCE, f"Emergency warning sign: {', '.join(terms)}")
+        for m in matches:
+            if m.payload[0] == "condition" and m.payload[1][0] in conditions:
+                name, level = m.payload[1]
+                raise_to(
+                    level,
+                    CONDITION_EMERGENCY_CONFIDENCE if level == "emergency" else HIGH_CONFIDENCE,
+                    f"{m.keyword} with {name}",
+                )
+        if has_allergies:
+            reactions = [m.keyword for m in matches if m.payload[0] == "allergy"]
+            if reactions:
+                raise_to("high", ALLERGY_CONFIDENCE, f"Possible allergic reaction ({', '.join(reactions)}) with known allergies")
+        if "high" in by_level:
+            raise_to("high", HIGH_CONFIDENCE, f"Concerning symptom: {', '.join(by_level['high'])}")
+        if "medium" in by_level:
+            raise_to("medium", MEDIUM_CONFIDENCE, f"Needs assessment: {', '.join(by_level['medium'])}")
+        if "low" in by_level and urgency == "unknown":
+            urgency, confidence = "low", self._low_confidence(text, level_matches, bool(conditions))
+            reasons.append(f"Minor complaint: {', '.join(by_level['low'])}")
+
+        matched = {m.keyword for m in level_matches}
+        matched.update(m.keyword for m in matches if m.payload[0] == "allergy" and has_allergies)
+        matched.update(m.keyword for m in matches if m.payload[0] == "condition" and m.payload[1][0] in conditions)
+        return {
+            "urgency": urgency,
+            "confidence": round(confidence, 2),
+            "matched": sorted(matched),
+            "reasons": reasons,
+            "guidance": self.guidance.get(urgency),
+        }
+
+    def is_emergency(self, symptoms: str) -> bool:
+        """True if `symptoms` alone (no profile) name an emergency warning sign."""
+        return self.assess(symptoms)["urgency"] == "emergency"
+
+    def _low_confidence(self, text: str, level_matches, has_conditions: bool) -> float:
+        """Higher when the minor terms account for every non-filler word."""
+        spans = [(m.start, m.end) for m in level_matches]
+        words = [w for w in _WORD.finditer(text) if w.group() not in self.filler_words and not w.group().isdigit()]
+        if not words:
+            return LOW_BASE_CONFIDENCE
+        covered = sum(1 for w in words if any(s <= w.start() and w.end() <= e for s, e in spans))
+        confidence = LOW_BASE_CONFIDENCE + 0.45 * covered / len(words)
+        # Minor for most people may not be for someone with a chronic condition
+        return min(confidence, MEDIUM_CONFIDENCE) if has_conditions else confidence
+
+
+local_triage = LocalTriage(load_vocabulary("triage_rules.json"))
@@ -1,14 +1,24 @@
-from fastapi import FastAPI, HTTPException, Depends, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional, List, Dict, Any
 import os
 import sys
 import json
+import asyncio
+import base64
+import binascii
+import math
+import uuid
+import httpx
 import requests
 import logging
 import tempfile
-from supabase import create_client, Client
+import threading
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 # Add parent directory to path for imports
@@ -19,10 +29,44 @@ try:
     from .config import settings
     from .auth_routes import router as auth_router, get_current_user
     from .database import get_profile_by_id, upsert_profile
+    from .rate_limiter import get_client_ip, limit_public_analysis, limit_public_transcription
+    from .supabase_pool import AsyncSupabasePool, SupabaseTimeoutError
+    from .case_cache import case_cache, etag_matches
+    from .case_outbox import case_outbox
+    from .case_replica import case_replica
+    from .case_stats import ALL_USERS, DIMENSIONS, case_stats
+    from .case_analysis import case_analysis
+    from .symptom_triage import (
+        NO_ANALYSIS, gemini_api_key, run_text_triage, stream_text_triage, triage_cache_key,
+    )
+    from .analysis_cache import analysis_cache, content_key, normalize_symptoms
+    from .image_cache import dhash, image_cache
+    from .models.decoding import ImageTooLargeError, open_image
+    from .single_flight import analysis_flights
+    from .ai_limiter import AIBusyError, ai_limiter
+    from .analysis_jobs import NORMAL_LANE, analysis_jobs, lane_for
+    from .local_triage import local_triage
 except ImportError:
     from config import settings
     from auth_routes import router as auth_router, get_current_user
     from database import get_profile_by_id, upsert_profile
+    from rate_limiter import get_client_ip, limit_public_analysis, limit_public_transcription
+    from supabase_pool import AsyncSupabasePool, SupabaseTimeoutError
+    from case_cache import case_cache, etag_matches
+    from case_outbox import case_outbox
+    from case_replica import case_replica
+    from case_stats import ALL_USERS, DIMENSIONS, case_stats
+    from case_analysis import case_analysis
+    from symptom_triage import (
+        NO_ANALYSIS, gemini_api_key, run_text_triage, stream_text_triage, triage_cache_key,
+    )
+    from analysis_cache import analysis_cache, content_key, normalize_symptoms
+    from image_cache import dhash, image_cache
+    from models.decoding import ImageTooLargeError, open_image
+    from single_flight import analysis_flights
+    from ai_limiter import AIBusyError, ai_limiter
+    from analysis_jobs import NORMAL_LANE, analysis_jobs, lane_for
+    from local_triage import local_triage
 
 # Configure logging
 logging.basicConfig(
@@ -35,7 +79,70 @@ logger = logging.getLogger(__name__)
 load_dotenv(os.path.join(os.path.dirname(__file__), "..", ".env"))
 load_dotenv()
 
-app = FastAPI(title="MediLens Patient API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the case background workers; release shared connections and worker processes on shutdown."""
+    tasks = [
+        asyncio.create_task(case_outbox.run(supabase_pool, on_flush=case_cache.invalidate_user))
+    ]
+    if case_replica.enabled:
+        tasks.append(asyncio.create_task(case_replica.run(supabase_pool)))
+    tasks.append(asyncio.create_task(case_stats.ensure_built(supabase_pool)))
+    case_analysis.start(supabase_pool, on_written=_record_case_row)
+    analysis_jobs.start(_run_analysis_job)
+    yield
+    await analysis_jobs.stop()
+    await case_analysis.stop()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await supabase_pool.aclose()
+    try:
+        from models.processor import shutdown_process_pool
+    except ImportError:
+        from .models.processor import shutdown_process_pool
+    # Joins the preprocessing worker processes, so off the event loop
+    await run_in_threadpool(shutdown_process_pool)
+
+
+# Room for the multipart boundaries, part headers and small form fields
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+UPLOAD_READ_CHUNK_BYTES = 1024 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject an image upload from its Content-Length, before the multipart
+    body is read and spooled. `_read_image_upload` still enforces the limit
+    per file, for chunked requests that send no Content-Length.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    @staticmethod
+    def body_limit(path: str) -> Optional[int]:
+        images = {"/api/analyze-image/upload": 1, "/api/analyze-images": settings.IMAGE_BATCH_MAX_IMAGES}.get(path)
+        if images is None:
+            return None
+        return images * settings.IMAGE_UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            limit = self.body_limit(scope["path"])
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if limit is not None and length.isdigit() and int(length) > limit:
+                response = JSONResponse(status_code=413, content={"detail": _image_too_large().detail})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
+
+app = FastAPI(title="MediLens Patient API", lifespan=lifespan)
+
+# Added before CORS so CORS stays outermost and its 413s carry CORS headers
+app.add_middleware(UploadSizeLimitMiddleware)
 
 # Enable CORS for frontend integration
 app.add_middleware(
@@ -44,6 +151,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # Supabase setup (backend should use service role key when available)
@@ -63,7 +171,9 @@ if not supabase_url or not key_to_use:
         "SUPABASE_URL and at least one of SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY must be set."
     )
 
-supabase: Client = create_client(supabase_url, key_to_use)
+# Shared keep-alive connection pool for PostgREST calls from async handlers
+supabase_pool = AsyncSupabasePool(supabase_url, key_to_use)
+
 
 class Profile(BaseModel):
     id: str
@@ -119,6 +229,10 @@ class AnalyzeRequest(BaseModel):
 
 class AnalyzeResponse(BaseModel):
     analysis: str
+    # Set when the local triage rules answered without the model
+    triage: Optional[Dict[str, Any]] = None
+    # Queued full analysis of a minor complaint (GET /api/analysis-jobs/{id})
+    analysis_job_id: Optional[str] = None
 
 
 class HealthCaseCreate(BaseModel):
@@ -127,6 +241,17 @@ class HealthCaseCreate(BaseModel):
     category: Optional[str] = None
 
 
+class HealthCaseBulkItem(HealthCaseCreate):
+    # Stable per-case key from the client (e.g. its local queue id); resending
+    # the same key never creates a second case
+    idempotency_key: Optional[str] = Field(default=None, min_length=1, max_length=200)
+
+
+class HealthCaseBulkRequest(BaseModel):
+    # Items are validated one by one so a single bad entry does not reject the batch
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=500)
+
+
 class HealthCaseUpdate(BaseModel):
     symptoms: Optional[str] = None
     severity: Optional[str] = None
@@ -146,6 +271,156 @@ class HealthCaseResponse(BaseModel):
     updated_at: Optional[str] = None
 
 
+class HealthCaseBulkResult(BaseModel):
+    index: int
+    status: str  # created, duplicate or failed
+    case: Optional[HealthCaseResponse] = None
+    error: Optional[str] = None
+
+
+class HealthCaseBulkResponse(BaseModel):
+    created: int
+    duplicates: int
+    failed: int
+    results: List[HealthCaseBulkResult]
+
+
+class HealthCaseListItem(BaseModel):
+    """A (possibly projected) row from GET /api/cases; unselected columns are omitted."""
+    id: str
+    user_id: Optional[str] = None
+    symptoms: Optional[str] = None
+    ai_analysis: Optional[Dict[str, Any]] = None
+    severity: Optional[str] = None
+    category: Optional[str] = None
+    status: Optional[str] = None
+    created_at: str
+    updated_at: Optional[str] = None
+
+
+class CaseStatsCounts(BaseModel):
+    total: int = 0
+    severity: Dict[str, int] = {}
+    category: Dict[str, int] = {}
+    status: Dict[str, int] = {}
+
+
+class CaseStatsDay(CaseStatsCounts):
+    date: str
+
+
+class CaseStatsResponse(BaseModel):
+    scope: str
+    start: str
+    end: str
+    totals: CaseStatsCounts
+    days: List[CaseStatsDay]
+
+
+class CaseStatsRebuildResponse(BaseModel):
+    cases: int
+
+
+# Columns clients may request via `fields=`; id and created_at are always
+# returned because the pagination cursor is built from them
+CASE_COLUMNS = list(HealthCaseResponse.model_fields)
+CASE_SUMMARY_COLUMNS = [c for c in CASE_COLUMNS if c != "ai_analysis"]
+CASES_PAGE_DEFAULT = 50
+CASES_PAGE_MAX = 100
+CASES_BULK_CHUNK = 100
+
+# Namespace for deriving case ids from (user_id, idempotency_key)
+CASE_IDEMPOTENCY_NAMESPACE = uuid.UUID("6f1d7c52-2b0e-4f55-9a53-5c1f0f6e2a41")
+
+
+def _encode_case_cursor(row: Dict[str, Any]) -> str:
+    raw = json.dumps([row["created_at"], row["id"]]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_case_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, case_id = json.loads(raw)
+        # Both values are interpolated into a PostgREST filter, so only accept
+        # a real timestamp and UUID
+        datetime.fromisoformat(created_at)
+        uuid.UUID(case_id)
+        return created_at, case_id
+    except (binascii.Error, ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(
+            status_code=400,
+            detail={"code": "INVALID_CURSOR", "message": f"Invalid pagination cursor: {str(e)}"},
+        )
+
+
+def _apply_case_writes(rows: List[Dict[str, Any]], mirror: bool) -> None:
+    if mirror and case_replica.enabled:
+        case_replica.apply(rows)
+    case_stats.record(rows)
+
+
+async def _record_case_writes(user_id: str, rows: List[Dict[str, Any]], mirror: bool = True) -> None:
+    """
+    Propagate cases written through this API to the local read paths: the
+    replica (unless the row is only provisional), the stats rollups and the
+    user's read cache.
+    """
+    if rows:
+        try:
+            await run_in_threadpool(_apply_case_writes, rows, mirror)
+        except Exception as e:
+            logger.warning(f"Could not record case write locally: {str(e)}")
+    await _cache_io(case_cache.invalidate_user, user_id)
+
+
+async def _record_case_row(row: Dict[str, Any]) -> None:
+    await _record_case_writes(row["user_id"], [row])
+
+
+def _case_select_columns(fields: Optional[str], summary: bool) -> str:
+    if fields:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in requested if f not in CASE_COLUMNS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail={"code": "INVALID_FIELDS", "message": f"Unknown fields: {', '.join(unknown)}"},
+            )
+        columns = ["id", "created_at"] + [f for f in requested if f not in ("id", "created_at")]
+        if summary and "ai_analysis" in columns:
+            columns.remove("ai_analysis")
+        return ",".join(dict.fromkeys(columns))
+    if summary:
+        return ",".join(CASE_SUMMARY_COLUMNS)
+    return "*"
+
+
+def _case_etag(row: Dict[str, Any]) -> Optional[str]:
+    """Entity tag for a single case; it carries `updated_at` for If-Match checks."""
+    if not row.get("updated_at"):
+        return None
+    return f'"{row["updated_at"]}"'
+
+
+def _parse_if_match(if_match: str) -> Optional[str]:
+    """Return the expected `updated_at` from an If-Match header (None for `*`)."""
+    value = if_match.strip()
+    if value == "*":
+        return None
+    if value.startswith("W/"):
+        value = value[2:]
+    value = value.strip('"')
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail={"code": "INVALID_PRECONDITION", "message": "If-Match must be an ETag returned by this API"},
+        )
+    return value
+
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to MediLens Patient API"}
@@ -154,15 +429,123 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/ai")
+async def ai_health():
+    """Load and queue-wait metrics for AI model calls, plus result cache counters."""
+    return {
+        **ai_limiter.metrics(),
+        "analysis_cache": analysis_cache.stats(),
+        "image_cache": image_cache.stats(),
+        "single_flight": analysis_flights.stats(),
+    }
+
+
+def _ai_busy(e: AIBusyError) -> HTTPException:
+    return HTTPException(
+        status_code=e.status_code,
+        detail={"code": e.code, "message": e.message},
+        headers={"Retry-After": str(math.ceil(e.retry_after))},
+    )
+
+
+async def _run_ai(tenant: Optional[str], fn, *args):
+    """Run a blocking AI call on the bounded AI thread pool (429/503 when saturated)."""
+    try:
+        return await ai_limiter.run(tenant, fn, *args)
+    except AIBusyError as e:
+        raise _ai_busy(e)
+
+
+async def _cache_io(method, *args):
+    """
+    Call a cache method (`analysis_cache.get`, ...). When the cache has a
+    SQLite tier the call runs in the thread pool, so disk reads and writes
+    never block the event loop; memory-only caches are called inline.
+    """
+    if getattr(method.__self__, "persistent", True):
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+async def _shared_flight(key: str, fn):
+    """
+    Coalesce identical calls. `fn` uses the first caller's tenant for the AI
+    limiter, so when that caller is rejected (AIBusyError) the others retry
+    under their own tenant rather than inherit its 429/503.
+    """
+    try:
+        return await analysis_flights.do(key, fn, retry_on=(AIBusyError,))
+    except AIBusyError as e:
+        raise _ai_busy(e)
 
-@app.post("/api/analyze", response_model=AnalyzeResponse)
+
+async def _triage(tenant: Optional[str], symptoms: str) -> str:
+    """Text triage through the result cache; identical in-flight requests share one call."""
+    cache_key = triage_cache_key(symptoms)
+    cached = await _cache_io(analysis_cache.get, cache_key)
+    if cached is not None:
+        return cached
+
+    async def triage() -> str:
+        text = await ai_limiter.run(tenant, run_text_triage, symptoms)
+        if text != NO_ANALYSIS:
+            await _cache_io(analysis_cache.put, cache_key, text)
+        return text
+
+    return await _shared_flight(cache_key, triage)
+
+
+async def _local_verdict(user_id: str, symptoms: str) -> Optional[Dict[str, Any]]:
+    """The local triage verdict if it is confident enough to answer without the model."""
+    if not settings.LOCAL_TRIAGE_ENABLED:
+        return None
+    try:
+        profile = await run_in_threadpool(get_profile_by_id, user_id)
+    except Exception as e:
+        logger.warning(f"Profile lookup for local triage failed: {str(e)}")
+        profile = None
+    verdict = local_triage.assess(symptoms, profile)
+    if verdict["guidance"] and verdict["confidence"] >= settings.LOCAL_TRIAGE_MIN_CONFIDENCE:
+        return verdict
+    return None
+
+
+async def _defer_triage(user_id: str, symptoms: str) -> Optional[str]:
+    """Queue the full model analysis as a background job; its id, or None if not queued."""
+    if not settings.LOCAL_TRIAGE_DEFER_MINOR:
+        return None
+    try:
+        if await run_in_threadpool(analysis_jobs.count_active, user_id) >= settings.ANALYSIS_JOB_MAX_ACTIVE_PER_USER:
+            return None
+        if await run_in_threadpool(analysis_jobs.count_active) >= settings.ANALYSIS_JOB_MAX_QUEUED:
+            return None
+        job = await run_in_threadpool(
+            analysis_jobs.submit, user_id, "text", {"symptoms": symptoms}, None, NORMAL_LANE
+        )
+        return job["id"]
+    except Exception as e:
+        logger.error(f"Error deferring symptom analysis: {str(e)}")
+        return None
+
+
+@app.post("/api/analyze", response_model=AnalyzeResponse, response_model_exclude_none=True)
 async def analyze_issue(payload: AnalyzeRequest, current_user=Depends(get_current_user)):
     """
     Analyze user symptoms using Gemini AI with agno library.
     Note: This endpoint is for text-only analysis. Use /api/analyze-image for image analysis.
+
+    Local triage rules run first. A confident emergency verdict returns
+    emergency guidance at once, without calling the model; a confident
+    minor one returns self-care guidance (or the cached analysis) and
+    queues the full analysis as `analysis_job_id`. Both include `triage`.
     """
+    verdict = await _local_verdict(current_user["id"], payload.symptoms)
+    if verdict is not None and verdict["urgency"] == "emergency":
+        # Works even when the model is not configured
+        return AnalyzeResponse(analysis=verdict["guidance"], triage=verdict)
+
     # Check if Google/Gemini API key is configured
-    if not (os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")):
+    if not gemini_api_key():
         raise HTTPException(
             status_code=500,
             detail={
@@ -170,38 +553,20 @@ async def analyze_issue(payload: AnalyzeRequest, current_user=Depends(get_curren
                 "message": "Google/Gemini API key is not configured on the backend.",
             },
         )
+
+    if verdict is not None:
+        cached = await _cache_io(analysis_cache.get, triage_cache_key(payload.symptoms))
+        if cached is not None:
+            return AnalyzeResponse(analysis=cached, triage=verdict)
+        job_id = await _defer_triage(current_user["id"], payload.symptoms)
+        return AnalyzeResponse(analysis=verdict["guidance"], triage=verdict, analysis_job_id=job_id)
     
     try:
-        from agno.agent import Agent
-        from agno.models.google import Gemini
-        
-        # Initialize Gemini agent
-        api_key = os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
-        os.environ["GOOGLE_API_KEY"] = api_key
-        
-        agent = Agent(
-            model=Gemini(id="gemini-2.0-flash-exp"),
-            markdown=True
-        )
-        
-        # Create a simple text prompt
-        prompt = f"""You are a medical triage assistant. 
-        Analyze these symptoms and provide:
-        1. A concise summary
-        2. Possible causes
-        3. Urgency level
-        
-        Keep the answer under 200 words.
-        
-        Symptoms: {payload.symptoms}
-        """
-        
-        # Use Gemini's text generation
-        response = agent.run(prompt)
-        analysis_text = response.content if response and response.content else "Unable to generate analysis"
-        
+        analysis_text = await _triage(current_user["id"], payload.symptoms)
         return AnalyzeResponse(analysis=analysis_text)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in symptom analysis: {str(e)}")
         raise HTTPException(
@@ -209,6 +574,80 @@ async def analyze_issue(payload: AnalyzeRequest, current_user=Depends(get_curren
             detail={"code": "AI_BACKEND_ERROR", "message": f"AI analysis error: {str(e)}"},
         )
 
+# Producers of streamed analyses; held so they finish after a client disconnects
+_stream_producers: set = set()
+
+
+@app.post("/api/analyze/stream")
+async def analyze_issue_stream(
+    payload: AnalyzeRequest,
+    current_user=Depends(get_current_user),
+):
+    """
+    Stream the symptom analysis as server-sent events while Gemini writes it.
+
+    Emits `token` events ({"text": ...}) as chunks arrive, then one `done`
+    event with the full analysis, or an `error` event. When the client
+    disconnects the model stream is abandoned.
+    """
+    if not gemini_api_key():
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "code": "GEMINI_NOT_CONFIGURED",
+                "message": "Google/Gemini API key is not configured on the backend.",
+            },
+        )
+
+    cache_key = triage_cache_key(payload.symptoms)
+    cached = await _cache_io(analysis_cache.get, cache_key)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def on_text(text: str) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, ("token", {"text": text}))
+
+    async def produce() -> None:
+        try:
+            text = await _run_ai(current_user["id"], stream_text_triage, payload.symptoms, on_text, cancelled)
+            if not cancelled.is_set() and text != NO_ANALYSIS:
+                await _cache_io(analysis_cache.put, cache_key, text)
+            queue.put_nowait(("done", {"analysis": text}))
+        except HTTPException as e:
+            queue.put_nowait(("error", e.detail))
+        except Exception as e:
+            logger.error(f"Error in streamed symptom analysis: {str(e)}")
+            queue.put_nowait(("error", {"code": "AI_BACKEND_ERROR", "message": f"AI analysis error: {str(e)}"}))
+
+    def sse(event: str, data: Any) -> str:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    async def events():
+        if cached is not None:
+            yield sse("token", {"text": cached})
+            yield sse("done", {"analysis": cached})
+            return
+        # Not cancelled on disconnect: the worker thread stops at its next chunk
+        # and only then gives its AI slot back
+        producer = asyncio.create_task(produce())
+        _stream_producers.add(producer)
+        producer.add_done_callback(_stream_producers.discard)
+        try:
+            while True:
+                event, data = await queue.get()
+                yield sse(event, data)
+                if event != "token":
+                    return
+        finally:
+            cancelled.set()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.get("/api/profile", response_model=Profile)
 async def get_profile(current_user=Depends(get_current_user)):
     profile = get_profile_by_id(current_user["id"])
@@ -240,26 +679,78 @@ async def update_profile(profile: ProfileUpdate, current_user=Depends(get_curren
 
 # Health Cases Endpoints
 
-@app.post("/api/cases", response_model=HealthCaseResponse)
+async def _queue_case(case_data: Dict[str, Any]) -> JSONResponse:
+    """Accept a case into the local outbox and answer 202 with its provisional row."""
+    try:
+        row = await run_in_threadpool(case_outbox.enqueue, case_data)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={"code": "CASE_CREATE_ERROR", "message": f"Error queueing case: {str(e)}"},
+        )
+    await _record_case_writes(case_data["user_id"], [row], mirror=False)
+    return JSONResponse(status_code=202, content={**row, "sync_status": "pending"})
+
+
+@app.post(
+    "/api/cases",
+    response_model=HealthCaseResponse,
+    responses={202: {"description": "Accepted into the write-behind outbox; synced to Supabase shortly"}},
+)
 async def create_case(case: HealthCaseCreate, current_user=Depends(get_current_user)):
-    """Create a new health case for the current user."""
+    """
+    Create a new health case for the current user.
+
+    Returns 202 instead of 200 when the case is queued in the local outbox
+    (write-behind mode, Supabase slow or unreachable, or the user still has
+    queued cases that it must not overtake). The returned id is final.
+
+    When Gemini is configured the case is also queued for AI triage:
+    `ai_analysis` starts as {"status": "pending"} and is filled in by a
+    background worker (see GET /api/cases/{case_id}/analysis/stream).
+    """
+    case_data = {
+        "id": str(uuid.uuid4()),
+        "user_id": current_user["id"],
+        "symptoms": case.symptoms,
+        "severity": case.severity,
+        "category": case.category,
+        "status": "open",
+    }
+    analyze = case_analysis.enabled()
+    if analyze:
+        case_data["ai_analysis"] = {"status": "pending"}
+    if settings.CASE_WRITE_BEHIND or await run_in_threadpool(case_outbox.has_pending, current_user["id"]):
+        response = await _queue_case(case_data)
+        if analyze:
+            case_analysis.submit(case_data)
+        return response
+
     try:
-        case_data = {
-            "user_id": current_user["id"],
-            "symptoms": case.symptoms,
-            "severity": case.severity,
-            "category": case.category,
-            "status": "open",
-        }
-        
-        response = supabase.table("health_cases").insert(case_data).execute()
-        
+        try:
+            response = await supabase_pool.execute(
+                supabase_pool.table("health_cases").insert(case_data),
+                timeout=settings.CASE_DIRECT_WRITE_TIMEOUT_SECONDS,
+            )
+        except (SupabaseTimeoutError, httpx.TransportError) as e:
+            # The insert may still land; the outbox upsert ignores the duplicate id
+            logger.warning(f"Direct case insert unavailable, queueing in outbox: {str(e)}")
+            response = await _queue_case(case_data)
+            if analyze:
+                case_analysis.submit(case_data)
+            return response
+
         if not response.data:
             raise HTTPException(
                 status_code=400,
                 detail={"code": "CASE_CREATE_FAILED", "message": "Failed to create health case"},
             )
+        await _record_case_writes(current_user["id"], response.data)
+        if analyze:
+            case_analysis.submit(response.data[0])
         return response.data[0]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -267,46 +758,348 @@ async def create_case(case: HealthCaseCreate, current_user=Depends(get_current_u
         )
 
 
-@app.get("/api/cases", response_model=List[HealthCaseResponse])
-async def list_cases(current_user=Depends(get_current_user)):
-    """List all health cases for the current user."""
-    try:
-        response = (
-            supabase.table("health_cases")
-            .select("*")
-            .eq("user_id", current_user["id"])
-            .order("created_at", desc=True)
-            .execute()
+@app.post("/api/cases/bulk", response_model=HealthCaseBulkResponse)
+async def create_cases_bulk(payload: HealthCaseBulkRequest, current_user=Depends(get_current_user)):
+    """Create many health cases at once (e.g. a kiosk uploading its offline queue).
+
+    Valid items are inserted with one multi-row PostgREST call per chunk of
+    CASES_BULK_CHUNK. Items with an `idempotency_key` get a case id derived
+    from that key, so a retried upload reports them as `duplicate` instead
+    of creating them twice; a key repeated within one batch is a duplicate
+    of its first occurrence. Each item gets its own result entry.
+    """
+    results: List[Optional[HealthCaseBulkResult]] = [None] * len(payload.items)
+    pending = []  # (index, row)
+    first_index: Dict[str, int] = {}  # case id -> first item in this batch using it
+    replays = []  # (index, first index) for repeated idempotency keys
+    
+    for index, raw_item in enumerate(payload.items):
+        try:
+            item = HealthCaseBulkItem.model_validate(raw_item)
+        except ValidationError as e:
+            results[index] = HealthCaseBulkResult(index=index, status="failed", error=str(e.errors()[0]["msg"]))
+            continue
+        if item.idempotency_key:
+            case_id = uuid.uuid5(CASE_IDEMPOTENCY_NAMESPACE, f"{current_user['id']}:{item.idempotency_key}")
+        else:
+            case_id = uuid.uuid4()
+        if str(case_id) in first_index:
+            replays.append((index, first_index[str(case_id)]))
+            continue
+        first_index[str(case_id)] = index
+        pending.append((index, {
+            "id": str(case_id),
+            "user_id": current_user["id"],
+            "symptoms": item.symptoms,
+            "severity": item.severity,
+            "category": item.category,
+            "status": "open",
+        }))
+    
+    async def insert_rows(rows):
+        response = await supabase_pool.execute(
+            supabase_pool.table("health_cases").upsert(rows, on_conflict="id", ignore_duplicates=True)
         )
+        return {row["id"]: row for row in response.data or []}
+    
+    for start in range(0, len(pending), CASES_BULK_CHUNK):
+        chunk = pending[start:start + CASES_BULK_CHUNK]
+        try:
+            inserted = await insert_rows([row for _, row in chunk])
+        except Exception as e:
+            # Retry one by one so a single bad row only fails itself
+            logger.warning(f"Bulk case insert chunk failed, retrying per item: {str(e)}")
+            inserted = {}
+            for index, row in chunk:
+                try:
+                    inserted.update(await insert_rows([row]))
+                except Exception as item_error:
+                    results[index] = HealthCaseBulkResult(index=index, status="failed", error=str(item_error))
+        
+        duplicate_ids = [
+            row["id"] for index, row in chunk
+            if results[index] is None and row["id"] not in inserted
+        ]
+        existing = {}
+        if duplicate_ids:
+            try:
+                response = await supabase_pool.execute(
+                    supabase_pool.table("health_cases")
+                    .select("*")
+                    .eq("user_id", current_user["id"])
+                    .in_("id", duplicate_ids)
+                )
+                existing = {row["id"]: row for row in response.data or []}
+            except Exception as e:
+                logger.warning(f"Could not load existing cases for duplicate bulk items: {str(e)}")
         
-        return response.data or []
+        for index, row in chunk:
+            if results[index] is not None:
+                continue
+            if row["id"] in inserted:
+                results[index] = HealthCaseBulkResult(index=index, status="created", case=inserted[row["id"]])
+            else:
+                results[index] = HealthCaseBulkResult(index=index, status="duplicate", case=existing.get(row["id"]))
+    
+    for index, first in replays:
+        original = results[first]
+        if original.status == "failed":
+            results[index] = HealthCaseBulkResult(index=index, status="failed", error=original.error)
+        else:
+            results[index] = HealthCaseBulkResult(index=index, status="duplicate", case=original.case)
+    
+    if any(result.status == "created" for result in results):
+        await _record_case_writes(
+            current_user["id"],
+            [result.case.model_dump() for result in results if result.status == "created"],
+        )
+    
+    return HealthCaseBulkResponse(
+        created=sum(result.status == "created" for result in results),
+        duplicates=sum(result.status == "duplicate" for result in results),
+        failed=sum(result.status == "failed" for result in results),
+        results=results,
+    )
+
+
+@app.get(
+    "/api/cases",
+    response_model=List[HealthCaseListItem],
+    response_model_exclude_unset=True,
+)
+async def list_cases(
+    response: Response,
+    limit: int = Query(CASES_PAGE_DEFAULT, ge=1, le=CASES_PAGE_MAX),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    summary: bool = False,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user),
+):
+    """List the current user's health cases, newest first.
+
+    Results are keyset-paginated on (created_at, id). When more rows exist
+    the `X-Next-Cursor` response header holds the value to pass as `cursor`
+    for the next page. `fields` projects a comma-separated subset of columns
+    and `summary=true` leaves out the large `ai_analysis` column.
+
+    Pages are cached per user until that user's next write (or the cache
+    TTL), and carry an ETag so unchanged pages can be answered with 304.
+    """
+    columns = _case_select_columns(fields, summary)
+    cache_key = f"{limit}|{cursor or ''}|{columns}"
+    page = await _cache_io(case_cache.get_list, current_user["id"], cache_key)
+    if page is None:
+        cache_version = await _cache_io(case_cache.version, current_user["id"])
+        cursor_key = _decode_case_cursor(cursor) if cursor else None
+        replica_columns = CASE_COLUMNS if columns == "*" else columns.split(",")
+        rows = None
+        if case_replica.enabled and await run_in_threadpool(case_replica.is_fresh):
+            rows = await run_in_threadpool(
+                case_replica.list_cases, current_user["id"], replica_columns, cursor_key, limit + 1
+            )
+        if rows is None:
+            try:
+                query = (
+                    supabase_pool.table("health_cases")
+                    .select(columns)
+                    .eq("user_id", current_user["id"])
+                )
+                if cursor_key:
+                    created_at, case_id = cursor_key
+                    query = query.or_(
+                        f'created_at.lt."{created_at}",'
+                        f'and(created_at.eq."{created_at}",id.lt."{case_id}")'
+                    )
+                query = (
+                    query.order("created_at", desc=True)
+                    .order("id", desc=True)
+                    .limit(limit + 1)
+                )
+                result = await supabase_pool.execute(query)
+                rows = result.data or []
+            except Exception as e:
+                if not (case_replica.enabled and await run_in_threadpool(case_replica.is_available)):
+                    raise HTTPException(
+                        status_code=500,
+                        detail={"code": "CASES_FETCH_ERROR", "message": f"Error fetching cases: {str(e)}"},
+                    )
+                logger.warning(f"Serving cases from stale local replica: {str(e)}")
+                rows = await run_in_threadpool(
+                    case_replica.list_cases, current_user["id"], replica_columns, cursor_key, limit + 1
+                )
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_case_cursor(rows[-1])
+        page = await _cache_io(case_cache.put_list, current_user["id"], cache_key, cache_version, rows, next_cursor)
+
+    headers = {"ETag": page["etag"]}
+    if page["next_cursor"]:
+        headers["X-Next-Cursor"] = page["next_cursor"]
+    if etag_matches(if_none_match, page["etag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return page["rows"]
+
+
+def _require_stats_admin(current_user: Dict[str, Any]) -> None:
+    if (current_user.get("email") or "").lower() not in settings.case_stats_admin_emails:
+        raise HTTPException(
+            status_code=403,
+            detail={"code": "FORBIDDEN", "message": "Not allowed to view statistics for all users"},
+        )
+
+
+# Declared before /api/cases/{case_id} so "stats" is not taken for a case id
+@app.get("/api/cases/stats", response_model=CaseStatsResponse)
+async def get_case_stats(
+    days: int = Query(30, ge=1, le=366),
+    scope: str = Query("mine", pattern="^(mine|all)$"),
+    current_user=Depends(get_current_user),
+):
+    """Case counts per day by severity, category and status for the last `days` days.
+
+    Served from incrementally maintained rollups, so the cost depends only on
+    the date range. `scope=all` counts every user's cases and is limited to
+    CASE_STATS_ADMIN_EMAILS.
+    """
+    if scope == "all":
+        _require_stats_admin(current_user)
+    end = datetime.now(timezone.utc).date()
+    start = end - timedelta(days=days - 1)
+    try:
+        daily = await run_in_threadpool(
+            case_stats.daily, ALL_USERS if scope == "all" else current_user["id"], start, end
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail={"code": "CASES_FETCH_ERROR", "message": f"Error fetching cases: {str(e)}"},
+            detail={"code": "CASE_STATS_ERROR", "message": f"Error loading case stats: {str(e)}"},
         )
 
+    totals = CaseStatsCounts()
+    for day in daily:
+        totals.total += day["total"]
+        for dimension in DIMENSIONS:
+            bucket = getattr(totals, dimension)
+            for value, count in day[dimension].items():
+                bucket[value] = bucket.get(value, 0) + count
+    return CaseStatsResponse(
+        scope=scope,
+        start=start.isoformat(),
+        end=end.isoformat(),
+        totals=totals,
+        days=[CaseStatsDay(**day) for day in daily],
+    )
 
-@app.get("/api/cases/{case_id}", response_model=HealthCaseResponse)
-async def get_case(case_id: str, current_user=Depends(get_current_user)):
-    """Get a specific health case (user can only access their own)."""
+
+@app.post("/api/cases/stats/rebuild", response_model=CaseStatsRebuildResponse)
+async def rebuild_case_stats(current_user=Depends(get_current_user)):
+    """Recompute the case rollups from Supabase (admins only)."""
+    _require_stats_admin(current_user)
     try:
-        response = (
-            supabase.table("health_cases")
-            .select("*")
-            .eq("id", case_id)
-            .eq("user_id", current_user["id"])
-            .single()
-            .execute()
+        cases = await case_stats.rebuild(supabase_pool)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail={"code": "CASE_STATS_ERROR", "message": f"Error rebuilding case stats: {str(e)}"},
         )
-        
-        if not response.data:
+    return CaseStatsRebuildResponse(cases=cases)
+
+
+@app.get("/api/cases/{case_id}", response_model=HealthCaseResponse)
+async def get_case(
+    case_id: str,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user),
+):
+    """Get a specific health case (user can only access their own)."""
+    case = await _cache_io(case_cache.get_case, current_user["id"], case_id)
+    if case is None and case_replica.enabled and await run_in_threadpool(case_replica.is_fresh):
+        case = await run_in_threadpool(case_replica.get_case, current_user["id"], case_id)
+    if case is None:
+        cache_version = await _cache_io(case_cache.version, current_user["id"])
+        try:
+            result = await supabase_pool.execute(
+                supabase_pool.table("health_cases")
+                .select("*")
+                .eq("id", case_id)
+                .eq("user_id", current_user["id"])
+                .maybe_single()
+            )
+        except Exception as e:
+            pending = await run_in_threadpool(case_outbox.get_pending, current_user["id"], case_id)
+            if pending is not None:
+                return JSONResponse(content=pending)
+            if case_replica.enabled and await run_in_threadpool(case_replica.is_available):
+                case = await run_in_threadpool(case_replica.get_case, current_user["id"], case_id)
+                if case is not None:
+                    logger.warning(f"Serving case from stale local replica: {str(e)}")
+                    return case
             raise HTTPException(
-                status_code=404,
-                detail={"code": "CASE_NOT_FOUND", "message": "Health case not found"},
+                status_code=500,
+                detail={"code": "CASE_FETCH_ERROR", "message": f"Error fetching case: {str(e)}"},
             )
         
-        return response.data
+        if not result or not result.data:
+            pending = await run_in_threadpool(case_outbox.get_pending, current_user["id"], case_id)
+            if pending is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail={"code": "CASE_NOT_FOUND", "message": "Health case not found"},
+                )
+            # Still in the outbox (or dead-lettered there); never cache the provisional row
+            return JSONResponse(content=pending)
+        case = result.data
+        await _cache_io(case_cache.put_case, current_user["id"], cache_version, case)
+    
+    etag = _case_etag(case)
+    if etag:
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+    return case
+
+
+CASE_ANALYSIS_STREAM_TIMEOUT_SECONDS = 120.0
+CASE_ANALYSIS_POLL_SECONDS = 2.0
+
+
+@app.get("/api/cases/{case_id}/analysis/stream")
+async def stream_case_analysis(
+    case_id: str,
+    http_request: Request,
+    current_user=Depends(get_current_user),
+):
+    """Server-sent events for a case's AI analysis.
+
+    Emits one `analysis` event with the current `ai_analysis` value and,
+    while it is pending, another each time it changes, closing once it is
+    completed or failed (or after two minutes).
+    """
+    async def load_analysis() -> Any:
+        result = await supabase_pool.execute(
+            supabase_pool.table("health_cases")
+            .select("id,ai_analysis")
+            .eq("id", case_id)
+            .eq("user_id", current_user["id"])
+            .maybe_single()
+        )
+        if not result or not result.data:
+            pending = await run_in_threadpool(case_outbox.get_pending, current_user["id"], case_id)
+            if pending is None:
+                raise HTTPException(
+                    status_code=404,
+                    detail={"code": "CASE_NOT_FOUND", "message": "Health case not found"},
+                )
+            return pending.get("ai_analysis")
+        return result.data.get("ai_analysis")
+
+    try:
+        analysis = await load_analysis()
     except HTTPException:
         raise
     except Exception as e:
@@ -315,60 +1108,113 @@ async def get_case(case_id: str, current_user=Depends(get_current_user)):
             detail={"code": "CASE_FETCH_ERROR", "message": f"Error fetching case: {str(e)}"},
         )
 
+    def is_pending(value: Any) -> bool:
+        return isinstance(value, dict) and value.get("status") == "pending"
+
+    async def events():
+        nonlocal analysis
+        yield f"event: analysis\ndata: {json.dumps(analysis)}\n\n"
+        deadline = asyncio.get_running_loop().time() + CASE_ANALYSIS_STREAM_TIMEOUT_SECONDS
+        while is_pending(analysis) and asyncio.get_running_loop().time() < deadline:
+            if await http_request.is_disconnected():
+                return
+            # Wake as soon as a local worker finishes; otherwise poll upstream
+            if not await case_analysis.wait(case_id, CASE_ANALYSIS_POLL_SECONDS):
+                if case_analysis.is_tracked(case_id):
+                    yield ": keep-alive\n\n"
+                    continue
+                await asyncio.sleep(CASE_ANALYSIS_POLL_SECONDS)
+            try:
+                latest = await load_analysis()
+            except Exception as e:
+                logger.warning(f"Analysis stream could not reload case {case_id}: {str(e)}")
+                yield ": keep-alive\n\n"
+                continue
+            if latest != analysis:
+                analysis = latest
+                yield f"event: analysis\ndata: {json.dumps(analysis)}\n\n"
+        if is_pending(analysis):
+            yield "event: timeout\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @app.put("/api/cases/{case_id}", response_model=HealthCaseResponse)
-async def update_case(case_id: str, update: HealthCaseUpdate, current_user=Depends(get_current_user)):
-    """Update a health case (user can only update their own)."""
+async def update_case(
+    case_id: str,
+    update: HealthCaseUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    current_user=Depends(get_current_user),
+):
+    """Update a health case (user can only update their own).
+
+    Ownership is enforced by the update's own filters, so this is a single
+    `UPDATE ... RETURNING` round trip. Send the `ETag` from a previous read
+    as `If-Match` to fail with 412 instead of overwriting a newer edit.
+    """
+    # Build update data (only include fields that are not None)
+    update_data = {}
+    if update.symptoms is not None:
+        update_data["symptoms"] = update.symptoms
+    if update.severity is not None:
+        update_data["severity"] = update.severity
+    if update.category is not None:
+        update_data["category"] = update.category
+    if update.status is not None:
+        update_data["status"] = update.status
+    
+    if not update_data:
+        raise HTTPException(
+            status_code=400,
+            detail={"code": "NO_UPDATE_FIELDS", "message": "No fields to update provided"},
+        )
+    
+    expected_updated_at = _parse_if_match(if_match) if if_match else None
+    update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+    
     try:
-        # Verify ownership
-        check_response = (
-            supabase.table("health_cases")
-            .select("id")
+        query = (
+            supabase_pool.table("health_cases")
+            .update(update_data)
             .eq("id", case_id)
             .eq("user_id", current_user["id"])
-            .single()
-            .execute()
         )
+        if expected_updated_at:
+            query = query.eq("updated_at", expected_updated_at)
+        result = await supabase_pool.execute(query)
         
-        if not check_response.data:
+        if not result.data:
+            if expected_updated_at:
+                # Only the failure path pays a second round trip, to tell a
+                # stale precondition apart from a missing case
+                existing = await supabase_pool.execute(
+                    supabase_pool.table("health_cases")
+                    .select("id")
+                    .eq("id", case_id)
+                    .eq("user_id", current_user["id"])
+                    .maybe_single()
+                )
+                if existing and existing.data:
+                    raise HTTPException(
+                        status_code=412,
+                        detail={"code": "CASE_MODIFIED", "message": "Health case was modified since it was read"},
+                    )
             raise HTTPException(
                 status_code=404,
                 detail={"code": "CASE_NOT_FOUND", "message": "Health case not found or access denied"},
             )
         
-        # Build update data (only include fields that are not None)
-        update_data = {}
-        if update.symptoms is not None:
-            update_data["symptoms"] = update.symptoms
-        if update.severity is not None:
-            update_data["severity"] = update.severity
-        if update.category is not None:
-            update_data["category"] = update.category
-        if update.status is not None:
-            update_data["status"] = update.status
-        
-        if not update_data:
-            raise HTTPException(
-                status_code=400,
-                detail={"code": "NO_UPDATE_FIELDS", "message": "No fields to update provided"},
-            )
-        
-        # Perform update
-        response = (
-            supabase.table("health_cases")
-            .update(update_data)
-            .eq("id", case_id)
-            .eq("user_id", current_user["id"])
-            .execute()
-        )
-        
-        if not response.data:
-            raise HTTPException(
-                status_code=400,
-                detail={"code": "CASE_UPDATE_FAILED", "message": "Failed to update health case"},
-            )
-        
-        return response.data[0]
+        case = result.data[0]
+        await _record_case_writes(current_user["id"], [case])
+        etag = _case_etag(case)
+        if etag:
+            response.headers["ETag"] = etag
+        return case
     except HTTPException:
         raise
     except Exception as e:
@@ -428,6 +1274,103 @@ async def get_hospitals():
 
 # Medical Image Analysis Endpoints (Gemini with agno library)
 
+async def _analyze_image(tenant: Optional[str], image_bytes: bytes, symptoms: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Analyze an image, reusing the cached result of an identical or near-identical
+    upload. With `symptoms`, the answer also depends on the text, so it is cached
+    by exact image hash plus normalized symptoms instead.
+    """
+    try:
+        from models.analyzer import get_medical_analyzer
+    except ImportError:
+        from .models.analyzer import get_medical_analyzer
+
+    try:
+        phash = await run_in_threadpool(dhash, image_bytes)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail={"code": "IMAGE_TOO_LARGE", "message": str(e)})
+    except Exception:
+        # Not decodable here; the analyzer reports the error
+        phash = None
+    symptoms = (symptoms or "").strip() or None
+    if phash is None:
+        return await _run_ai(tenant, get_medical_analyzer().analyze, image_bytes, symptoms)
+    if symptoms:
+        flight_key = content_key("image", image_cache.version, f"{phash:016x}", normalize_symptoms(symptoms))
+        cached = await _cache_io(analysis_cache.get, flight_key)
+    else:
+        flight_key = f"image:{image_cache.version}:{phash:016x}"
+        cached = await _cache_io(image_cache.get, phash)
+    if cached is not None:
+        return dict(cached)
+
+    async def analyze() -> Dict[str, Any]:
+        # Shared analyzer; agents and the Gemini client are reused across requests
+        result = await ai_limiter.run(tenant, get_medical_analyzer().analyze, image_bytes, symptoms)
+        if result.get("success"):
+            if symptoms:
+                await _cache_io(analysis_cache.put, flight_key, result)
+            else:
+                await _cache_io(image_cache.put, phash, result)
+        return result
+
+    # Concurrent uploads of the same image (and symptoms) share one model call
+    return dict(await _shared_flight(flight_key, analyze))
+
+
+def _image_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail={
+            "code": "IMAGE_TOO_LARGE",
+            "message": f"Image exceeds the {settings.IMAGE_UPLOAD_MAX_BYTES // (1024 * 1024)} MB limit",
+        },
+    )
+
+
+def _decode_image_data(image: str) -> bytes:
+    """Decode a base64 image, with or without a data URI prefix (ValueError if invalid)."""
+    # The prefix is short; don't scan (or split) the whole payload for the comma
+    comma = image.find(",", 0, 256)
+    if comma != -1:
+        image = image[comma + 1:]
+    if len(image) * 3 // 4 > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise _image_too_large()
+    return base64.b64decode(image)
+
+
+async def _read_image_upload(file: UploadFile) -> bytes:
+    """
+    Read an uploaded image into memory, at most IMAGE_UPLOAD_MAX_BYTES.
+
+    The multipart parser has already spooled the part (to disk past 1 MB).
+    A declared size over the limit is rejected without reading; otherwise
+    the part is read back in chunks and the read stops as soon as it runs
+    past the limit, so an oversized part is never held in memory whole.
+    """
+    max_bytes = settings.IMAGE_UPLOAD_MAX_BYTES
+    if file.size is not None and file.size > max_bytes:
+        raise _image_too_large()
+    chunks = []
+    total = 0
+    while True:
+        chunk = await file.read(UPLOAD_READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise _image_too_large()
+        chunks.append(chunk)
+    # A single chunk is passed on as-is rather than copied by join
+    data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    if not data:
+        raise HTTPException(
+            status_code=400,
+            detail={"code": "INVALID_IMAGE_DATA", "message": "Uploaded image is empty"},
+        )
+    return data
+
+
 class ImageAnalysisRequest(BaseModel):
     """Request model for image analysis"""
     image: str  # Base64 encoded image
@@ -471,12 +1414,6 @@ async def analyze_medical_image_endpoint(
     ```
     """
     try:
-        # Import medical analyzer
-        try:
-            from models.analyzer import MedicalSymptomAnalyzer
-        except ImportError:
-            from .models.analyzer import MedicalSymptomAnalyzer
-        
         # Check if Google/Gemini API key is configured
         if not (os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")):
             raise HTTPException(
@@ -489,18 +1426,9 @@ async def analyze_medical_image_endpoint(
         
         logger.info(f"Image analysis requested by user: {current_user['id']}")
         
-        # Remove data URI prefix if present
-        image_data = request.image
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
+        image_bytes = _decode_image_data(request.image)
         
-        # Decode base64 to bytes
-        import base64
-        image_bytes = base64.b64decode(image_data)
-        
-        # Initialize analyzer and analyze
-        analyzer = MedicalSymptomAnalyzer()
-        result = analyzer.analyze(image_bytes)
+        result = await _analyze_image(current_user["id"], image_bytes)
         
         # Check for errors
         if "error" in result:
@@ -516,6 +1444,8 @@ async def analyze_medical_image_endpoint(
         
         return result
         
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error(f"Validation error in image analysis: {str(e)}")
         raise HTTPException(
@@ -536,20 +1466,175 @@ async def analyze_medical_image_endpoint(
         )
 
 
-@app.post("/api/analyze-image-public")
-async def analyze_medical_image_public(request: ImageAnalysisRequest):
+@app.post("/api/analyze-image/upload")
+async def analyze_medical_image_upload(
+    file: UploadFile = File(...),
+    symptoms: Optional[str] = Form(None),
+    current_user=Depends(get_current_user),
+):
+    """
+    Multipart variant of /api/analyze-image: send the image as a file part
+    (`file`) instead of base64 JSON. Avoids the base64 size overhead and the
+    extra decoded copy; images over IMAGE_UPLOAD_MAX_BYTES get a 413.
+
+    **Authentication Required:** Yes (Bearer token)
+
+    **Example Usage:**
+    ```python
+    files = {'file': open('rash.jpg', 'rb')}
+    response = requests.post(
+        'http://localhost:5000/api/analyze-image/upload',
+        files=files,
+        data={'symptoms': 'Itchy rash since yesterday'},
+        headers={'Authorization': 'Bearer <token>'}
+    )
+    ```
+    """
+    if not (os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")):
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "code": "GEMINI_NOT_CONFIGURED",
+                "message": "Google/Gemini API key is not configured on the backend"
+            }
+        )
+    if file.content_type and not file.content_type.startswith("image/"):
+        raise HTTPException(
+            status_code=400,
+            detail={"code": "INVALID_FILE_TYPE", "message": f"Expected an image, got {file.content_type}"},
+        )
+
+    try:
+        image_bytes = await _read_image_upload(file)
+        logger.info(f"Image upload analysis requested by user: {current_user['id']} ({len(image_bytes)} bytes)")
+        result = await _analyze_image(current_user["id"], image_bytes, symptoms)
+        if "error" in result:
+            raise HTTPException(
+                status_code=500,
+                detail={
+                    "code": "ANALYSIS_ERROR",
+                    "message": result.get("message", "Failed to analyze image")
+                }
+            )
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in image upload analysis: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={"code": "IMAGE_ANALYSIS_ERROR", "message": f"Failed to analyze image: {str(e)}"},
+        )
+    finally:
+        await file.close()
+
+
+def _check_image_header(image_bytes: bytes) -> None:
+    """Reject an undecodable or oversized image from its header alone."""
+    try:
+        open_image(image_bytes)
+    except ImageTooLargeError as e:
+        raise HTTPException(status_code=413, detail={"code": "IMAGE_TOO_LARGE", "message": str(e)})
+    except Exception:
+        raise HTTPException(
+            status_code=400,
+            detail={"code": "INVALID_IMAGE_DATA", "message": "Invalid image format"},
+        )
+
+
+@app.post("/api/analyze-images")
+async def analyze_medical_images(
+    files: List[UploadFile] = File(...),
+    symptoms: Optional[str] = Form(None),
+    current_user=Depends(get_current_user),
+):
+    """
+    Analyze several photos of one case (e.g. a wound over several days) in a
+    single model call. Send each image as a `files` part, in order; up to
+    IMAGE_BATCH_MAX_IMAGES per request. Images are decoded and checked in
+    parallel worker processes, and the response has one `image_quality`
+    entry per image. An optional `symptoms` field is given to the model as
+    context. Batch results are not cached.
+
+    **Authentication Required:** Yes (Bearer token)
+
+    **Example Usage:**
+    ```python
+    files = [('files', open('day1.jpg', 'rb')), ('files', open('day3.jpg', 'rb'))]
+    response = requests.post(
+        'http://localhost:5000/api/analyze-images',
+        files=files,
+        data={'symptoms': 'Burn on forearm, healing'},
+        headers={'Authorization': 'Bearer <token>'}
+    )
+    ```
+    """
+    try:
+        from models.analyzer import get_medical_analyzer
+    except ImportError:
+        from .models.analyzer import get_medical_analyzer
+
+    try:
+        if not (os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")):
+            raise HTTPException(
+                status_code=500,
+                detail={
+                    "code": "GEMINI_NOT_CONFIGURED",
+                    "message": "Google/Gemini API key is not configured on the backend"
+                }
+            )
+        if not 1 <= len(files) <= settings.IMAGE_BATCH_MAX_IMAGES:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "code": "INVALID_IMAGE_COUNT",
+                    "message": f"Send between 1 and {settings.IMAGE_BATCH_MAX_IMAGES} images",
+                },
+            )
+        for file in files:
+            if file.content_type and not file.content_type.startswith("image/"):
+                raise HTTPException(
+                    status_code=400,
+                    detail={"code": "INVALID_FILE_TYPE", "message": f"Expected an image, got {file.content_type}"},
+                )
+
+        images = [await _read_image_upload(file) for file in files]
+        for image_bytes in images:
+            _check_image_header(image_bytes)
+        logger.info(f"Batch image analysis requested by user: {current_user['id']} ({len(images)} images)")
+
+        result = await _run_ai(current_user["id"], get_medical_analyzer().analyze_many, images, symptoms)
+        if "error" in result:
+            raise HTTPException(
+                status_code=500,
+                detail={
+                    "code": "ANALYSIS_ERROR",
+                    "message": result.get("message", "Failed to analyze images")
+                }
+            )
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in batch image analysis: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={"code": "IMAGE_ANALYSIS_ERROR", "message": f"Failed to analyze images: {str(e)}"},
+        )
+    finally:
+        for file in files:
+            await file.close()
+
+
+@app.post("/api/analyze-image-public", dependencies=[Depends(limit_public_analysis)])
+async def analyze_medical_image_public(request: ImageAnalysisRequest, http_request: Request):
     """
     Public endpoint for image analysis (no authentication required)
     
     This is useful for testing or allowing users to try the service
-    before signing up. Consider adding rate limiting in production.
+    before signing up. Requests are rate limited per client IP.
     """
     try:
-        try:
-            from models.analyzer import MedicalSymptomAnalyzer
-        except ImportError:
-            from .models.analyzer import MedicalSymptomAnalyzer
-        
         if not (os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")):
             raise HTTPException(
                 status_code=500,
@@ -561,18 +1646,9 @@ async def analyze_medical_image_public(request: ImageAnalysisRequest):
         
         logger.info("Public image analysis requested")
         
-        # Remove data URI prefix if present
-        image_data = request.image
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
-        
-        # Decode base64 to bytes
-        import base64
-        image_bytes = base64.b64decode(image_data)
+        image_bytes = _decode_image_data(request.image)
         
-        # Initialize analyzer and analyze
-        analyzer = MedicalSymptomAnalyzer()
-        result = analyzer.analyze(image_bytes)
+        result = await _analyze_image(f"ip:{get_client_ip(http_request)}", image_bytes)
         
         # Check for errors
         if "error" in result:
@@ -588,6 +1664,8 @@ async def analyze_medical_image_public(request: ImageAnalysisRequest):
         
         return result
         
+    except HTTPException:
+        raise
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(
@@ -604,6 +1682,105 @@ async def analyze_medical_image_public(request: ImageAnalysisRequest):
 
 
 
+# Asynchronous Analysis Job Endpoints
+
+class AnalysisJobRequest(BaseModel):
+    """Asynchronous analysis submission: an image (base64), symptoms, or both"""
+    image: Optional[str] = None
+    symptoms: Optional[str] = None
+
+
+async def _run_analysis_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one queued analysis job (no tenant: the job workers bound their own load)."""
+    if job["kind"] == "image":
+        result = await _analyze_image(None, job["payload"], job["input"].get("symptoms"))
+        if "error" in result:
+            raise RuntimeError(result.get("message", "Failed to analyze image"))
+        return result
+    return {"analysis": await _triage(None, job["input"]["symptoms"])}
+
+
+@app.post("/api/analysis-jobs", status_code=202)
+async def create_analysis_job(
+    request: AnalysisJobRequest,
+    response: Response,
+    current_user=Depends(get_current_user),
+):
+    """
+    Queue an image or symptom analysis and return its job id right away.
+
+    Poll GET /api/analysis-jobs/{id} for the result. Submissions whose
+    symptoms look like an emergency are processed ahead of the others.
+    """
+    if not gemini_api_key():
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "code": "GEMINI_NOT_CONFIGURED",
+                "message": "Google/Gemini API key is not configured on the backend",
+            },
+        )
+    if not request.image and not (request.symptoms or "").strip():
+        raise HTTPException(
+            status_code=400,
+            detail={"code": "INVALID_ANALYSIS_JOB", "message": "Provide an image, symptoms, or both"},
+        )
+
+    image_bytes = None
+    if request.image:
+        try:
+            image_bytes = _decode_image_data(request.image)
+        except (binascii.Error, ValueError) as e:
+            raise HTTPException(
+                status_code=400,
+                detail={"code": "INVALID_IMAGE_DATA", "message": str(e)},
+            )
+
+    user_id = current_user["id"]
+    if await run_in_threadpool(analysis_jobs.count_active, user_id) >= settings.ANALYSIS_JOB_MAX_ACTIVE_PER_USER:
+        raise HTTPException(
+            status_code=429,
+            detail={"code": "ANALYSIS_JOBS_LIMIT", "message": "Too many analyses in progress; wait for one to finish"},
+            headers={"Retry-After": "10"},
+        )
+    if await run_in_threadpool(analysis_jobs.count_active) >= settings.ANALYSIS_JOB_MAX_QUEUED:
+        raise HTTPException(
+            status_code=503,
+            detail={"code": "ANALYSIS_QUEUE_FULL", "message": "Analysis queue is full; try again shortly"},
+            headers={"Retry-After": "30"},
+        )
+
+    try:
+        job = await run_in_threadpool(
+            analysis_jobs.submit,
+            user_id,
+            "image" if image_bytes is not None else "text",
+            {"symptoms": request.symptoms},
+            image_bytes,
+            lane_for(request.symptoms),
+        )
+    except Exception as e:
+        logger.error(f"Error queueing analysis job: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail={"code": "ANALYSIS_JOB_ERROR", "message": f"Error queueing analysis: {str(e)}"},
+        )
+    response.headers["Location"] = f"/api/analysis-jobs/{job['id']}"
+    return job
+
+
+@app.get("/api/analysis-jobs/{job_id}")
+async def get_analysis_job(job_id: str, current_user=Depends(get_current_user)):
+    """Status of an analysis job: queued, running, completed (with `result`) or failed (with `error`)."""
+    job = await run_in_threadpool(analysis_jobs.get, current_user["id"], job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"code": "ANALYSIS_JOB_NOT_FOUND", "message": "Analysis job not found"},
+        )
+    return job
+
+
 # Voice Transcription Endpoint (Whisper)
 
 # Load Whisper model on startup (lazy loading to avoid startup delay)
@@ -754,13 +1931,17 @@ async def transcribe_audio(
                 logger.warning(f"Failed to remove temp file: {str(e)}")
 
 
-@app.post("/api/transcribe-public", response_model=TranscriptionResponse)
+@app.post(
+    "/api/transcribe-public",
+    response_model=TranscriptionResponse,
+    dependencies=[Depends(limit_public_transcription)],
+)
 async def transcribe_audio_public(file: UploadFile = File(...)):
     """
     Public endpoint for audio transcription (no authentication required)
     
     This is useful for testing or allowing users to try the service
-    before signing up. Consider adding rate limiting in production.
+    before signing up. Requests are rate limited per client IP.
     """
     # Validate file type
     allowed_extensions = ['.wav', '.mp3', '.m4a', '.flac', '.ogg', '.webm']
@@ -1,91 +1,83 @@
-import os
 import json
-import tempfile
-from PIL import Image as PILImage
-from agno.agent import Agent
-from agno.models.google import Gemini
+import threading
+import numpy as np
 from agno.tools.duckduckgo import DuckDuckGoTools
 from agno.media import Image as AgnoImage
+from .clients import get_agent, get_api_key
+from .decoding import decode_for_model, encode_jpeg
 from .processor import ImageProcessor
+from .prompts import IMAGE_ANALYSIS_PROMPT, IMAGE_BATCH_PROMPT, IMAGE_MODEL_ID, with_symptoms
+
+# The resized image is sent inline as a JPEG; at this width quality 85 keeps
+# visible detail at a fraction of the PNG size
+MODEL_IMAGE_WIDTH = 500
+MODEL_IMAGE_QUALITY = 85
+
 
 class MedicalSymptomAnalyzer:
     def __init__(self):
-        # Initialize Gemini API key
-        api_key = os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
-        if not api_key:
+        if not get_api_key():
             raise ValueError("GOOGLE_API_KEY or GEMINI_API_KEY environment variable is not set")
         
-        os.environ["GOOGLE_API_KEY"] = api_key
-        
-        # Initialize the Medical Agent with Gemini
-        self.medical_agent = Agent(
-            model=Gemini(id="gemini-2.0-flash-exp"),
-            tools=[DuckDuckGoTools()],
-            markdown=True
-        )
-        
         self.processor = ImageProcessor()
 
-    def analyze(self, image_bytes):
+    @property
+    def medical_agent(self):
+        """The calling thread's medical imaging agent (shares the process-wide Gemini client)."""
+        return get_agent(
+            "medical_imaging",
+            IMAGE_MODEL_ID,
+            tools_factory=lambda: [DuckDuckGoTools()],
+            markdown=True,
+        )
+
+    def prepare_image(self, image):
+        """Encode the (decoded, or raw bytes of the) upload in memory as a JPEG for the model."""
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = decode_for_model(image, MODEL_IMAGE_WIDTH)
+        return AgnoImage(content=encode_jpeg(image, MODEL_IMAGE_QUALITY), format="jpeg", mime_type="image/jpeg")
+
+    def assess_image(self, image):
+        """Brightness/contrast report of the decoded upload (None if it fails)."""
+        try:
+            rgb = np.asarray(image if image.mode == "RGB" else image.convert("RGB"))
+            return self.processor.quality(rgb)
+        except Exception:
+            return None
+
+    def analyze(self, image_bytes, symptoms=None):
         """
         Analyzes the medical image and returns a structured summary using Gemini AI.
+        `symptoms` (the patient's description) is added to the prompt as context.
+        """
+        def prepare():
+            # Decode once (reduced scale, upright) for both the model and the quality check
+            decoded = decode_for_model(image_bytes, MODEL_IMAGE_WIDTH)
+            return [self.prepare_image(decoded)], self.assess_image(decoded)
+
+        return self._analyze(with_symptoms(IMAGE_ANALYSIS_PROMPT, symptoms), prepare)
+
+    def analyze_many(self, images, symptoms=None):
+        """
+        Analyzes several images of one case (e.g. a wound over time) in a
+        single model call. Decoding, JPEG encoding and the quality check run
+        in parallel across processes; `image_quality` is a list, one per image.
+        `symptoms` is added to the prompt as context, as in `analyze`.
         """
-        # Medical Analysis Query
-        query = """You are a highly skilled medical imaging expert with extensive knowledge in radiology and diagnostic imaging. 
-Analyze the medical image and provide a structured JSON response with the following fields:
-
-{
-    "analysis_text": "brief summary of what you observe in the image",
-    "detected_symptoms": [
-        {
-            "symptom_name": "name of symptom",
-            "severity": "low / medium / high",
-            "description": "brief description"
-        }
-    ],
-    "possible_conditions": ["list of potential conditions based on visible symptoms"],
-    "urgency_level": "low / medium / high / emergency",
-    "recommendations": ["specific action advice for the patient"],
-    "disclaimer": "This is not a medical diagnosis. Please consult a healthcare professional."
-}
-
-Guidelines:
-- Focus ONLY on what is visible in the image
-- Do not hallucinate details not present
-- Use simple but professional medical language
-- Be specific about visible symptoms
-- Provide actionable recommendations
-- Set urgency_level based on severity: emergency for critical, high for urgent, medium for moderate, low for minor
-- Always include the medical disclaimer
-
-Return ONLY valid JSON, no additional text or markdown."""
+        def prepare():
+            encoded, image_quality = self.processor.prepare_batch(images, MODEL_IMAGE_WIDTH, MODEL_IMAGE_QUALITY)
+            agno_images = [AgnoImage(content=content, format="jpeg", mime_type="image/jpeg") for content in encoded]
+            return agno_images, image_quality
+
+        return self._analyze(with_symptoms(IMAGE_BATCH_PROMPT.format(count=len(images)), symptoms), prepare)
 
+    def _analyze(self, query, prepare):
+        """Run the agent on the images from `prepare()` and normalize its JSON answer."""
         try:
-            # Save image bytes to temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as temp_file:
-                # Convert bytes to PIL Image
-                from io import BytesIO
-                pil_image = PILImage.open(BytesIO(image_bytes))
-                
-                # Resize image for optimal processing
-                width, height = pil_image.size
-                aspect_ratio = width / height
-                new_width = 500
-                new_height = int(new_width / aspect_ratio)
-                resized_image = pil_image.resize((new_width, new_height))
-                
-                # Save to temp file
-                resized_image.save(temp_file.name)
-                temp_path = temp_file.name
-            
-            # Create AgnoImage object
-            agno_image = AgnoImage(filepath=temp_path)
+            agno_images, image_quality = prepare()
             
             # Run AI analysis
-            response = self.medical_agent.run(query, images=[agno_image])
-            
-            # Clean up temporary file
-            os.remove(temp_path)
+            response = self.medical_agent.run(query, images=agno_images)
             
             # Parse response content
             content = response.content
@@ -134,6 +126,9 @@ Return ONLY valid JSON, no additional text or markdown."""
             if "disclaimer" not in result_json:
                 result_json["disclaimer"] = "This is not a medical diagnosis. Please consult a healthcare professional."
             
+            if image_quality is not None:
+                result_json["image_quality"] = image_quality
+            
             # Add success flag
             result_json["success"] = True
             
@@ -163,3 +158,17 @@ Return ONLY valid JSON, no additional text or markdown."""
                 "recommendations": ["Please try again or consult a healthcare professional"],
                 "disclaimer": "This is not a medical diagnosis. Please consult a healthcare professional."
             }
+
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+
+def get_medical_analyzer():
+    """The process-wide MedicalSymptomAnalyzer, created on first use."""
+    global _analyzer
+    if _analyzer is None:
+        with _analyzer_lock:
+            if _analyzer is None:
+                _analyzer = MedicalSymptomAnalyzer()
+    return _analyzer
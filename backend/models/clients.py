@@ -0,0 +1,74 @@
+"""
+Process-wide Gemini clients shared by every analysis code path.
+
+The google-genai client (and its HTTP connection pool) is created once per
+process, on first use. agno Agents keep per-run state and are not safe to
+share between concurrent runs, so each worker thread gets its own Agent
+per role, built once and wrapping a model that reuses the shared client.
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional
+
+_lock = threading.Lock()
+_genai_client: Any = None
+_client_key: Optional[str] = None
+_local = threading.local()
+
+
+def get_api_key() -> Optional[str]:
+    return os.environ.get("GOOGLE_API_KEY") or os.environ.get("GEMINI_API_KEY")
+
+
+def get_genai_client() -> Any:
+    """The shared google-genai client, created exactly once per API key."""
+    global _genai_client, _client_key
+    api_key = get_api_key()
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY or GEMINI_API_KEY environment variable is not set")
+    client = _genai_client
+    if client is not None and _client_key == api_key:
+        return client
+    with _lock:
+        if _genai_client is None or _client_key != api_key:
+            from agno.models.google import Gemini
+
+            # Let agno build the client so it picks up the same options
+            # (Vertex settings, client headers) it would use on its own
+            _genai_client = Gemini(api_key=api_key).get_client()
+            _client_key = api_key
+        return _genai_client
+
+
+def get_agent(role: str, model_id: str, tools_factory=None, **agent_kwargs) -> Any:
+    """
+    This thread's Agent for `role`, created on first use.
+
+    `tools_factory` builds the agent's tools (once per thread); the other
+    keyword arguments are passed to `Agent`.
+    """
+    client = get_genai_client()
+    agents: Dict[str, Any] = getattr(_local, "agents", None)
+    if agents is None:
+        agents = _local.agents = {}
+    cached = agents.get(role)
+    if cached is not None and cached[0] is client:
+        return cached[1]
+
+    from agno.agent import Agent
+    from agno.models.google import Gemini
+
+    if tools_factory is not None:
+        agent_kwargs["tools"] = tools_factory()
+    agent = Agent(model=Gemini(id=model_id, client=client), **agent_kwargs)
+    agents[role] = (client, agent)
+    return agent
+
+
+def reset_clients() -> None:
+    """Drop the shared client; every thread rebuilds its agents on next use."""
+    global _genai_client, _client_key
+    with _lock:
+        _genai_client = None
+        _client_key = None
@@ -1,77 +1,268 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
 import cv2
 import numpy as np
-from PIL import Image
-import io
+
+from .decoding import decode_for_model, decode_scaled, encode_jpeg
+
+# Upper bound on one prepare_batch call, so a hung worker cannot hold the
+# request (and its AI slot) forever
+PREPARE_TIMEOUT_SECONDS = 30.0
+
 
 class ImageProcessor:
-    def __init__(self, target_size=(336, 336)):
+    """
+    Reusable preprocessing stage for medical images:
+    - Resize with padding (letterbox) to `target_size`
+    - Enhance contrast (CLAHE on the L channel)
+    - Normalize (ImageNet mean/std) into float32 RGB
+
+    One instance can be shared by all threads: each thread keeps its own
+    CLAHE object and scratch buffers, and output goes into float32 arrays
+    that can be preallocated (see `allocate`) and batched as (N, H, W, 3).
+
+    The analysis path only needs the model JPEG and an exposure check of the
+    original pixels (`quality`), so it uses `prepare_batch` rather than the
+    normalized tensors.
+    """
+
+    MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+    STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+    def __init__(self, target_size=(336, 336), clip_limit=2.0, tile_grid_size=(8, 8)):
         self.target_size = target_size
+        self.clip_limit = clip_limit
+        self.tile_grid_size = tile_grid_size
+        self._local = threading.local()
+        # (x / 255 - mean) / std == x * scale - offset, done in place in float32
+        self._scale = (1.0 / (255.0 * self.STD)).astype(np.float32)
+        self._offset = (self.MEAN / self.STD).astype(np.float32)
+
+    def _scratch(self):
+        """This thread's CLAHE instance and uint8 work buffers."""
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None:
+            th, tw = self.target_size
+            scratch = self._local.scratch = {
+                "clahe": cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.tile_grid_size),
+                "canvas": np.zeros((th, tw, 3), dtype=np.uint8),
+                "lab": np.empty((th, tw, 3), dtype=np.uint8),
+                "l": np.empty((th, tw), dtype=np.uint8),
+                "l_eq": np.empty((th, tw), dtype=np.uint8),
+            }
+        return scratch
+
+    def allocate(self, count=None):
+        """Output buffer for one image (H, W, 3) or a batch (N, H, W, 3)."""
+        th, tw = self.target_size
+        shape = (th, tw, 3) if count is None else (count, th, tw, 3)
+        return np.empty(shape, dtype=np.float32)
 
-    def preprocess(self, image_bytes):
+    def decode(self, image_bytes):
+        """Decode image bytes to an upright RGB uint8 array (JPEGs at reduced scale)."""
+        try:
+            image = decode_scaled(image_bytes, self.target_size)
+        except OSError as e:
+            raise ValueError("Invalid image format") from e
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return np.asarray(image)
+
+    def preprocess(self, image, out=None):
         """
-        Preprocess the input image bytes for medical analysis.
-        - Resize
-        - Enhance contrast (CLAHE)
-        - Normalize
+        Preprocess one image (encoded bytes or an RGB uint8 array) into a
+        normalized float32 (H, W, 3) array, written into `out` if given.
         """
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise ValueError("Invalid image format")
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = self.decode(image)
+        if out is None:
+            out = self.allocate()
+
+        scratch = self._scratch()
+        canvas = scratch["canvas"]
 
         # 1. Resize while maintaining aspect ratio (padding)
-        image = self._resize_with_padding(image, self.target_size)
+        self._resize_with_padding(image, canvas)
 
         # 2. Enhance contrast using CLAHE (Contrast Limited Adaptive Histogram Equalization)
         # This is particularly useful for medical images like X-rays or skin lesions
-        image = self._enhance_contrast(image)
+        self._enhance_contrast(canvas, scratch)
+
+        # 3. Normalize (standard ImageNet mean/std) in place, staying in float32
+        np.multiply(canvas, self._scale, out=out)
+        np.subtract(out, self._offset, out=out)
+        return out
+
+    def preprocess_batch(self, images, out=None):
+        """Preprocess several images into one float32 (N, H, W, 3) array."""
+        if out is None:
+            out = self.allocate(len(images))
+        for index, image in enumerate(images):
+            self.preprocess(image, out=out[index])
+        return out
+
+    def prepare_batch(self, images, model_width, jpeg_quality, executor=None):
+        """
+        Decode several encoded images in parallel and prepare them for the model.
+
+        Each image is handled by a worker process (`executor`, default: the
+        shared pool from `get_process_pool`), which decodes it once, encodes
+        the model-sized JPEG and measures its `quality`; only those bytes and
+        the small report come back, never pixel arrays. Returns
+        `(jpegs, qualities)` in input order; a single image is processed inline.
+        If a worker of the shared pool dies, the pool is replaced and the
+        batch retried once; raises TimeoutError after PREPARE_TIMEOUT_SECONDS.
+        """
+        count = len(images)
+        if count == 0:
+            return [], []
+        if count == 1 and executor is None:
+            jpeg, image_quality = _prepare_one(self, images[0], model_width, jpeg_quality)
+            return [jpeg], [image_quality]
+        if executor is not None:
+            return self._run_batch(executor, images, model_width, jpeg_quality)
 
-        # 3. Normalize (standardize pixel values)
-        # Convert to float32 for processing
-        image_float = image.astype(np.float32) / 255.0
-        
-        # Standard ImageNet normalization (optional, depending on model)
-        mean = np.array([0.485, 0.456, 0.406])
-        std = np.array([0.229, 0.224, 0.225])
-        image_normalized = (image_float - mean) / std
+        pool = get_process_pool()
+        try:
+            return self._run_batch(pool, images, model_width, jpeg_quality)
+        except BrokenProcessPool:
+            # A worker was killed (e.g. out of memory); the pool stays broken
+            # until it is replaced
+            discard_process_pool(pool)
+        pool = get_process_pool()
+        try:
+            return self._run_batch(pool, images, model_width, jpeg_quality)
+        except BrokenProcessPool:
+            discard_process_pool(pool)
+            raise
 
-        return image_normalized
+    def _run_batch(self, executor, images, model_width, jpeg_quality):
+        config = (self.target_size, self.clip_limit, self.tile_grid_size)
+        futures = [
+            executor.submit(_prepare_worker, config, bytes(image), model_width, jpeg_quality)
+            for image in images
+        ]
+        _, pending = wait(futures, timeout=PREPARE_TIMEOUT_SECONDS)
+        if pending:
+            for future in pending:
+                future.cancel()
+            raise TimeoutError(f"Image preprocessing took longer than {PREPARE_TIMEOUT_SECONDS}s")
+        results = [future.result() for future in futures]
+        return [jpeg for jpeg, _ in results], [image_quality for _, image_quality in results]
 
-    def _resize_with_padding(self, image, target_size):
+    def content_box(self, height, width):
+        """(top, left, bottom, right) of an image of this size inside the padded output."""
+        th, tw = self.target_size
+        scale = min(tw / width, th / height)
+        nw, nh = max(1, int(width * scale)), max(1, int(height * scale))
+        dy, dx = (th - nh) // 2, (tw - nw) // 2
+        return dy, dx, dy + nh, dx + nw
+
+    def _resize_with_padding(self, image, canvas):
         h, w = image.shape[:2]
-        th, tw = target_size
-        
-        # Scale factor
-        scale = min(tw/w, th/h)
-        nw, nh = int(w * scale), int(h * scale)
-        
-        image_resized = cv2.resize(image, (nw, nh))
-        
-        # Create a new canvas with padding (black)
-        canvas = np.zeros((th, tw, 3), dtype=np.uint8)
-        
-        # Center the image on the canvas
-        dx, dy = (tw - nw) // 2, (th - nh) // 2
-        canvas[dy:dy+nh, dx:dx+nw] = image_resized
-        
+        top, left, bottom, right = self.content_box(h, w)
+
+        # INTER_AREA when shrinking avoids aliasing; bilinear when enlarging
+        interpolation = cv2.INTER_AREA if (right - left) < w else cv2.INTER_LINEAR
+        image_resized = cv2.resize(image, (right - left, bottom - top), interpolation=interpolation)
+
+        # Center the image on the (black) canvas
+        canvas.fill(0)
+        canvas[top:bottom, left:right] = image_resized
         return canvas
 
-    def _enhance_contrast(self, image):
+    def _enhance_contrast(self, canvas, scratch):
         # Convert to LAB color space to apply CLAHE on the L-channel
-        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        cl = clahe.apply(l)
-        
-        limg = cv2.merge((cl, a, b))
-        final_image = cv2.cvtColor(limg, cv2.COLOR_LAB2BGR)
-        
-        return final_image
+        lab = cv2.cvtColor(canvas, cv2.COLOR_RGB2LAB, dst=scratch["lab"])
+        cv2.extractChannel(lab, 0, dst=scratch["l"])
+        scratch["clahe"].apply(scratch["l"], dst=scratch["l_eq"])
+        cv2.insertChannel(scratch["l_eq"], lab, 0)
+        cv2.cvtColor(lab, cv2.COLOR_LAB2RGB, dst=canvas)
+        return canvas
+
+    def quality(self, image):
+        """
+        Brightness and contrast (0-1) of an RGB uint8 image, plus warnings for
+        photos that are likely too dark, overexposed or flat to assess.
+        Measured on the original pixels: CLAHE in `preprocess` would pull an
+        overexposed or flat photo back towards a normal range.
+        """
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        mean, std = cv2.meanStdDev(gray)
+        brightness = float(mean[0, 0]) / 255.0
+        contrast = float(std[0, 0]) / 255.0
+        warnings = []
+        if brightness < 0.2:
+            warnings.append("Image is very dark; retake it in better light")
+        elif brightness > 0.9:
+            warnings.append("Image looks overexposed")
+        if contrast < 0.05:
+            warnings.append("Image has very little detail or contrast")
+        return {"brightness": round(brightness, 3), "contrast": round(contrast, 3), "warnings": warnings}
 
     @staticmethod
     def encode_image_to_base64(image_bytes):
         import base64
         return base64.b64encode(image_bytes).decode('utf-8')
+
+
+def _prepare_one(processor, image_bytes, model_width, jpeg_quality):
+    """Model JPEG and quality report of one encoded image."""
+    try:
+        decoded = decode_for_model(image_bytes, model_width)
+    except OSError as e:
+        raise ValueError("Invalid image format") from e
+    rgb = np.asarray(decoded if decoded.mode == "RGB" else decoded.convert("RGB"))
+    return encode_jpeg(decoded, jpeg_quality), processor.quality(rgb)
+
+
+# Per worker process: one ImageProcessor per configuration
+_worker_processors = {}
+
+
+def _prepare_worker(config, image_bytes, model_width, jpeg_quality):
+    """Process-pool entry point for `ImageProcessor.prepare_batch`."""
+    processor = _worker_processors.get(config)
+    if processor is None:
+        processor = _worker_processors[config] = ImageProcessor(*config)
+    return _prepare_one(processor, image_bytes, model_width, jpeg_quality)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """The process-wide preprocessing pool, started on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking a process that runs threads (uvicorn, the AI pool) is unsafe
+                _pool = ProcessPoolExecutor(
+                    max_workers=min(8, os.cpu_count() or 1),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+def discard_process_pool(pool):
+    """Drop `pool` (if it is still the shared one) so the next use starts a fresh pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_process_pool():
+    """Stop the preprocessing pool (on app shutdown)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
@@ -0,0 +1,82 @@
+"""
+Model ids and prompts for image analysis.
+
+Kept apart from the analyzer (which pulls in agno and its tools) so the
+image result cache can key on them without importing the model stack.
+"""
+
+IMAGE_MODEL_ID = "gemini-2.0-flash-exp"
+
+# Medical Analysis Query
+IMAGE_ANALYSIS_PROMPT = """You are a highly skilled medical imaging expert with extensive knowledge in radiology and diagnostic imaging. 
+Analyze the medical image and provide a structured JSON response with the following fields:
+
+{
+    "analysis_text": "brief summary of what you observe in the image",
+    "detected_symptoms": [
+        {
+            "symptom_name": "name of symptom",
+            "severity": "low / medium / high",
+            "description": "brief description"
+        }
+    ],
+    "possible_conditions": ["list of potential conditions based on visible symptoms"],
+    "urgency_level": "low / medium / high / emergency",
+    "recommendations": ["specific action advice for the patient"],
+    "disclaimer": "This is not a medical diagnosis. Please consult a healthcare professional."
+}
+
+Guidelines:
+- Focus ONLY on what is visible in the image
+- Do not hallucinate details not present
+- Use simple but professional medical language
+- Be specific about visible symptoms
+- Provide actionable recommendations
+- Set urgency_level based on severity: emergency for critical, high for urgent, medium for moderate, low for minor
+- Always include the medical disclaimer
+
+Return ONLY valid JSON, no additional text or markdown."""
+
+# Several photos of one case (e.g. a wound over days) in a single call;
+# formatted with `count`
+IMAGE_BATCH_PROMPT = """You are a highly skilled medical imaging expert with extensive knowledge in radiology and diagnostic imaging. 
+You are given {count} images of the same patient case, in the order they were uploaded (for example, photos of one wound taken over several days).
+Analyze them together and provide a single structured JSON response with the following fields:
+
+{{
+    "analysis_text": "brief summary of what you observe across the images, including any change between them",
+    "detected_symptoms": [
+        {{
+            "symptom_name": "name of symptom",
+            "severity": "low / medium / high",
+            "description": "brief description, naming the image(s) by number where relevant"
+        }}
+    ],
+    "possible_conditions": ["list of potential conditions based on visible symptoms"],
+    "urgency_level": "low / medium / high / emergency",
+    "recommendations": ["specific action advice for the patient"],
+    "disclaimer": "This is not a medical diagnosis. Please consult a healthcare professional."
+}}
+
+Guidelines:
+- Focus ONLY on what is visible in the images
+- Do not hallucinate details not present
+- Refer to images by their number (1 is the first uploaded)
+- Describe progression (improving, unchanged, worsening) when the images show the same area
+- Use simple but professional medical language
+- Set urgency_level based on the most recent and most severe findings
+- Always include the medical disclaimer
+
+Return ONLY valid JSON, no additional text or markdown."""
+
+# Appended to an image prompt when the patient described their symptoms
+SYMPTOMS_CONTEXT = """
+
+Patient-reported symptoms (use as context; base findings only on what is visible):
+{symptoms}"""
+
+
+def with_symptoms(prompt: str, symptoms=None) -> str:
+    """`prompt` plus the patient's own description, if any."""
+    symptoms = (symptoms or "").strip()
+    return prompt + SYMPTOMS_CONTEXT.format(symptoms=symptoms) if symptoms else prompt
@@ -0,0 +1,317 @@
+"""
+Sliding-window rate limiting for login attempts and public AI endpoints.
+
+Each key (an email or a client IP) gets a fixed-size ring buffer holding
+the timestamps of its most recent events, so checking a key costs O(1)
+memory per allowed event and never grows past the configured limit.
+When RATE_LIMIT_DB_PATH is set the events are kept in SQLite instead, so
+every uvicorn worker sees the same counts.
+"""
+
+import logging
+import math
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request, status
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Ring:
+    """Fixed-capacity ring buffer of ascending event timestamps."""
+
+    __slots__ = ("_times", "_head", "_size")
+
+    def __init__(self, capacity: int):
+        self._times = array("d", [0.0]) * capacity
+        self._head = 0  # index of the oldest timestamp
+        self._size = 0
+
+    def prune(self, cutoff: float) -> None:
+        """Drop timestamps older than `cutoff`."""
+        capacity = len(self._times)
+        while self._size and self._times[self._head] < cutoff:
+            self._head = (self._head + 1) % capacity
+            self._size -= 1
+
+    def push(self, ts: float) -> None:
+        """Append a timestamp, overwriting the oldest one when full."""
+        capacity = len(self._times)
+        if self._size == capacity:
+            self._times[self._head] = ts
+            self._head = (self._head + 1) % capacity
+        else:
+            self._times[(self._head + self._size) % capacity] = ts
+            self._size += 1
+
+    def oldest(self) -> float:
+        return self._times[self._head]
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class SlidingWindowLimiter:
+    """
+    Allow at most `limit` events per key within any `window_seconds` span.
+
+    `retry_after` only inspects a key, `record` only counts an event, and
+    `hit` does both atomically. All three return/accept plain string keys so
+    callers decide what they are limiting on.
+    """
+
+    # Sweep idle keys out of memory after this many recorded events
+    _SWEEP_EVERY = 1024
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        window_seconds: float,
+        db_path: Optional[str] = None,
+    ):
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        self.name = name
+        self.limit = limit
+        self.window = float(window_seconds)
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._rings: Dict[str, _Ring] = {}
+        self._events_since_sweep = 0
+        if db_path:
+            self._init_db()
+
+    # -- SQLite tier ---------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self._db_path, timeout=5.0, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_limit_events (
+                    bucket TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    ts REAL NOT NULL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_rate_limit_events_bucket_key_ts "
+                "ON rate_limit_events(bucket, key, ts)"
+            )
+        finally:
+            conn.close()
+
+    def _db_retry_after(self, conn: sqlite3.Connection, key: str, now: float) -> float:
+        cutoff = now - self.window
+        row = conn.execute(
+            "SELECT ts FROM rate_limit_events WHERE bucket = ? AND key = ? AND ts >= ? "
+            "ORDER BY ts DESC LIMIT 1 OFFSET ?",
+            (self.name, key, cutoff, self.limit - 1),
+        ).fetchone()
+        if row is None:
+            return 0.0
+        # `row` is the oldest event still counting against the limit
+        return max(row[0] + self.window - now, 0.0)
+
+    def _db_record(self, conn: sqlite3.Connection, key: str, now: float) -> None:
+        conn.execute(
+            "INSERT INTO rate_limit_events (bucket, key, ts) VALUES (?, ?, ?)",
+            (self.name, key, now),
+        )
+        self._events_since_sweep += 1
+        if self._events_since_sweep >= self._SWEEP_EVERY:
+            self._events_since_sweep = 0
+            conn.execute(
+                "DELETE FROM rate_limit_events WHERE bucket = ? AND ts < ?",
+                (self.name, now - self.window),
+            )
+
+    # -- In-memory tier ------------------------------------------------
+
+    def _mem_retry_after(self, key: str, now: float) -> float:
+        ring = self._rings.get(key)
+        if ring is None:
+            return 0.0
+        ring.prune(now - self.window)
+        if len(ring) < self.limit:
+            return 0.0
+        return max(ring.oldest() + self.window - now, 0.0)
+
+    def _mem_record(self, key: str, now: float) -> None:
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = self._rings[key] = _Ring(self.limit)
+        ring.push(now)
+        self._events_since_sweep += 1
+        if self._events_since_sweep >= self._SWEEP_EVERY:
+            self._events_since_sweep = 0
+            cutoff = now - self.window
+            for stale_key in [k for k, r in self._rings.items() if not len(r) or r.oldest() < cutoff]:
+                ring = self._rings[stale_key]
+                ring.prune(cutoff)
+                if not len(ring):
+                    del self._rings[stale_key]
+
+    # -- Public API ----------------------------------------------------
+
+    def retry_after(self, key: str) -> float:
+        """Seconds until `key` may act again (0.0 when it is under the limit)."""
+        now = time.time()
+        if self._db_path:
+            conn = self._connect()
+            try:
+                return self._db_retry_after(conn, key, now)
+            finally:
+                conn.close()
+        with self._lock:
+            return self._mem_retry_after(key, now)
+
+    def record(self, key: str) -> None:
+        """Count one event against `key`."""
+        now = time.time()
+        if self._db_path:
+            conn = self._connect()
+            try:
+                self._db_record(conn, key, now)
+            finally:
+                conn.close()
+            return
+        with self._lock:
+            self._mem_record(key, now)
+
+    def hit(self, key: str) -> float:
+        """
+        Check and count an event in one step.
+
+        Returns 0.0 and records the event when allowed; otherwise returns the
+        retry delay and records nothing.
+        """
+        now = time.time()
+        if self._db_path:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    wait = self._db_retry_after(conn, key, now)
+                    if not wait:
+                        self._db_record(conn, key, now)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                return wait
+            finally:
+                conn.close()
+        with self._lock:
+            wait = self._mem_retry_after(key, now)
+            if not wait:
+                self._mem_record(key, now)
+            return wait
+
+    def reset(self, key: str) -> None:
+        """Forget all events for `key` (e.g. after a successful login)."""
+        if self._db_path:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "DELETE FROM rate_limit_events WHERE bucket = ? AND key = ?",
+                    (self.name, key),
+                )
+            finally:
+                conn.close()
+            return
+        with self._lock:
+            self._rings.pop(key, None)
+
+
+def get_client_ip(request: Request) -> str:
+    """Best-effort client address used as a rate limit key."""
+    return request.client.host if request.client else "unknown"
+
+
+def raise_rate_limited(retry_after: float, message: str) -> None:
+    """Raise a 429 with a Retry-After header."""
+    raise HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail={"code": "RATE_LIMITED", "message": message},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+# Failed login attempts, keyed by normalized email and by client IP
+login_email_limiter = SlidingWindowLimiter(
+    "login_email",
+    settings.LOGIN_MAX_FAILURES_PER_EMAIL,
+    settings.LOGIN_FAILURE_WINDOW_SECONDS,
+    settings.RATE_LIMIT_DB_PATH,
+)
+login_ip_limiter = SlidingWindowLimiter(
+    "login_ip",
+    settings.LOGIN_MAX_FAILURES_PER_IP,
+    settings.LOGIN_FAILURE_WINDOW_SECONDS,
+    settings.RATE_LIMIT_DB_PATH,
+)
+
+# Unauthenticated endpoints that spend Gemini / Whisper time, keyed by client IP
+public_analysis_limiter = SlidingWindowLimiter(
+    "public_analysis",
+    settings.PUBLIC_AI_MAX_REQUESTS,
+    settings.PUBLIC_AI_WINDOW_SECONDS,
+    settings.RATE_LIMIT_DB_PATH,
+)
+public_transcription_limiter = SlidingWindowLimiter(
+    "public_transcription",
+    settings.PUBLIC_AI_MAX_REQUESTS,
+    settings.PUBLIC_AI_WINDOW_SECONDS,
+    settings.RATE_LIMIT_DB_PATH,
+)
+
+
+def check_login_allowed(email_key: str, client_ip: str) -> None:
+    """Reject a login attempt before any password hashing if either key is over limit."""
+    wait = max(login_email_limiter.retry_after(email_key), login_ip_limiter.retry_after(client_ip))
+    if wait:
+        logger.warning(f"Login rate limited for email {email_key} from {client_ip}")
+        raise_rate_limited(wait, "Too many failed login attempts. Please try again later.")
+
+
+def record_login_failure(email_key: str, client_ip: str) -> None:
+    login_email_limiter.record(email_key)
+    login_ip_limiter.record(client_ip)
+
+
+def reset_login_failures(email_key: str) -> None:
+    """Clear the per-email budget after a successful login (the IP budget keeps counting)."""
+    login_email_limiter.reset(email_key)
+
+
+# The dependencies below are plain functions on purpose: FastAPI runs them in
+# its thread pool, so a SQLite-backed limiter never blocks the event loop.
+
+
+def limit_public_analysis(request: Request) -> None:
+    """Dependency for /api/analyze-image-public."""
+    wait = public_analysis_limiter.hit(get_client_ip(request))
+    if wait:
+        raise_rate_limited(wait, "Too many analysis requests. Please sign in or try again later.")
+
+
+def limit_public_transcription(request: Request) -> None:
+    """Dependency for /api/transcribe-public."""
+    wait = public_transcription_limiter.hit(get_client_ip(request))
+    if wait:
+        raise_rate_limited(wait, "Too many transcription requests. Please sign in or try again later.")
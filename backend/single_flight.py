@@ -0,0 +1,79 @@
+"""
+Single-flight coalescing of identical in-flight work.
+
+Concurrent callers with the same key (the analysis cache key) share one
+upstream call: the first caller starts it, later callers await the same
+task, and everyone gets its result or its exception. The task is
+shielded, so a caller that disconnects does not cancel it for the others;
+an abandoned call still finishes and fills the cache.
+
+Failures that belong to the leader rather than to the work (such as the
+leader's tenant being over its AI concurrency cap) are listed in
+`retry_on`: followers that see one start, or join, a fresh call instead.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Per-key deduplication of concurrent coroutine calls."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.retried = 0
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieved here so an abandoned failure is not reported as unhandled
+            logger.debug(f"Single-flight call {key[:16]} failed: {task.exception()}")
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        retry_on: Tuple[Type[BaseException], ...] = (),
+    ) -> Any:
+        """
+        Await `fn()`, or the identical call already in flight for `key`.
+
+        A follower whose leader failed with one of `retry_on` tries again
+        with its own `fn` (joining any newer call for the key).
+        """
+        while True:
+            task = self._calls.get(key)
+            if task is not None and task.get_loop() is not asyncio.get_running_loop():
+                # Left over from another event loop (tests); start fresh
+                task = None
+            leader = task is None
+            if leader:
+                task = asyncio.ensure_future(fn())
+                self._calls[key] = task
+                task.add_done_callback(lambda t: self._done(key, t))
+                self.started += 1
+            else:
+                self.coalesced += 1
+            try:
+                return await asyncio.shield(task)
+            except retry_on:
+                if leader:
+                    raise
+                self.retried += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+        }
+
+
+analysis_flights = SingleFlight()
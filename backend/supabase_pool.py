@@ -0,0 +1,97 @@
+"""
+Shared async PostgREST client for Supabase table access.
+
+The sync `supabase` client blocks the event loop for every HTTP round trip,
+so the health case routes go through this pool instead: a single
+keep-alive `httpx.AsyncClient` (HTTP/2 when available) with bounded
+connection counts, wrapped in an `AsyncPostgrestClient`.
+"""
+
+import asyncio
+import logging
+from typing import Any, Optional
+
+import httpx
+from postgrest import AsyncPostgrestClient, AsyncRequestBuilder
+
+try:
+    from .config import settings
+except ImportError:
+    from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SupabaseTimeoutError(Exception):
+    """Raised when a PostgREST call exceeds its per-call timeout."""
+
+
+class AsyncSupabasePool:
+    """Lazily-created, process-wide async PostgREST client."""
+
+    def __init__(self, supabase_url: str, api_key: str):
+        self.rest_url = f"{supabase_url.rstrip('/')}/rest/v1"
+        self.headers = {
+            "apikey": api_key,
+            "Authorization": f"Bearer {api_key}",
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+        }
+        self._client: Optional[AsyncPostgrestClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _build_http_client(self) -> httpx.AsyncClient:
+        try:
+            import h2  # noqa: F401
+            http2 = settings.SUPABASE_HTTP2
+        except ImportError:
+            http2 = False
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=settings.SUPABASE_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SUPABASE_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=settings.SUPABASE_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            timeout=httpx.Timeout(
+                settings.SUPABASE_TIMEOUT_SECONDS,
+                connect=settings.SUPABASE_CONNECT_TIMEOUT_SECONDS,
+            ),
+            follow_redirects=True,
+        )
+
+    @property
+    def client(self) -> AsyncPostgrestClient:
+        """
+        The shared client for the running event loop.
+
+        Connections cannot be shared between event loops, so a new pool is
+        built if the loop changes (only happens in tests).
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = AsyncPostgrestClient(
+                self.rest_url,
+                headers=self.headers,
+                http_client=self._build_http_client(),
+            )
+            self._loop = loop
+            logger.info("Async Supabase connection pool created")
+        return self._client
+
+    def table(self, name: str) -> AsyncRequestBuilder:
+        return self.client.table(name)
+
+    async def execute(self, query: Any, timeout: Optional[float] = None) -> Any:
+        """Run a built query with an overall deadline (defaults to SUPABASE_TIMEOUT_SECONDS)."""
+        timeout = settings.SUPABASE_TIMEOUT_SECONDS if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(query.execute(), timeout)
+        except asyncio.TimeoutError:
+            raise SupabaseTimeoutError(f"Supabase request timed out after {timeout:.1f}s")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
@@ -0,0 +1,109 @@
+"""
+Text-only symptom triage with Gemini (via agno).
+
+Shared by the /api/analyze endpoints and the background case analysis
+jobs so both use the same prompt and model.
+"""
+
+import threading
+from typing import Callable, Optional
+
+try:
+    from .analysis_cache import content_key, normalize_symptoms
+    from .models.clients import get_agent, get_api_key
+except ImportError:
+    from analysis_cache import content_key, normalize_symptoms
+    from models.clients import get_agent, get_api_key
+
+TRIAGE_MODEL_ID = "gemini-2.0-flash-exp"
+
+TRIAGE_PROMPT = """You are a medical triage assistant.
+        Analyze these symptoms and provide:
+        1. A concise summary
+        2. Possible causes
+        3. Urgency level
+
+        Keep the answer under 200 words.
+
+        Symptoms: {symptoms}
+        """
+
+NO_ANALYSIS = "Unable to generate analysis"
+
+
+class GeminiNotConfiguredError(RuntimeError):
+    """Raised when no Google/Gemini API key is available."""
+
+
+class TriageRunError(RuntimeError):
+    """Raised when the model run fails; agno reports the error as the run's content."""
+
+
+# agno run statuses/events that mean the run did not produce an answer
+_FAILED_STATUSES = {"ERROR", "CANCELLED"}
+_FAILED_EVENTS = {"RunError", "RunCancelled"}
+
+
+def _check_response(response) -> None:
+    status = getattr(response, "status", None)
+    if getattr(status, "value", status) in _FAILED_STATUSES:
+        raise TriageRunError(str(getattr(response, "content", None) or "Model run failed"))
+
+
+gemini_api_key = get_api_key
+
+
+def build_triage_prompt(symptoms: str) -> str:
+    return TRIAGE_PROMPT.format(symptoms=symptoms)
+
+
+def triage_cache_key(symptoms: str) -> str:
+    """Cache key for a triage result; changes with the model or prompt template."""
+    return content_key("triage", TRIAGE_MODEL_ID, TRIAGE_PROMPT, normalize_symptoms(symptoms))
+
+
+def run_text_triage(symptoms: str) -> str:
+    """
+    Run the triage prompt for `symptoms` and return the analysis text
+    (blocking). Raises TriageRunError if the model run fails.
+    """
+    if not gemini_api_key():
+        raise GeminiNotConfiguredError("Google/Gemini API key is not configured on the backend.")
+
+    agent = get_agent("triage", TRIAGE_MODEL_ID, markdown=True)
+    response = agent.run(build_triage_prompt(symptoms))
+    _check_response(response)
+    return response.content if response and response.content else NO_ANALYSIS
+
+
+def stream_text_triage(
+    symptoms: str,
+    on_text: Callable[[str], None],
+    cancelled: Optional[threading.Event] = None,
+) -> str:
+    """
+    Run the triage prompt with streaming, passing each text chunk to
+    `on_text` as it arrives (blocking). Stops early once `cancelled` is set;
+    returns the text produced. Raises TriageRunError if the run fails.
+    """
+    if not gemini_api_key():
+        raise GeminiNotConfiguredError("Google/Gemini API key is not configured on the backend.")
+
+    agent = get_agent("triage", TRIAGE_MODEL_ID, markdown=True)
+    parts = []
+    stream = agent.run(build_triage_prompt(symptoms), stream=True)
+    try:
+        for event in stream:
+            if cancelled is not None and cancelled.is_set():
+                break
+            if getattr(event, "event", None) in _FAILED_EVENTS:
+                raise TriageRunError(str(getattr(event, "content", None) or "Model run failed"))
+            if getattr(event, "event", None) == "RunContent" and isinstance(event.content, str) and event.content:
+                parts.append(event.content)
+                on_text(event.content)
+    finally:
+        # Closing the generator abandons the upstream HTTP stream
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+    return "".join(parts) or NO_ANALYSIS
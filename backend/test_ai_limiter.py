@@ -0,0 +1,207 @@
+"""
+Tests for the bounded AI call limiter.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from ai_limiter import AIBusyError, AIConcurrencyLimiter
+from main import app
+
+
+def blocking_call(release: threading.Event, value="done"):
+    release.wait(5)
+    return value
+
+
+class TestAIConcurrencyLimiter:
+    """Concurrency, per-tenant caps and queue limits"""
+
+    def test_runs_blocking_call_off_the_event_loop(self):
+        limiter = AIConcurrencyLimiter(max_concurrency=1)
+        release = threading.Event()
+
+        async def scenario():
+            task = asyncio.create_task(limiter.run("u1", blocking_call, release))
+            # The loop keeps serving other work while the call blocks
+            await asyncio.sleep(0.05)
+            assert not task.done()
+            release.set()
+            return await task
+
+        assert asyncio.run(scenario()) == "done"
+        metrics = limiter.metrics()
+        assert metrics["completed"] == 1
+        assert metrics["running"] == 0
+
+    def test_tenant_cap_rejects_with_429(self):
+        limiter = AIConcurrencyLimiter(max_concurrency=4, per_tenant=1)
+        release = threading.Event()
+
+        async def scenario():
+            first = asyncio.create_task(limiter.run("u1", blocking_call, release))
+            await asyncio.sleep(0.01)
+            with pytest.raises(AIBusyError) as exc:
+                await limiter.run("u1", blocking_call, release)
+            other = await limiter.run("u2", lambda: "other")
+            release.set()
+            return exc.value, [await first, other]
+
+        error, results = asyncio.run(scenario())
+        assert error.status_code == 429
+        assert error.code == "AI_TENANT_BUSY"
+        assert results == ["done", "other"]
+        assert limiter.metrics()["rejected"] == 1
+
+    def test_full_queue_rejects_with_503(self):
+        limiter = AIConcurrencyLimiter(max_concurrency=1, max_queue=1, per_tenant=5)
+        release = threading.Event()
+
+        async def scenario():
+            running = asyncio.create_task(limiter.run("a", blocking_call, release))
+            await asyncio.sleep(0.01)
+            queued = asyncio.create_task(limiter.run("b", blocking_call, release))
+            await asyncio.sleep(0.01)
+            with pytest.raises(AIBusyError) as exc:
+                await limiter.run("c", blocking_call, release)
+            assert limiter.metrics()["waiting"] == 1
+            release.set()
+            await asyncio.gather(running, queued)
+            return exc.value
+
+        error = asyncio.run(scenario())
+        assert error.status_code == 503
+        assert error.code == "AI_BUSY"
+        assert limiter.metrics()["completed"] == 2
+
+    def test_queue_timeout_rejects_with_503(self):
+        limiter = AIConcurrencyLimiter(max_concurrency=1, queue_timeout=0.05)
+        release = threading.Event()
+
+        async def scenario():
+            running = asyncio.create_task(limiter.run("a", blocking_call, release))
+            await asyncio.sleep(0.01)
+            with pytest.raises(AIBusyError) as exc:
+                await limiter.run("b", blocking_call, release)
+            release.set()
+            await running
+            return exc.value
+
+        error = asyncio.run(scenario())
+        assert error.status_code == 503
+        assert limiter.metrics()["waiting"] == 0
+
+    def test_cancelled_caller_keeps_slot_until_thread_finishes(self):
+        limiter = AIConcurrencyLimiter(max_concurrency=1, per_tenant=1)
+        release = threading.Event()
+
+        async def scenario():
+            caller = asyncio.create_task(limiter.run("u1", blocking_call, release))
+            await asyncio.sleep(0.01)
+            caller.cancel()
+            await asyncio.sleep(0.01)
+            # The model call is still running in its thread
+            assert limiter.metrics()["running"] == 1
+            with pytest.raises(AIBusyError):
+                await limiter.run("u1", lambda: "again")
+            waiting = asyncio.create_task(limiter.run("u2", lambda: "next"))
+            await asyncio.sleep(0.01)
+            assert not waiting.done()
+            release.set()
+            return await waiting
+
+        assert asyncio.run(scenario()) == "next"
+        assert limiter.metrics()["running"] == 0
+
+    def test_cancelled_waiter_does_not_leak_a_permit(self):
+        limiter = AIConcurrencyLimiter(max_concurrency=1)
+        release = threading.Event()
+
+        async def scenario():
+            running = asyncio.create_task(limiter.run("a", blocking_call, release))
+            await asyncio.sleep(0.01)
+            waiter = asyncio.create_task(limiter.run("b", blocking_call, release))
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            release.set()
+            await running
+            await asyncio.sleep(0.01)
+            # Exactly one permit is free again: one call runs, the next waits
+            first_release = threading.Event()
+            first = asyncio.create_task(limiter.run("c", blocking_call, first_release))
+            await asyncio.sleep(0.01)
+            second = asyncio.create_task(limiter.run("d", lambda: "second"))
+            await asyncio.sleep(0.01)
+            assert not second.done()
+            first_release.set()
+            return await asyncio.gather(first, second)
+
+        assert asyncio.run(scenario()) == ["done", "second"]
+        assert limiter.metrics()["waiting"] == 0
+
+    def test_caller_cancelled_after_its_grant_frees_the_slot(self):
+        async def scenario(yields):
+            limiter = AIConcurrencyLimiter(max_concurrency=1)
+            release = threading.Event()
+            running = asyncio.create_task(limiter.run("a", blocking_call, release))
+            await asyncio.sleep(0.01)
+            second = asyncio.create_task(limiter.run("b", blocking_call, release))
+            await asyncio.sleep(0.01)
+            release.set()
+            await running
+            # Cancel at successive points around the permit being handed over
+            for _ in range(yields):
+                await asyncio.sleep(0)
+            second.cancel()
+            await asyncio.gather(second, return_exceptions=True)
+            await asyncio.sleep(0.01)
+            return limiter
+
+        for yields in range(4):
+            limiter = asyncio.run(scenario(yields))
+            assert limiter.metrics()["running"] == 0
+            assert limiter._tenants == {}
+            assert not limiter._semaphore.locked()
+
+    def test_internal_callers_bypass_tenant_cap(self):
+        limiter = AIConcurrencyLimiter(max_concurrency=2, per_tenant=1)
+
+        async def scenario():
+            return await asyncio.gather(*(limiter.run(None, lambda i=i: i) for i in range(3)))
+
+        assert asyncio.run(scenario()) == [0, 1, 2]
+
+
+class TestAIEndpoints:
+    """Limiter rejections surface as HTTP errors"""
+
+    def test_busy_analyze_returns_retry_after(self, make_auth_headers):
+        async def busy(tenant, fn, *args):
+            raise AIBusyError(429, "AI_TENANT_BUSY", "busy", retry_after=4.2)
+
+        client = TestClient(app)
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(main.ai_limiter, "run", busy):
+            response = client.post("/api/analyze", json={"symptoms": "Headache"}, headers=make_auth_headers())
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "5"
+        assert response.json()["detail"]["code"] == "AI_TENANT_BUSY"
+
+    def test_ai_health_reports_metrics(self):
+        response = TestClient(app).get("/health/ai")
+        assert response.status_code == 200
+        assert {"running", "waiting", "queue_wait_avg", "rejected"} <= set(response.json())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
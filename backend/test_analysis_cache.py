@@ -0,0 +1,128 @@
+"""
+Tests for the content-addressed AI analysis cache.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from analysis_cache import AnalysisCache, normalize_symptoms
+from main import app
+import symptom_triage
+from symptom_triage import triage_cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnalysisCache(str(tmp_path / "analysis_cache.db"), max_entries=2, ttl_seconds=60)
+
+
+class TestAnalysisCache:
+    """Memory and SQLite tiers, TTL and counters"""
+
+    def test_normalization_folds_case_punctuation_and_whitespace(self):
+        assert normalize_symptoms("  Fever,   HEADACHE for 2 days!\n") == "fever headache for 2 days"
+        assert triage_cache_key("Fever and headache.") == triage_cache_key("fever  and headache")
+        assert triage_cache_key("fever") != triage_cache_key("cough")
+
+    def test_hit_and_miss_counters(self, cache):
+        assert cache.get("k") is None
+        cache.put("k", "value")
+        assert cache.get("k") == "value"
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    def test_lru_evicts_to_disk_tier(self, cache):
+        for key in ("a", "b", "c"):
+            cache.put(key, key.upper())
+        assert cache.stats()["entries"] == 2
+        assert cache.get("a") == "A"
+        assert cache.stats()["disk_hits"] == 1
+
+    def test_disk_tier_is_shared_between_instances(self, cache, tmp_path):
+        cache.put("k", {"analysis": "shared"})
+        other = AnalysisCache(str(tmp_path / "analysis_cache.db"))
+        assert other.get("k") == {"analysis": "shared"}
+
+    def test_expired_entries_miss(self, tmp_path):
+        cache = AnalysisCache(str(tmp_path / "analysis_cache.db"), ttl_seconds=0.01)
+        cache.put("k", "value")
+        time.sleep(0.02)
+        assert cache.get("k") is None
+
+
+class TestAnalyzeEndpointCache:
+    """/api/analyze answers repeat symptoms from the cache"""
+
+    def test_repeat_query_skips_model(self, cache, make_auth_headers):
+        calls = []
+
+        def fake_triage(symptoms):
+            calls.append(symptoms)
+            return f"Triage for: {symptoms}"
+
+        client = TestClient(app)
+        headers = make_auth_headers()
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(main, "analysis_cache", cache), \
+                patch.object(main, "run_text_triage", fake_triage):
+            first = client.post("/api/analyze", json={"symptoms": "Fever and headache"}, headers=headers)
+            second = client.post("/api/analyze", json={"symptoms": "fever, and HEADACHE"}, headers=headers)
+        assert first.json() == second.json() == {"analysis": "Triage for: Fever and headache"}
+        assert calls == ["Fever and headache"]
+
+    def test_disk_tier_is_used_off_the_event_loop(self, tmp_path, make_auth_headers):
+        on_loop = []
+
+        def running_loop() -> bool:
+            try:
+                asyncio.get_running_loop()
+                return True
+            except RuntimeError:
+                return False
+
+        class RecordingCache(AnalysisCache):
+            def get(self, key):
+                on_loop.append((self.persistent, running_loop()))
+                return super().get(key)
+
+            def put(self, key, value):
+                on_loop.append((self.persistent, running_loop()))
+                super().put(key, value)
+
+        client = TestClient(app)
+        for cache in (RecordingCache(str(tmp_path / "analysis_cache.db")), RecordingCache(None)):
+            with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                    patch.object(main, "analysis_cache", cache), \
+                    patch.object(main, "run_text_triage", lambda symptoms: "ok"):
+                client.post("/api/analyze", json={"symptoms": "Fever and headache"}, headers=make_auth_headers())
+        # SQLite-backed calls run in the thread pool; memory-only ones inline
+        assert on_loop == [(True, False), (True, False), (False, True), (False, True)]
+
+    def test_failed_model_run_is_not_cached(self, cache, make_auth_headers):
+        # agno does not raise on failure: it returns the error text as content
+        failed = SimpleNamespace(content="[Errno -2] Name or service not known", status=SimpleNamespace(value="ERROR"))
+        agent = SimpleNamespace(run=lambda prompt: failed)
+
+        client = TestClient(app)
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(main, "analysis_cache", cache), \
+                patch.object(symptom_triage, "get_agent", lambda *a, **k: agent):
+            response = client.post("/api/analyze", json={"symptoms": "Fever and headache"}, headers=make_auth_headers())
+        assert response.status_code == 502
+        assert response.json()["detail"]["code"] == "AI_BACKEND_ERROR"
+        assert cache.get(triage_cache_key("Fever and headache")) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
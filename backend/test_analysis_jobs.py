@@ -0,0 +1,163 @@
+"""
+Tests for asynchronous analysis jobs.
+"""
+
+import base64
+import os
+import sqlite3
+import sys
+import time
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from analysis_cache import AnalysisCache
+from analysis_jobs import EMERGENCY_LANE, NORMAL_LANE, AnalysisJobStore, lane_for
+from image_cache import ImageAnalysisCache
+from main import app
+
+
+@pytest.fixture
+def store(tmp_path):
+    return AnalysisJobStore(str(tmp_path / "analysis_jobs.db"), workers=1, poll_interval=0.05)
+
+
+@pytest.fixture
+def client(store, stub_postgrest):
+    """A client whose lifespan runs the job workers against a fresh store and fake models."""
+
+    class FakeAnalyzer:
+        def analyze(self, image_bytes, symptoms=None):
+            return {"success": True, "analysis_text": f"{len(image_bytes)} bytes", "symptoms": symptoms}
+
+    with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+            patch.object(main, "analysis_jobs", store), \
+            patch.object(main, "analysis_cache", AnalysisCache(None)), \
+            patch.object(main, "image_cache", ImageAnalysisCache(None)), \
+            patch.object(main, "run_text_triage", lambda symptoms: f"Triage for: {symptoms}"), \
+            patch("models.analyzer.get_medical_analyzer", FakeAnalyzer):
+        with TestClient(app) as client:
+            yield client
+
+
+def wait_for_job(client, job_id, headers, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/analysis-jobs/{job_id}", headers=headers).json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("job did not finish")
+
+
+class TestAnalysisJobEndpoints:
+    """Submit returns at once; the result is fetched by id"""
+
+    def test_text_job_completes(self, client, make_auth_headers):
+        headers = make_auth_headers()
+        response = client.post("/api/analysis-jobs", json={"symptoms": "Headache"}, headers=headers)
+        assert response.status_code == 202
+        job = response.json()
+        assert job["status"] in ("queued", "running")
+        assert response.headers["Location"] == f"/api/analysis-jobs/{job['id']}"
+
+        finished = wait_for_job(client, job["id"], headers)
+        assert finished["status"] == "completed"
+        assert finished["result"] == {"analysis": "Triage for: Headache"}
+
+    def test_image_job_completes_and_drops_payload(self, client, store, make_auth_headers):
+        buffer = BytesIO()
+        Image.new("RGB", (32, 32), "red").save(buffer, format="PNG")
+        headers = make_auth_headers()
+        job = client.post(
+            "/api/analysis-jobs",
+            json={"image": base64.b64encode(buffer.getvalue()).decode(), "symptoms": "Red patch"},
+            headers=headers,
+        ).json()
+        finished = wait_for_job(client, job["id"], headers)
+        assert finished["kind"] == "image"
+        assert finished["result"]["analysis_text"] == f"{len(buffer.getvalue())} bytes"
+        # Symptoms sent with the image reach the model as context
+        assert finished["result"]["symptoms"] == "Red patch"
+        conn = sqlite3.connect(store.db_path)
+        assert conn.execute("SELECT payload FROM analysis_jobs WHERE id = ?", (job["id"],)).fetchone() == (None,)
+
+    def test_jobs_are_private(self, client, make_auth_headers):
+        job = client.post("/api/analysis-jobs", json={"symptoms": "Cough"}, headers=make_auth_headers()).json()
+        response = client.get(f"/api/analysis-jobs/{job['id']}", headers=make_auth_headers())
+        assert response.status_code == 404
+
+    def test_empty_submission_rejected(self, client, make_auth_headers):
+        response = client.post("/api/analysis-jobs", json={"symptoms": "  "}, headers=make_auth_headers())
+        assert response.status_code == 400
+
+    def test_per_user_limit(self, store, make_auth_headers):
+        headers = make_auth_headers()
+        # No lifespan: jobs stay queued
+        client = TestClient(app)
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(main, "analysis_jobs", store), \
+                patch.object(main.settings, "ANALYSIS_JOB_MAX_ACTIVE_PER_USER", 2):
+            codes = [
+                client.post("/api/analysis-jobs", json={"symptoms": "Rash"}, headers=headers).status_code
+                for _ in range(3)
+            ]
+        assert codes == [202, 202, 429]
+
+
+class TestAnalysisJobStore:
+    """Lanes, leases and retention"""
+
+    def test_emergency_lane_is_claimed_first(self, store):
+        store.submit("u1", "text", {"symptoms": "itchy eyes"}, lane=lane_for("itchy eyes"))
+        urgent = store.submit("u2", "text", {"symptoms": "crushing chest pain"}, lane=lane_for("crushing chest pain"))
+        assert urgent["priority"] == "emergency"
+        assert store._claim()["id"] == urgent["id"]
+
+    def test_lane_detection(self):
+        assert lane_for("I can't breathe properly") == EMERGENCY_LANE
+        assert lane_for("My son is choking") == EMERGENCY_LANE
+        assert lane_for("Toddler has blue lips") == EMERGENCY_LANE
+        assert lane_for("No chest pain, just a cough") == NORMAL_LANE
+        assert lane_for("Mild sore throat") == NORMAL_LANE
+        assert lane_for(None) == NORMAL_LANE
+
+    def test_expired_lease_is_reclaimed(self, store):
+        job = store.submit("u1", "text", {"symptoms": "Fever"})
+        assert store._claim()["attempts"] == 1
+        assert store._claim() is None
+        conn = sqlite3.connect(store.db_path)
+        conn.execute("UPDATE analysis_jobs SET lease_until = 0")
+        conn.commit()
+        reclaimed = store._claim()
+        assert (reclaimed["id"], reclaimed["attempts"]) == (job["id"], 2)
+
+    def test_crash_looping_job_fails_after_max_attempts(self, store):
+        job = store.submit("u1", "text", {"symptoms": "Fever"})
+        conn = sqlite3.connect(store.db_path)
+        for attempt in range(1, store.MAX_ATTEMPTS + 1):
+            assert store._claim()["attempts"] == attempt
+            # The worker dies: its lease simply runs out
+            conn.execute("UPDATE analysis_jobs SET lease_until = 0")
+            conn.commit()
+        assert store._claim() is None
+        failed = store.get("u1", job["id"])
+        assert (failed["status"], failed["attempts"]) == ("failed", store.MAX_ATTEMPTS)
+
+    def test_prune_removes_old_finished_jobs(self, store):
+        job = store.submit("u1", "text", {"symptoms": "Fever"})
+        store._finish(job["id"], "completed", {"analysis": "ok"})
+        store.retention_seconds = -1
+        assert store.prune() == 1
+        assert store.get("u1", job["id"]) is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,171 @@
+"""
+Tests for the streamed symptom analysis endpoint.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from analysis_cache import AnalysisCache
+import symptom_triage
+from main import app
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def fake_stream(symptoms, on_text, cancelled=None):
+    chunks = ["Likely ", "a common ", "cold."]
+    for chunk in chunks:
+        on_text(chunk)
+    return "".join(chunks)
+
+
+@pytest.fixture
+def cache():
+    with patch.object(main, "analysis_cache", AnalysisCache(None)) as cache:
+        yield cache
+
+
+class TestAnalyzeStream:
+    """/api/analyze/stream emits token events then a done event"""
+
+    def test_failed_model_run_sends_error_and_is_not_cached(self, cache, make_auth_headers):
+        def run(prompt, stream=False):
+            yield SimpleNamespace(event="RunContent", content="Likely ")
+            yield SimpleNamespace(event="RunError", content="[Errno -2] Name or service not known")
+
+        agent = SimpleNamespace(run=run)
+        client = TestClient(app)
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(symptom_triage, "get_agent", lambda *a, **k: agent):
+            response = client.post("/api/analyze/stream", json={"symptoms": "Cough"}, headers=make_auth_headers())
+        events = parse_events(response.text)
+        assert events[-1][0] == "error"
+        assert cache.get(main.triage_cache_key("Cough")) is None
+
+    def test_streams_tokens_then_done(self, cache, make_auth_headers):
+        client = TestClient(app)
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(main, "stream_text_triage", fake_stream):
+            with client.stream("POST", "/api/analyze/stream", json={"symptoms": "Runny nose"},
+                               headers=make_auth_headers()) as response:
+                assert response.headers["content-type"].startswith("text/event-stream")
+                events = parse_events("".join(response.iter_text()))
+        assert [e for e, _ in events] == ["token", "token", "token", "done"]
+        assert events[-1][1] == {"analysis": "Likely a common cold."}
+        assert cache.get(main.triage_cache_key("runny nose")) == "Likely a common cold."
+
+    def test_cached_analysis_is_sent_at_once(self, cache, make_auth_headers):
+        cache.put(main.triage_cache_key("Runny nose"), "Cached answer")
+        client = TestClient(app)
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(main, "stream_text_triage", side_effect=AssertionError("model called")):
+            response = client.post("/api/analyze/stream", json={"symptoms": "Runny nose"}, headers=make_auth_headers())
+        assert parse_events(response.text) == [("token", {"text": "Cached answer"}), ("done", {"analysis": "Cached answer"})]
+
+    def test_model_error_becomes_error_event(self, cache, make_auth_headers):
+        def broken(symptoms, on_text, cancelled=None):
+            raise RuntimeError("quota exceeded")
+
+        client = TestClient(app)
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(main, "stream_text_triage", broken):
+            response = client.post("/api/analyze/stream", json={"symptoms": "Cough"}, headers=make_auth_headers())
+        event, data = parse_events(response.text)[-1]
+        assert event == "error"
+        assert data["code"] == "AI_BACKEND_ERROR"
+
+    def test_disconnect_cancels_model_stream(self, cache, make_auth_headers):
+        stopped = threading.Event()
+
+        def endless(symptoms, on_text, cancelled=None):
+            while not cancelled.wait(0.01):
+                on_text("more ")
+            stopped.set()
+            return "partial"
+
+        async def scenario():
+            # Drive the ASGI app directly so the client can drop mid-stream
+            first_token = asyncio.Event()
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {"type": "http.request", "body": json.dumps({"symptoms": "Itch"}).encode(), "more_body": False}
+                await first_token.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.body" and message.get("body"):
+                    first_token.set()
+
+            headers = [(b"content-type", b"application/json")] + [
+                (k.lower().encode(), v.encode()) for k, v in make_auth_headers().items()
+            ]
+            scope = {
+                "type": "http", "method": "POST", "path": "/api/analyze/stream", "raw_path": b"/api/analyze/stream",
+                "query_string": b"", "headers": headers, "scheme": "http", "server": ("test", 80),
+                "client": ("127.0.0.1", 1234), "root_path": "", "http_version": "1.1",
+            }
+            await asyncio.wait_for(app(scope, receive, send), 5)
+
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(main, "stream_text_triage", endless):
+            asyncio.run(scenario())
+            assert stopped.wait(5)
+        assert cache.get(main.triage_cache_key("Itch")) is None
+
+    def test_requires_auth(self):
+        response = TestClient(app).post("/api/analyze/stream", json={"symptoms": "Cough"})
+        assert response.status_code in (401, 403)
+
+
+class TestStreamTextTriage:
+    """stream_text_triage forwards content chunks from the agent stream"""
+
+    def test_forwards_content_events_until_cancelled(self):
+        cancelled = threading.Event()
+        events = [
+            SimpleNamespace(event="RunStarted", content=None),
+            SimpleNamespace(event="RunContent", content="Rest "),
+            SimpleNamespace(event="RunContent", content="and fluids."),
+            SimpleNamespace(event="RunContent", content=" Ignored"),
+        ]
+
+        def run(prompt, stream=False):
+            assert stream
+            for event in events:
+                yield event
+                if event.content == "and fluids.":
+                    cancelled.set()
+
+        chunks = []
+        agent = SimpleNamespace(run=run)
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(symptom_triage, "get_agent", lambda *a, **k: agent):
+            text = symptom_triage.stream_text_triage("Fever", chunks.append, cancelled)
+        assert chunks == ["Rest ", "and fluids."]
+        assert text == "Rest and fluids."
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
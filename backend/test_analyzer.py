@@ -0,0 +1,134 @@
+"""
+Tests for MedicalSymptomAnalyzer image preparation.
+"""
+
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models import analyzer as analyzer_module
+from models.analyzer import MODEL_IMAGE_WIDTH, MedicalSymptomAnalyzer
+from models.decoding import ImageTooLargeError, decode_for_model, decode_scaled
+
+
+def encode(image: Image.Image, fmt="PNG") -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def analyzer():
+    with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}):
+        yield MedicalSymptomAnalyzer()
+
+
+class TestPrepareImage:
+    """The model image is a resized in-memory JPEG"""
+
+    def test_encodes_resized_jpeg_in_memory(self, analyzer):
+        image = analyzer.prepare_image(encode(Image.new("RGB", (1000, 800), "teal")))
+        assert image.mime_type == "image/jpeg"
+        assert image.filepath is None
+        decoded = Image.open(BytesIO(image.content))
+        assert decoded.format == "JPEG"
+        assert decoded.size == (MODEL_IMAGE_WIDTH, 400)
+
+    def test_transparency_is_flattened_onto_white(self, analyzer):
+        image = analyzer.prepare_image(encode(Image.new("RGBA", (50, 50), (255, 0, 0, 0))))
+        pixel = Image.open(BytesIO(image.content)).convert("RGB").getpixel((25, 25))
+        assert all(channel > 240 for channel in pixel)
+
+    def test_analyze_sends_bytes_without_temp_files(self, analyzer):
+        sent = {}
+
+        def run(query, images):
+            sent["images"] = images
+            return SimpleNamespace(content=json.dumps({"analysis_text": "ok"}))
+
+        agent = SimpleNamespace(run=run)
+        with patch.object(analyzer_module, "get_agent", lambda *a, **k: agent), \
+                patch("tempfile.NamedTemporaryFile", side_effect=AssertionError("temp file used")):
+            result = analyzer.analyze(encode(Image.new("RGB", (640, 480), "white"), "JPEG"))
+        assert result["success"] is True
+        assert set(result["image_quality"]) == {"brightness", "contrast", "warnings"}
+        assert sent["images"][0].content.startswith(b"\xff\xd8")
+
+    def test_symptoms_are_added_to_the_prompt(self, analyzer):
+        queries = []
+
+        def run(query, images):
+            queries.append(query)
+            return SimpleNamespace(content=json.dumps({"analysis_text": "ok"}))
+
+        agent = SimpleNamespace(run=run)
+        with patch.object(analyzer_module, "get_agent", lambda *a, **k: agent):
+            analyzer.analyze(encode(Image.new("RGB", (64, 64), "white"), "JPEG"), "Itchy since Monday")
+            analyzer.analyze(encode(Image.new("RGB", (64, 64), "white"), "JPEG"))
+        assert queries[0].endswith("Itchy since Monday")
+        assert "Patient-reported symptoms" not in queries[1]
+
+    def test_analyze_many_sends_all_images_in_one_call(self, analyzer):
+        calls = []
+
+        def run(query, images):
+            calls.append((query, images))
+            return SimpleNamespace(content=json.dumps({"analysis_text": "ok"}))
+
+        agent = SimpleNamespace(run=run)
+        uploads = [encode(Image.new("RGB", (640, 480), color), "JPEG") for color in ("white", "gray", "black")]
+        with patch.object(analyzer_module, "get_agent", lambda *a, **k: agent), \
+                patch("models.processor.get_process_pool", lambda: ThreadPoolExecutor(2)):
+            result = analyzer.analyze_many(uploads, "Burn, second day")
+        assert result["success"] is True
+        assert len(calls) == 1
+        query, images = calls[0]
+        assert "3 images" in query
+        assert query.endswith("Burn, second day")
+        assert [image.mime_type for image in images] == ["image/jpeg"] * 3
+        brightness = [entry["brightness"] for entry in result["image_quality"]]
+        assert brightness == sorted(brightness, reverse=True)
+
+
+def exif_rotated_jpeg(size=(1200, 800)) -> bytes:
+    """A landscape JPEG whose EXIF says to rotate it to portrait."""
+    image = Image.new("RGB", size, "navy")
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", exif=exif)
+    return buffer.getvalue()
+
+
+class TestDecoding:
+    """Scaled JPEG decode, EXIF orientation and the pixel cap"""
+
+    def test_jpeg_is_decoded_at_reduced_scale(self):
+        image = decode_scaled(encode(Image.new("RGB", (4000, 3000), "gray"), "JPEG"), (500, 500))
+        # 1/4 scale is the smallest libjpeg scale that keeps both sides >= 500
+        assert image.size == (1000, 750)
+
+    def test_exif_orientation_is_applied(self):
+        image = decode_for_model(exif_rotated_jpeg(), 400)
+        assert image.size == (400, 600)
+
+    def test_small_images_are_not_upscaled(self):
+        assert decode_for_model(encode(Image.new("RGB", (120, 90))), 500).size == (120, 90)
+
+    def test_pixel_cap_rejects_oversized_images(self):
+        with pytest.raises(ImageTooLargeError):
+            decode_for_model(encode(Image.new("L", (3000, 3000))), 500, max_pixels=1_000_000)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
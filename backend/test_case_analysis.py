@@ -0,0 +1,133 @@
+"""
+Tests for background AI analysis of new health cases.
+"""
+
+import json
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from main import app
+
+
+def fake_triage(symptoms):
+    return f"Triage for: {symptoms}"
+
+
+@pytest.fixture
+def client(stub_postgrest):
+    """A client whose lifespan runs the analysis workers with a fake triage agent."""
+    with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+            patch.object(main.case_analysis, "analyze", fake_triage):
+        with TestClient(app) as client:
+            yield client
+
+
+def wait_for_analysis(client, case_id, headers, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        analysis = client.get(f"/api/cases/{case_id}", headers=headers).json()["ai_analysis"]
+        if analysis and analysis.get("status") != "pending":
+            return analysis
+        time.sleep(0.05)
+    raise AssertionError("analysis did not finish")
+
+
+class TestCaseAnalysis:
+    """create_case queues analysis that is written back into the case"""
+
+    def test_create_returns_pending_then_completes(self, client, make_auth_headers):
+        headers = make_auth_headers()
+        case = client.post("/api/cases", json={"symptoms": "Headache"}, headers=headers).json()
+        assert case["ai_analysis"] == {"status": "pending"}
+
+        analysis = wait_for_analysis(client, case["id"], headers)
+        assert analysis["status"] == "completed"
+        assert analysis["analysis"] == "Triage for: Headache"
+
+    def test_failed_analysis_is_recorded(self, client, make_auth_headers):
+        def broken(symptoms):
+            raise RuntimeError("model unavailable")
+
+        headers = make_auth_headers()
+        with patch.object(main.case_analysis, "analyze", broken):
+            case = client.post("/api/cases", json={"symptoms": "Cough"}, headers=headers).json()
+            analysis = wait_for_analysis(client, case["id"], headers)
+        assert analysis == {"status": "failed", "error": "model unavailable", "retryable": True, "attempts": 1}
+
+    def test_empty_model_answer_is_not_completed(self, client, make_auth_headers):
+        headers = make_auth_headers()
+        with patch.object(main.case_analysis, "analyze", lambda symptoms: main.NO_ANALYSIS):
+            case = client.post("/api/cases", json={"symptoms": "Cough"}, headers=headers).json()
+            analysis = wait_for_analysis(client, case["id"], headers)
+        assert analysis["status"] == "failed"
+        assert analysis["retryable"] is True
+
+    def test_stream_emits_final_analysis(self, client, make_auth_headers):
+        headers = make_auth_headers()
+        case = client.post("/api/cases", json={"symptoms": "Fever"}, headers=headers).json()
+
+        with client.stream("GET", f"/api/cases/{case['id']}/analysis/stream", headers=headers) as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            body = "".join(response.iter_text())
+        events = [line[len("data: "):] for line in body.splitlines() if line.startswith("data: ")]
+        final = json.loads(events[-1])
+        assert final["status"] == "completed"
+        assert final["analysis"] == "Triage for: Fever"
+
+    def test_stream_for_unknown_case_returns_404(self, client, make_auth_headers):
+        response = client.get("/api/cases/missing/analysis/stream", headers=make_auth_headers())
+        assert response.status_code == 404
+
+    def test_no_analysis_without_gemini_key(self, client, make_auth_headers):
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "", "GOOGLE_API_KEY": ""}):
+            case = client.post("/api/cases", json={"symptoms": "Rash"}, headers=make_auth_headers()).json()
+        assert case["ai_analysis"] is None
+
+    def test_recovery_resubmits_stale_pending_cases(self, client, stub_postgrest):
+        stub_postgrest.tables["health_cases"].append({
+            "id": "stale-case", "user_id": "u1", "symptoms": "Dizziness", "severity": None,
+            "category": None, "status": "open", "ai_analysis": {"status": "pending"},
+            "created_at": "2024-01-01T00:00:00+00:00", "updated_at": "2024-01-01T00:00:00+00:00",
+        })
+        assert client.portal.call(main.case_analysis.recover) == 1
+        deadline = time.time() + 5
+        while stub_postgrest.tables["health_cases"][0]["ai_analysis"]["status"] == "pending":
+            assert time.time() < deadline
+            time.sleep(0.05)
+        assert stub_postgrest.tables["health_cases"][0]["ai_analysis"]["analysis"] == "Triage for: Dizziness"
+
+
+    def test_recovery_retries_failed_runs_until_the_cap(self, client, stub_postgrest):
+        stub_postgrest.tables["health_cases"].append({
+            "id": "failed-case", "user_id": "u1", "symptoms": "Nausea", "severity": None,
+            "category": None, "status": "open",
+            "ai_analysis": {"status": "failed", "error": "timeout", "retryable": True, "attempts": 2},
+            "created_at": "2024-01-01T00:00:00+00:00", "updated_at": "2024-01-01T00:00:00+00:00",
+        })
+        row = stub_postgrest.tables["health_cases"][0]
+
+        def broken(symptoms):
+            raise RuntimeError("still down")
+
+        with patch.object(main.case_analysis, "analyze", broken):
+            assert client.portal.call(main.case_analysis.recover) == 1
+            deadline = time.time() + 5
+            while row["ai_analysis"].get("attempts") == 2:
+                assert time.time() < deadline
+                time.sleep(0.05)
+        assert row["ai_analysis"] == {"status": "failed", "error": "still down", "retryable": False, "attempts": 3}
+        row["updated_at"] = "2024-01-01T00:00:00+00:00"
+        assert client.portal.call(main.case_analysis.recover) == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,140 @@
+"""
+Tests for the per-user health case read cache.
+"""
+
+import os
+import sys
+
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from case_cache import CaseCache, etag_matches, make_etag
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    db_path = str(tmp_path / "cases.db") if request.param == "sqlite" else None
+    return CaseCache(ttl_seconds=60, db_path=db_path)
+
+
+class TestCaseCache:
+    """Unit tests for CaseCache"""
+
+    def test_list_round_trip(self, cache):
+        version = cache.version("u1")
+        page = cache.put_list("u1", "k", version, [{"id": "a"}], None)
+        assert cache.get_list("u1", "k") == page
+        assert page["etag"] == make_etag({"rows": [{"id": "a"}], "next_cursor": None})
+
+    def test_invalidate_drops_entries(self, cache):
+        cache.put_list("u1", "k", cache.version("u1"), [{"id": "a"}], None)
+        cache.put_case("u1", cache.version("u1"), {"id": "a"})
+        cache.invalidate_user("u1")
+        assert cache.get_list("u1", "k") is None
+        assert cache.get_case("u1", "a") is None
+
+    def test_read_racing_a_write_is_not_cached(self, cache):
+        version = cache.version("u1")
+        cache.invalidate_user("u1")
+        cache.put_list("u1", "k", version, [{"id": "stale"}], None)
+        assert cache.get_list("u1", "k") is None
+
+    def test_users_are_isolated(self, cache):
+        cache.put_case("u1", cache.version("u1"), {"id": "a"})
+        cache.invalidate_user("u2")
+        assert cache.get_case("u1", "a") == {"id": "a"}
+        assert cache.get_case("u2", "a") is None
+
+    def test_expired_entries_are_dropped(self):
+        cache = CaseCache(ttl_seconds=0)
+        cache.put_case("u1", cache.version("u1"), {"id": "a"})
+        assert cache.get_case("u1", "a") is None
+
+    def test_sqlite_tier_shared_between_instances(self, tmp_path):
+        db_path = str(tmp_path / "shared.db")
+        worker_a, worker_b = CaseCache(ttl_seconds=60, db_path=db_path), CaseCache(ttl_seconds=60, db_path=db_path)
+        worker_a.put_case("u1", worker_a.version("u1"), {"id": "a"})
+        assert worker_b.get_case("u1", "a") == {"id": "a"}
+
+        worker_b.invalidate_user("u1")
+        assert worker_a.get_case("u1", "a") is None
+
+
+def test_etag_matches():
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert etag_matches('"abc", W/"def"', 'W/"def"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches('W/"abc"', 'W/"def"')
+    assert not etag_matches(None, 'W/"abc"')
+
+
+class TestCachedCaseEndpoints:
+    """Cache behaviour through the HTTP API"""
+
+    def test_repeat_list_served_from_cache(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        client.post("/api/cases", json={"symptoms": "Cough"}, headers=headers)
+
+        first = client.get("/api/cases", headers=headers)
+        calls = len(stub_postgrest.requests)
+        second = client.get("/api/cases", headers=headers)
+
+        assert second.json() == first.json()
+        assert len(stub_postgrest.requests) == calls
+
+    def test_sqlite_backed_cache_serves_the_endpoints(self, stub_postgrest, make_auth_headers, tmp_path):
+        # Persistent caches are called from the thread pool
+        cache = CaseCache(ttl_seconds=60, db_path=str(tmp_path / "cases.db"))
+        assert cache.persistent and not CaseCache().persistent
+        headers = make_auth_headers()
+        with patch.object(main, "case_cache", cache):
+            case = client.post("/api/cases", json={"symptoms": "Cough"}, headers=headers).json()
+            first = client.get("/api/cases", headers=headers)
+            calls = len(stub_postgrest.requests)
+            assert client.get("/api/cases", headers=headers).json() == first.json()
+            assert client.get(f"/api/cases/{case['id']}", headers=headers).json()["symptoms"] == "Cough"
+        assert len(stub_postgrest.requests) == calls + 1
+
+    def test_unchanged_list_returns_304(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        client.post("/api/cases", json={"symptoms": "Cough"}, headers=headers)
+        etag = client.get("/api/cases", headers=headers).headers["ETag"]
+
+        response = client.get("/api/cases", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+    def test_write_invalidates_list(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        client.post("/api/cases", json={"symptoms": "Cough"}, headers=headers)
+        etag = client.get("/api/cases", headers=headers).headers["ETag"]
+
+        client.post("/api/cases", json={"symptoms": "Fever"}, headers=headers)
+        response = client.get("/api/cases", headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+
+    def test_update_invalidates_single_case(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        case = client.post("/api/cases", json={"symptoms": "Cough"}, headers=headers).json()
+        etag = client.get(f"/api/cases/{case['id']}", headers=headers).headers["ETag"]
+        assert client.get(
+            f"/api/cases/{case['id']}", headers={**headers, "If-None-Match": etag}
+        ).status_code == 304
+
+        client.put(f"/api/cases/{case['id']}", json={"status": "closed"}, headers=headers)
+        response = client.get(f"/api/cases/{case['id']}", headers=headers)
+        assert response.json()["status"] == "closed"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,120 @@
+"""
+Tests for the write-behind case outbox.
+"""
+
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from main import app
+
+client = TestClient(app)
+
+
+def flush():
+    return asyncio.run(main.case_outbox.flush_once(main.supabase_pool))
+
+
+class TestCaseOutbox:
+    """Queueing and flushing of new cases"""
+
+    def test_unreachable_supabase_queues_case(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        stub_postgrest.unreachable = True
+
+        response = client.post("/api/cases", json={"symptoms": "Cough"}, headers=headers)
+        assert response.status_code == 202
+        case = response.json()
+        assert case["sync_status"] == "pending"
+
+        # Readable before it reaches Supabase
+        assert client.get(f"/api/cases/{case['id']}", headers=headers).json()["symptoms"] == "Cough"
+
+        stub_postgrest.unreachable = False
+        assert len(flush()) == 1
+        rows = stub_postgrest.tables["health_cases"]
+        assert [row["id"] for row in rows] == [case["id"]]
+        assert rows[0]["created_at"] == case["created_at"]
+
+    def test_write_behind_mode_always_queues(self, stub_postgrest, make_auth_headers):
+        with patch.object(main.settings, "CASE_WRITE_BEHIND", True):
+            response = client.post("/api/cases", json={"symptoms": "Rash"}, headers=make_auth_headers())
+        assert response.status_code == 202
+        assert stub_postgrest.tables["health_cases"] == []
+        assert len(flush()) == 1
+        assert len(stub_postgrest.tables["health_cases"]) == 1
+
+    def test_new_cases_queue_behind_pending_ones(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        stub_postgrest.unreachable = True
+        first = client.post("/api/cases", json={"symptoms": "First"}, headers=headers).json()
+        stub_postgrest.unreachable = False
+
+        response = client.post("/api/cases", json={"symptoms": "Second"}, headers=headers)
+        assert response.status_code == 202
+
+        flush()
+        assert [row["symptoms"] for row in stub_postgrest.tables["health_cases"]] == ["First", "Second"]
+        assert stub_postgrest.tables["health_cases"][0]["id"] == first["id"]
+
+    def test_failed_flush_is_retried_without_duplicates(self, stub_postgrest, make_auth_headers):
+        with patch.object(main.settings, "CASE_WRITE_BEHIND", True):
+            client.post("/api/cases", json={"symptoms": "Fever"}, headers=make_auth_headers())
+
+        stub_postgrest.fail_with = 503
+        assert flush() == []
+        stub_postgrest.fail_with = None
+
+        # Backoff holds the row until it expires
+        assert flush() == []
+        main.case_outbox._connect().execute("UPDATE case_outbox SET next_attempt_at = 0")
+        assert len(flush()) == 1
+        assert len(flush()) == 0
+        assert len(stub_postgrest.tables["health_cases"]) == 1
+
+    def test_rejected_row_is_dead_lettered_without_blocking_its_user(self, stub_postgrest, make_auth_headers):
+        alice, bob = make_auth_headers(), make_auth_headers()
+        with patch.object(main.settings, "CASE_WRITE_BEHIND", True):
+            boom = client.post("/api/cases", json={"symptoms": "BOOM"}, headers=alice).json()
+            client.post("/api/cases", json={"symptoms": "Later"}, headers=alice)
+            client.post("/api/cases", json={"symptoms": "Headache"}, headers=bob)
+        # A check-constraint violation (23514) can never succeed
+        stub_postgrest.reject_row = lambda row: row.get("symptoms") == "BOOM"
+
+        flush()
+        assert [row["symptoms"] for row in stub_postgrest.tables["health_cases"]] == ["Later", "Headache"]
+        failed = client.get(f"/api/cases/{boom['id']}", headers=alice).json()
+        assert failed["sync_status"] == "failed"
+        assert "23514" in failed["sync_error"]
+
+        # Alice's new cases go straight to Supabase again
+        assert client.post("/api/cases", json={"symptoms": "Cough"}, headers=alice).status_code == 200
+
+    def test_repeated_rejections_are_dead_lettered_but_outages_are_not(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        with patch.object(main.settings, "CASE_WRITE_BEHIND", True):
+            case = client.post("/api/cases", json={"symptoms": "Fever"}, headers=headers).json()
+
+        def retry(**failure):
+            for name, value in failure.items():
+                setattr(stub_postgrest, name, value)
+            for _ in range(main.case_outbox.MAX_REJECTIONS):
+                main.case_outbox._connect().execute("UPDATE case_outbox SET next_attempt_at = 0")
+                flush()
+            return main.case_outbox.get_pending(case["user_id"], case["id"])["sync_status"]
+
+        assert retry(unreachable=True) == "pending"
+        assert retry(unreachable=False, fail_with=503) == "failed"
+        assert main.case_outbox.has_pending(case["user_id"]) is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,121 @@
+"""
+Tests for the local health_cases replica, synced from an in-memory PostgREST stub.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from main import app
+from case_replica import CaseReplica
+
+client = TestClient(app)
+
+USER_ID = "44444444-4444-4444-8444-444444444444"
+
+
+@pytest.fixture
+def replica(stub_postgrest, tmp_path):
+    replica = CaseReplica(str(tmp_path / "replica.db"), enabled=True, max_staleness=60.0, batch_size=3)
+    with patch.object(main, "case_replica", replica):
+        yield replica
+
+
+def sync(replica):
+    return asyncio.run(replica.sync(main.supabase_pool))
+
+
+def seed(stub, count, user_id=USER_ID):
+    for i in range(count):
+        stub.tables["health_cases"].append({
+            "id": f"00000000-0000-4000-8000-{i:012d}",
+            "user_id": user_id,
+            "symptoms": f"Symptom {i}",
+            "ai_analysis": {"summary": f"note {i}"},
+            "severity": "low",
+            "category": None,
+            "status": "open",
+            "created_at": f"2024-01-01T00:00:{i:02d}+00:00",
+            "updated_at": f"2024-01-01T00:00:{i:02d}.5+00:00" if i % 2 else None,
+        })
+
+
+class TestCaseReplica:
+    """Sync and read-serving behaviour"""
+
+    def test_initial_sync_copies_all_rows(self, stub_postgrest, replica):
+        seed(stub_postgrest, 7)
+        sync(replica)
+        assert replica.is_fresh()
+        assert len(replica.list_cases(USER_ID, ["id"], None, 100)) == 7
+        assert replica.get_case(USER_ID, "00000000-0000-4000-8000-000000000003")["ai_analysis"] == {"summary": "note 3"}
+
+    def test_incremental_sync_picks_up_changes(self, stub_postgrest, replica):
+        seed(stub_postgrest, 4)
+        sync(replica)
+
+        row = stub_postgrest.tables["health_cases"][0]
+        row.update({"status": "closed", "updated_at": stub_postgrest.now()})
+        sync(replica)
+        assert replica.get_case(USER_ID, row["id"])["status"] == "closed"
+
+    def test_fresh_replica_serves_reads_without_upstream(self, stub_postgrest, replica, make_auth_headers):
+        headers = make_auth_headers(USER_ID)
+        seed(stub_postgrest, 5)
+        sync(replica)
+        before = len(stub_postgrest.requests)
+
+        page = client.get("/api/cases", params={"limit": 2}, headers=headers)
+        assert [row["symptoms"] for row in page.json()] == ["Symptom 4", "Symptom 3"]
+        second = client.get(
+            "/api/cases", params={"limit": 2, "cursor": page.headers["X-Next-Cursor"]}, headers=headers
+        ).json()
+        assert [row["symptoms"] for row in second] == ["Symptom 2", "Symptom 1"]
+        assert client.get("/api/cases/00000000-0000-4000-8000-000000000001", headers=headers).status_code == 200
+        assert len(stub_postgrest.requests) == before
+
+    def test_stale_replica_is_bypassed(self, stub_postgrest, replica, make_auth_headers):
+        headers = make_auth_headers(USER_ID)
+        seed(stub_postgrest, 2)
+        sync(replica)
+        stub_postgrest.tables["health_cases"][0]["symptoms"] = "Changed upstream"
+
+        with patch.object(replica, "max_staleness", 0.0):
+            time.sleep(0.01)
+            rows = client.get("/api/cases", headers=headers).json()
+        assert "Changed upstream" in [row["symptoms"] for row in rows]
+
+    def test_stale_replica_serves_during_outage(self, stub_postgrest, replica, make_auth_headers):
+        headers = make_auth_headers(USER_ID)
+        seed(stub_postgrest, 2)
+        sync(replica)
+        stub_postgrest.unreachable = True
+
+        with patch.object(replica, "max_staleness", 0.0):
+            response = client.get("/api/cases", headers=headers)
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+
+    def test_writes_are_visible_immediately(self, stub_postgrest, replica, make_auth_headers):
+        headers = make_auth_headers(USER_ID)
+        sync(replica)
+
+        case = client.post("/api/cases", json={"symptoms": "Cough"}, headers=headers).json()
+        client.put(f"/api/cases/{case['id']}", json={"status": "closed"}, headers=headers)
+        before = len(stub_postgrest.requests)
+
+        assert client.get(f"/api/cases/{case['id']}", headers=headers).json()["status"] == "closed"
+        assert len(stub_postgrest.requests) == before
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
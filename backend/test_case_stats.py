@@ -0,0 +1,127 @@
+"""
+Tests for the case statistics rollups and GET /api/cases/stats.
+"""
+
+import asyncio
+import os
+import sys
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from main import app
+
+client = TestClient(app)
+
+
+class TestCaseStats:
+    """Incremental counters behind /api/cases/stats"""
+
+    def test_create_and_update_move_counts(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        case = client.post("/api/cases", json={"symptoms": "Fever", "severity": "high"}, headers=headers).json()
+        client.post("/api/cases", json={"symptoms": "Cough", "severity": "low", "category": "respiratory"}, headers=headers)
+        client.put(f"/api/cases/{case['id']}", json={"status": "closed"}, headers=headers)
+
+        response = client.get("/api/cases/stats", params={"days": 1}, headers=headers)
+        assert response.status_code == 200
+        totals = response.json()["totals"]
+        assert totals["total"] == 2
+        assert totals["severity"] == {"high": 1, "low": 1}
+        assert totals["category"] == {"respiratory": 1, "unspecified": 1}
+        assert totals["status"] == {"open": 1, "closed": 1}
+        assert len(response.json()["days"]) == 1
+
+    def test_stats_are_per_user_by_default(self, stub_postgrest, make_auth_headers):
+        client.post("/api/cases", json={"symptoms": "Rash"}, headers=make_auth_headers())
+        body = client.get("/api/cases/stats", headers=make_auth_headers()).json()
+        assert body["totals"]["total"] == 0
+        assert body["days"] == []
+
+    def test_all_scope_requires_admin(self, stub_postgrest, make_auth_headers):
+        client.post("/api/cases", json={"symptoms": "Rash"}, headers=make_auth_headers())
+        client.post("/api/cases", json={"symptoms": "Cough"}, headers=make_auth_headers())
+
+        response = client.get("/api/cases/stats", params={"scope": "all"}, headers=make_auth_headers())
+        assert response.status_code == 403
+        assert response.json()["detail"]["code"] == "FORBIDDEN"
+
+        admin = make_auth_headers(email="ops@example.com")
+        with patch.object(main.settings, "CASE_STATS_ADMIN_EMAILS", "ops@example.com"):
+            response = client.get("/api/cases/stats", params={"scope": "all"}, headers=admin)
+        assert response.status_code == 200
+        assert response.json()["totals"]["total"] == 2
+
+    def test_recording_a_row_twice_does_not_double_count(self, stub_postgrest):
+        row = {"id": "c1", "user_id": "u1", "severity": "low", "status": "open", "created_at": "2024-03-01T10:00:00+00:00"}
+        main.case_stats.record([row])
+        main.case_stats.record([row])
+        [day] = main.case_stats.daily("u1", date(2024, 3, 1), date(2024, 3, 1))
+        assert day["total"] == 1
+
+    def test_rebuild_recounts_from_upstream(self, stub_postgrest):
+        for i, severity in enumerate(["high", "high", "low"]):
+            stub_postgrest.tables["health_cases"].append({
+                "id": f"case-{i}", "user_id": "u1", "symptoms": "x", "severity": severity,
+                "category": None, "status": "open", "created_at": "2024-03-01T10:00:00+00:00",
+            })
+        assert asyncio.run(main.case_stats.rebuild(main.supabase_pool, batch_size=2)) == 3
+        assert main.case_stats.is_built()
+        [day] = main.case_stats.daily("*", date(2024, 3, 1), date(2024, 3, 1))
+        assert day["severity"] == {"high": 2, "low": 1}
+
+    def test_rows_recorded_during_a_rebuild_are_kept(self, stub_postgrest):
+        day = "2024-03-01T10:00:00+00:00"
+        stub_postgrest.tables["health_cases"].append({
+            "id": "case-0", "user_id": "u1", "symptoms": "x", "severity": "low",
+            "category": None, "status": "open", "created_at": day,
+        })
+        execute = main.supabase_pool.execute
+
+        async def scan_racing_writes(query):
+            result = await execute(query)
+            # Written while the scan is in flight: a new case and an update
+            main.case_stats.record([
+                {"id": "case-1", "user_id": "u1", "severity": "high", "status": "open", "created_at": day},
+                {"id": "case-0", "user_id": "u1", "severity": "high", "status": "open", "created_at": day},
+            ])
+            return result
+
+        with patch.object(main.supabase_pool, "execute", scan_racing_writes):
+            assert asyncio.run(main.case_stats.rebuild(main.supabase_pool)) == 1
+        [totals] = main.case_stats.daily("u1", date(2024, 3, 1), date(2024, 3, 1))
+        assert totals["total"] == 2
+        assert totals["severity"] == {"high": 2}
+
+    def test_failed_rebuild_stops_tracking_dirty_cases(self, stub_postgrest):
+        async def unreachable(query):
+            raise ConnectionError("Supabase is down")
+
+        with patch.object(main.supabase_pool, "execute", unreachable):
+            with pytest.raises(ConnectionError):
+                asyncio.run(main.case_stats.rebuild(main.supabase_pool))
+
+        row = {"id": "c1", "user_id": "u1", "severity": "low", "status": "open", "created_at": "2024-03-01T10:00:00+00:00"}
+        main.case_stats.record([row])
+        conn = main.case_stats._connect()
+        try:
+            assert conn.execute("SELECT 1 FROM case_stat_meta WHERE key = 'rebuilding'").fetchone() is None
+            assert conn.execute("SELECT COUNT(*) FROM case_stat_dirty").fetchone()[0] == 0
+        finally:
+            conn.close()
+        [day] = main.case_stats.daily("u1", date(2024, 3, 1), date(2024, 3, 1))
+        assert day["total"] == 1
+
+    def test_stats_route_is_not_a_case_id(self, stub_postgrest, make_auth_headers):
+        response = client.get("/api/cases/stats", params={"days": 0}, headers=make_auth_headers())
+        assert response.status_code == 422
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
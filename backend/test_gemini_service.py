@@ -88,6 +88,17 @@ class TestGeminiService:
         
         assert result.urgency_level == "low"
     
+    def test_parse_analysis_response_keywords_in_vocabulary_order(self):
+        """Keywords are found anywhere in a word, once each, in vocabulary order"""
+        service = GeminiService(api_key="test-api-key")
+        
+        response_text = "Painful WOUND with signs of Infection; the Rash and redness suggest an infection."
+        result = service._parse_analysis_response(response_text)
+        
+        assert [s.symptom_name for s in result.detected_symptoms] == ["Rash", "Redness", "Pain", "Infection"]
+        assert result.possible_conditions == ["Infection", "Wound"]
+        assert result.urgency_level == "medium"
+    
     @pytest.mark.asyncio
     @patch('gemini_service.genai.GenerativeModel')
     async def test_analyze_medical_image_success(self, mock_model_class):
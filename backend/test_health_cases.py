@@ -0,0 +1,252 @@
+"""
+Tests for the health case endpoints, run against an in-memory PostgREST stub.
+"""
+
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from main import app
+
+client = TestClient(app)
+
+
+class TestHealthCaseEndpoints:
+    """CRUD behaviour of /api/cases"""
+
+    def test_create_and_get_case(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        response = client.post("/api/cases", json={"symptoms": "Cough", "severity": "low"}, headers=headers)
+        assert response.status_code == 200
+        case = response.json()
+        assert case["symptoms"] == "Cough"
+        assert case["status"] == "open"
+
+        response = client.get(f"/api/cases/{case['id']}", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["id"] == case["id"]
+
+    def test_get_missing_case_returns_404(self, stub_postgrest, make_auth_headers):
+        response = client.get("/api/cases/does-not-exist", headers=make_auth_headers())
+        assert response.status_code == 404
+        assert response.json()["detail"]["code"] == "CASE_NOT_FOUND"
+
+    def test_cases_are_isolated_per_user(self, stub_postgrest, make_auth_headers):
+        alice, bob = make_auth_headers(), make_auth_headers()
+        case = client.post("/api/cases", json={"symptoms": "Rash"}, headers=alice).json()
+
+        assert client.get(f"/api/cases/{case['id']}", headers=bob).status_code == 404
+        assert client.get("/api/cases", headers=bob).json() == []
+        assert len(client.get("/api/cases", headers=alice).json()) == 1
+
+    def test_update_case(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        case = client.post("/api/cases", json={"symptoms": "Fever"}, headers=headers).json()
+
+        response = client.put(f"/api/cases/{case['id']}", json={"status": "closed"}, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["status"] == "closed"
+
+    def test_update_is_single_round_trip(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        case = client.post("/api/cases", json={"symptoms": "Fever"}, headers=headers).json()
+        before = len(stub_postgrest.requests)
+
+        response = client.put(f"/api/cases/{case['id']}", json={"severity": "high"}, headers=headers)
+        assert response.status_code == 200
+        assert len(stub_postgrest.requests) == before + 1
+        assert stub_postgrest.requests[-1].method == "PATCH"
+
+    def test_update_missing_case_returns_404(self, stub_postgrest, make_auth_headers):
+        response = client.put(
+            "/api/cases/00000000-0000-4000-8000-000000000000",
+            json={"status": "closed"},
+            headers=make_auth_headers(),
+        )
+        assert response.status_code == 404
+        assert response.json()["detail"]["code"] == "CASE_NOT_FOUND"
+
+    def test_update_with_current_etag(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        case = client.post("/api/cases", json={"symptoms": "Fever"}, headers=headers).json()
+        etag = client.get(f"/api/cases/{case['id']}", headers=headers).headers["ETag"]
+
+        response = client.put(
+            f"/api/cases/{case['id']}",
+            json={"status": "closed"},
+            headers={**headers, "If-Match": etag},
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_update_with_stale_etag_returns_412(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        case = client.post("/api/cases", json={"symptoms": "Fever"}, headers=headers).json()
+        etag = client.get(f"/api/cases/{case['id']}", headers=headers).headers["ETag"]
+        client.put(f"/api/cases/{case['id']}", json={"severity": "low"}, headers=headers)
+
+        response = client.put(
+            f"/api/cases/{case['id']}",
+            json={"status": "closed"},
+            headers={**headers, "If-Match": etag},
+        )
+        assert response.status_code == 412
+        assert response.json()["detail"]["code"] == "CASE_MODIFIED"
+
+    def test_update_requires_fields(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        case = client.post("/api/cases", json={"symptoms": "Fever"}, headers=headers).json()
+
+        response = client.put(f"/api/cases/{case['id']}", json={}, headers=headers)
+        assert response.status_code == 400
+        assert response.json()["detail"]["code"] == "NO_UPDATE_FIELDS"
+
+    def test_upstream_failure_returns_500(self, stub_postgrest, make_auth_headers):
+        stub_postgrest.fail_with = 400
+        response = client.get("/api/cases", headers=make_auth_headers())
+        assert response.status_code == 500
+        assert response.json()["detail"]["code"] == "CASES_FETCH_ERROR"
+
+
+class TestBulkCaseCreation:
+    """POST /api/cases/bulk"""
+
+    def test_bulk_insert_single_round_trip(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        items = [{"symptoms": f"Symptom {i}"} for i in range(5)]
+        before = len(stub_postgrest.requests)
+
+        response = client.post("/api/cases/bulk", json={"items": items}, headers=headers)
+        assert response.status_code == 200
+        body = response.json()
+        assert body["created"] == 5
+        assert [r["status"] for r in body["results"]] == ["created"] * 5
+        assert len(stub_postgrest.requests) == before + 1
+        assert len(client.get("/api/cases", headers=headers).json()) == 5
+
+    def test_idempotency_key_prevents_duplicates(self, stub_postgrest, make_auth_headers):
+        headers = make_auth_headers()
+        items = [{"symptoms": "Cough", "idempotency_key": "kiosk-1"}, {"symptoms": "Rash", "idempotency_key": "kiosk-2"}]
+        first = client.post("/api/cases/bulk", json={"items": items}, headers=headers).json()
+        retry = client.post("/api/cases/bulk", json={"items": items}, headers=headers).json()
+
+        assert first["created"] == 2
+        assert retry["created"] == 0
+        assert retry["duplicates"] == 2
+        assert retry["results"][0]["case"]["id"] == first["results"][0]["case"]["id"]
+        assert len(stub_postgrest.tables["health_cases"]) == 2
+
+    def test_repeated_key_within_a_batch_is_a_duplicate(self, stub_postgrest, make_auth_headers):
+        items = [
+            {"symptoms": "Cough", "idempotency_key": "kiosk-1"},
+            {"symptoms": "Rash"},
+            {"symptoms": "Cough", "idempotency_key": "kiosk-1"},
+        ]
+        body = client.post("/api/cases/bulk", json={"items": items}, headers=make_auth_headers()).json()
+
+        assert (body["created"], body["duplicates"]) == (2, 1)
+        assert [r["status"] for r in body["results"]] == ["created", "created", "duplicate"]
+        assert body["results"][2]["case"]["id"] == body["results"][0]["case"]["id"]
+        assert len(stub_postgrest.tables["health_cases"]) == 2
+
+    def test_idempotency_keys_are_scoped_per_user(self, stub_postgrest, make_auth_headers):
+        items = [{"symptoms": "Cough", "idempotency_key": "kiosk-1"}]
+        client.post("/api/cases/bulk", json={"items": items}, headers=make_auth_headers())
+        response = client.post("/api/cases/bulk", json={"items": items}, headers=make_auth_headers())
+        assert response.json()["created"] == 1
+
+    def test_invalid_and_rejected_items_fail_individually(self, stub_postgrest, make_auth_headers):
+        stub_postgrest.reject_row = lambda row: row.get("symptoms") == "BOOM"
+        items = [{"symptoms": "Cough"}, {"severity": "high"}, {"symptoms": "BOOM"}, {"symptoms": "Fever"}]
+
+        body = client.post("/api/cases/bulk", json={"items": items}, headers=make_auth_headers()).json()
+        assert [r["status"] for r in body["results"]] == ["created", "failed", "failed", "created"]
+        assert body["created"] == 2
+        assert body["failed"] == 2
+
+    def test_empty_batch_rejected(self, stub_postgrest, make_auth_headers):
+        response = client.post("/api/cases/bulk", json={"items": []}, headers=make_auth_headers())
+        assert response.status_code == 422
+
+
+class TestListCasesPagination:
+    """Keyset pagination and projection on GET /api/cases"""
+
+    @staticmethod
+    def _seed(stub, user_id, count):
+        for i in range(count):
+            stub.tables["health_cases"].append({
+                "id": f"00000000-0000-4000-8000-{i:012d}",
+                "user_id": user_id,
+                "symptoms": f"Symptom {i}",
+                "ai_analysis": {"summary": "x" * 100},
+                "severity": "low",
+                "category": None,
+                "status": "open",
+                # Pairs of rows share a timestamp so the id tiebreaker matters
+                "created_at": f"2024-01-01T00:00:{i // 2:02d}+00:00",
+                "updated_at": None,
+            })
+
+    def test_pages_cover_all_rows_once(self, stub_postgrest, make_auth_headers):
+        user_id = "11111111-1111-4111-8111-111111111111"
+        headers = make_auth_headers(user_id)
+        self._seed(stub_postgrest, user_id, 7)
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get("/api/cases", params=params, headers=headers)
+            assert response.status_code == 200
+            page = response.json()
+            assert len(page) <= 3
+            seen.extend(row["id"] for row in page)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        rows = sorted(
+            stub_postgrest.tables["health_cases"],
+            key=lambda row: (row["created_at"], row["id"]),
+            reverse=True,
+        )
+        assert seen == [row["id"] for row in rows]
+
+    def test_summary_omits_ai_analysis(self, stub_postgrest, make_auth_headers):
+        user_id = "22222222-2222-4222-8222-222222222222"
+        headers = make_auth_headers(user_id)
+        self._seed(stub_postgrest, user_id, 2)
+
+        page = client.get("/api/cases", params={"summary": "true"}, headers=headers).json()
+        assert all("ai_analysis" not in row for row in page)
+        assert all(row["symptoms"] for row in page)
+
+    def test_fields_projection(self, stub_postgrest, make_auth_headers):
+        user_id = "33333333-3333-4333-8333-333333333333"
+        headers = make_auth_headers(user_id)
+        self._seed(stub_postgrest, user_id, 2)
+
+        page = client.get("/api/cases", params={"fields": "status"}, headers=headers).json()
+        assert set(page[0]) == {"id", "created_at", "status"}
+        assert stub_postgrest.requests[-1].url.params["select"] == "id,created_at,status"
+
+    def test_unknown_field_rejected(self, stub_postgrest, make_auth_headers):
+        response = client.get("/api/cases", params={"fields": "password"}, headers=make_auth_headers())
+        assert response.status_code == 400
+        assert response.json()["detail"]["code"] == "INVALID_FIELDS"
+
+    def test_invalid_cursor_rejected(self, stub_postgrest, make_auth_headers):
+        response = client.get("/api/cases", params={"cursor": "not-a-cursor"}, headers=make_auth_headers())
+        assert response.status_code == 400
+        assert response.json()["detail"]["code"] == "INVALID_CURSOR"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
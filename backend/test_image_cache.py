@@ -0,0 +1,117 @@
+"""
+Tests for the perceptual-hash image analysis cache.
+"""
+
+import base64
+import os
+import sys
+from io import BytesIO
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from image_cache import ImageAnalysisCache, dhash, hamming
+from main import app
+
+
+def make_image(seed: int, size=(240, 180)) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    # Smooth random field so the image has structure that survives resizing
+    coarse = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize(size, Image.Resampling.BICUBIC)
+
+
+def encode(image: Image.Image, fmt="PNG", **kwargs) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ImageAnalysisCache(str(tmp_path / "image_cache.db"), version="v1", max_distance=4)
+
+
+class TestPerceptualHash:
+    """dHash is stable across re-encoding and resizing"""
+
+    def test_reencoded_copy_is_near(self):
+        image = make_image(1)
+        original = dhash(encode(image))
+        assert hamming(original, dhash(encode(image, "JPEG", quality=60))) <= 4
+        assert hamming(original, dhash(encode(image.resize((120, 90)), "JPEG", quality=80))) <= 4
+
+    def test_different_images_are_far(self):
+        assert hamming(dhash(encode(make_image(1))), dhash(encode(make_image(2)))) > 10
+
+
+class TestImageAnalysisCache:
+    """Near-duplicate lookups across memory and SQLite tiers"""
+
+    def test_near_duplicate_hits(self, cache):
+        cache.put(0xF0F0F0F0F0F0F0F0, {"analysis_text": "rash"})
+        assert cache.get(0xF0F0F0F0F0F0F0F3) == {"analysis_text": "rash"}
+        assert cache.get(0x0F0F0F0F0F0F0F0F) is None
+        stats = cache.stats()
+        assert (stats["hits"], stats["near_hits"], stats["misses"]) == (1, 1, 1)
+
+    def test_disk_tier_is_shared_and_versioned(self, cache, tmp_path):
+        cache.put(12345, {"analysis_text": "shared"})
+        other = ImageAnalysisCache(str(tmp_path / "image_cache.db"), version="v1", max_distance=4)
+        assert other.get(12345 ^ 0b101) == {"analysis_text": "shared"}
+        stale = ImageAnalysisCache(str(tmp_path / "image_cache.db"), version="v2", max_distance=4)
+        assert stale.get(12345) is None
+
+    def test_eviction_removes_index_entries(self, tmp_path):
+        cache = ImageAnalysisCache(None, max_entries=1)
+        cache.put(0, "first")
+        cache.put((1 << 64) - 1, "second")
+        assert cache.get(0) is None
+        assert all(0 not in bucket for bucket in cache._index.values())
+
+
+    def test_only_sqlite_backed_caches_are_persistent(self, cache, tmp_path):
+        # main offloads persistent caches to the thread pool
+        assert cache.persistent
+        assert not ImageAnalysisCache(None).persistent
+        assert not ImageAnalysisCache(str(tmp_path / "off.db"), enabled=False).persistent
+
+
+class TestAnalyzeImageEndpointCache:
+    """Re-uploads of the same photo skip the model"""
+
+    def test_reencoded_upload_served_from_cache(self, cache, make_auth_headers):
+        calls = []
+
+        class FakeAnalyzer:
+            def analyze(self, image_bytes, symptoms=None):
+                calls.append(image_bytes)
+                return {"success": True, "analysis_text": "Mild rash"}
+
+        image = make_image(3)
+        uploads = [encode(image), encode(image, "JPEG", quality=70)]
+        client = TestClient(app)
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(main, "image_cache", cache), \
+                patch("models.analyzer.get_medical_analyzer", FakeAnalyzer):
+            responses = [
+                client.post(
+                    "/api/analyze-image",
+                    json={"image": base64.b64encode(data).decode()},
+                    headers=make_auth_headers(),
+                )
+                for data in uploads
+            ]
+        assert [r.json()["analysis_text"] for r in responses] == ["Mild rash", "Mild rash"]
+        assert len(calls) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,165 @@
+"""
+Tests for the ImageProcessor preprocessing stage.
+"""
+
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import models.processor as processor_module
+from models.decoding import decode_for_model
+from models.processor import ImageProcessor
+
+
+def random_image(seed=0, shape=(240, 320, 3)):
+    return np.random.default_rng(seed).integers(0, 256, shape, dtype=np.uint8)
+
+
+def reference(processor, image):
+    """The original (float64, per-call CLAHE) pipeline, in RGB."""
+    th, tw = processor.target_size
+    top, left, bottom, right = processor.content_box(*image.shape[:2])
+    canvas = np.zeros((th, tw, 3), dtype=np.uint8)
+    canvas[top:bottom, left:right] = cv2.resize(image, (right - left, bottom - top), interpolation=cv2.INTER_AREA)
+    l, a, b = cv2.split(cv2.cvtColor(canvas, cv2.COLOR_RGB2LAB))
+    l = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(l)
+    enhanced = cv2.cvtColor(cv2.merge((l, a, b)), cv2.COLOR_LAB2RGB)
+    return (enhanced / 255.0 - [0.485, 0.456, 0.406]) / [0.229, 0.224, 0.225]
+
+
+def jpeg_bytes(seed=0, shape=(240, 320, 3)):
+    buffer = BytesIO()
+    Image.fromarray(random_image(seed, shape)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def processor():
+    return ImageProcessor(target_size=(96, 128))
+
+
+@pytest.fixture(scope="module")
+def pool():
+    executor = ProcessPoolExecutor(max_workers=2)
+    yield executor
+    executor.shutdown()
+
+
+class TestImageProcessor:
+    """float32 output, preallocated buffers and batches"""
+
+    def test_matches_reference_in_float32(self, processor):
+        image = random_image()
+        out = processor.preprocess(image)
+        assert out.dtype == np.float32
+        assert out.shape == (96, 128, 3)
+        np.testing.assert_allclose(out, reference(processor, image), atol=1e-4)
+
+    def test_writes_into_given_buffer(self, processor):
+        out = processor.allocate()
+        assert processor.preprocess(random_image(), out=out) is out
+
+    def test_batch_matches_single_images(self, processor):
+        images = [random_image(seed) for seed in range(3)]
+        batch = processor.preprocess_batch(images)
+        assert batch.shape == (3, 96, 128, 3)
+        for image, row in zip(images, batch):
+            np.testing.assert_array_equal(row, processor.preprocess(image))
+
+    def test_accepts_encoded_bytes(self, processor):
+        buffer = BytesIO()
+        Image.fromarray(random_image()).save(buffer, format="PNG")
+        np.testing.assert_array_equal(processor.preprocess(buffer.getvalue()), processor.preprocess(random_image()))
+
+    def test_invalid_bytes_raise_value_error(self, processor):
+        with pytest.raises(ValueError):
+            processor.preprocess(b"not an image")
+
+    def test_threads_share_one_instance(self, processor):
+        images = [random_image(seed) for seed in range(8)]
+        expected = [processor.preprocess(image).copy() for image in images]
+        results = [None] * len(images)
+
+        def work(index):
+            for _ in range(5):
+                results[index] = processor.preprocess(images[index])
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(len(images))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for result, want in zip(results, expected):
+            np.testing.assert_array_equal(result, want)
+
+    def test_quality_flags_dark_images(self, processor):
+        dark = np.full((120, 160, 3), 10, dtype=np.uint8)
+        image_quality = processor.quality(dark)
+        assert image_quality["brightness"] < 0.2
+        assert any("dark" in warning for warning in image_quality["warnings"])
+
+    def test_quality_measures_the_original_pixels(self, processor):
+        rng = np.random.default_rng(0)
+        ramp = np.linspace(225, 255, 160)[None, :, None] + rng.normal(0, 6, (120, 160, 3))
+        bright = np.clip(ramp, 0, 255).astype(np.uint8)
+        image_quality = processor.quality(bright)
+        gray = cv2.cvtColor(bright, cv2.COLOR_RGB2GRAY)
+        assert image_quality["brightness"] == round(gray.mean() / 255, 3)
+        assert "Image looks overexposed" in image_quality["warnings"]
+
+
+class TestPrepareBatch:
+    """Parallel decode, JPEG encoding and quality checks"""
+
+    def test_parallel_matches_serial(self, processor, pool):
+        images = [jpeg_bytes(seed, (200 + 40 * seed, 300, 3)) for seed in range(4)]
+        jpegs, qualities = processor.prepare_batch(images, 160, 85, executor=pool)
+        assert len(jpegs) == len(qualities) == 4
+        for image, jpeg, image_quality in zip(images, jpegs, qualities):
+            decoded = decode_for_model(image, 160)
+            assert image_quality == processor.quality(np.asarray(decoded))
+            assert Image.open(BytesIO(jpeg)).size == decoded.size
+
+    def test_single_image_runs_inline(self, processor):
+        jpegs, qualities = processor.prepare_batch([jpeg_bytes()], 160, 85)
+        assert len(jpegs) == 1 and len(qualities) == 1
+
+    def test_invalid_image_raises_value_error(self, processor, pool):
+        with pytest.raises(ValueError):
+            processor.prepare_batch([jpeg_bytes(), b"not an image"], 160, 85, executor=pool)
+
+    def test_broken_shared_pool_is_replaced(self, processor):
+        broken = processor_module.get_process_pool()
+        try:
+            with pytest.raises(Exception):
+                broken.submit(os._exit, 1).result()
+            jpegs, _ = processor.prepare_batch([jpeg_bytes(0), jpeg_bytes(1)], 160, 85)
+            assert len(jpegs) == 2
+            assert processor_module.get_process_pool() is not broken
+        finally:
+            processor_module.shutdown_process_pool()
+
+    def test_hung_worker_times_out(self, processor, monkeypatch):
+        release = threading.Event()
+        monkeypatch.setattr(processor_module, "_prepare_worker", lambda *args: release.wait())
+        monkeypatch.setattr(processor_module, "PREPARE_TIMEOUT_SECONDS", 0.1)
+        with ThreadPoolExecutor(2) as executor:
+            try:
+                with pytest.raises(TimeoutError):
+                    processor.prepare_batch([jpeg_bytes(), jpeg_bytes()], 160, 85, executor=executor)
+            finally:
+                release.set()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,206 @@
+"""
+Tests for multipart image uploads and image payload decoding.
+"""
+
+import asyncio
+import base64
+import os
+import sys
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from fastapi import UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from analysis_cache import AnalysisCache
+from analysis_jobs import AnalysisJobStore
+from image_cache import ImageAnalysisCache
+from main import app
+
+
+def png_bytes(size=(64, 48)) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", size, "orange").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeAnalyzer:
+    received = []
+
+    def analyze(self, image_bytes, symptoms=None):
+        self.received.append(image_bytes)
+        return {"success": True, "analysis_text": "Looks like a bruise", "symptoms": symptoms}
+
+    def analyze_many(self, images, symptoms=None):
+        self.received.append(list(images))
+        return {
+            "success": True,
+            "analysis_text": "Healing well",
+            "image_quality": [{} for _ in images],
+            "symptoms": symptoms,
+        }
+
+
+@pytest.fixture
+def client():
+    FakeAnalyzer.received = []
+    with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+            patch.object(main, "image_cache", ImageAnalysisCache(None)), \
+            patch.object(main, "analysis_cache", AnalysisCache(None)), \
+            patch("models.analyzer.get_medical_analyzer", FakeAnalyzer):
+        yield TestClient(app)
+
+
+class TestImageUpload:
+    """POST /api/analyze-image/upload"""
+
+    def test_upload_is_analyzed(self, client, make_auth_headers):
+        data = png_bytes()
+        response = client.post(
+            "/api/analyze-image/upload",
+            files={"file": ("bruise.png", data, "image/png")},
+            data={"symptoms": "Bruise on shin"},
+            headers=make_auth_headers(),
+        )
+        assert response.status_code == 200
+        assert response.json()["analysis_text"] == "Looks like a bruise"
+        assert response.json()["symptoms"] == "Bruise on shin"
+        assert FakeAnalyzer.received == [data]
+
+    def test_oversized_upload_is_rejected(self, client, make_auth_headers):
+        with patch.object(main.settings, "IMAGE_UPLOAD_MAX_BYTES", 100):
+            response = client.post(
+                "/api/analyze-image/upload",
+                files={"file": ("big.png", png_bytes((400, 400)), "image/png")},
+                headers=make_auth_headers(),
+            )
+        assert response.status_code == 413
+        assert response.json()["detail"]["code"] == "IMAGE_TOO_LARGE"
+        assert FakeAnalyzer.received == []
+
+    def test_declared_length_is_rejected_before_the_body_is_read(self):
+        sent = []
+
+        async def receive():
+            raise AssertionError("body was read")
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": "/api/analyze-image/upload",
+            "headers": [(b"content-length", str(10 * 1024 * 1024).encode())],
+        }
+        middleware = main.UploadSizeLimitMiddleware(app=None)
+        with patch.object(main.settings, "IMAGE_UPLOAD_MAX_BYTES", 100):
+            asyncio.run(middleware(scope, receive, send))
+        assert sent[0]["status"] == 413
+
+    def test_declared_length_rejection_carries_cors_headers(self, client, make_auth_headers):
+        origin = main.settings.allowed_origins[0]
+        with patch.object(main.settings, "IMAGE_UPLOAD_MAX_BYTES", 100):
+            response = client.post(
+                "/api/analyze-image/upload",
+                files={"file": ("big.png", b"x" * (main.UPLOAD_FORM_OVERHEAD_BYTES + 1024), "image/png")},
+                headers={**make_auth_headers(), "Origin": origin},
+            )
+        assert response.status_code == 413
+        assert response.headers["access-control-allow-origin"] == origin
+        assert FakeAnalyzer.received == []
+
+    def test_undeclared_size_read_stops_at_the_limit(self):
+        spooled = BytesIO(b"x" * 1000)
+        upload = UploadFile(spooled)
+        with patch.object(main.settings, "IMAGE_UPLOAD_MAX_BYTES", 100), \
+                patch.object(main, "UPLOAD_READ_CHUNK_BYTES", 10):
+            with pytest.raises(main.HTTPException) as exc:
+                asyncio.run(main._read_image_upload(upload))
+        assert exc.value.status_code == 413
+        assert spooled.tell() <= 110
+
+    def test_non_image_is_rejected(self, client, make_auth_headers):
+        response = client.post(
+            "/api/analyze-image/upload",
+            files={"file": ("notes.txt", b"hello", "text/plain")},
+            headers=make_auth_headers(),
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"]["code"] == "INVALID_FILE_TYPE"
+
+    def test_requires_auth(self, client):
+        response = client.post("/api/analyze-image/upload", files={"file": ("a.png", png_bytes(), "image/png")})
+        assert response.status_code in (401, 403)
+
+
+class TestImageBatchUpload:
+    """POST /api/analyze-images"""
+
+    def test_images_are_analyzed_in_one_call(self, client, make_auth_headers):
+        first, second = png_bytes(), png_bytes((80, 60))
+        response = client.post(
+            "/api/analyze-images",
+            files=[("files", ("day1.png", first, "image/png")), ("files", ("day3.png", second, "image/png"))],
+            data={"symptoms": "Cut on knee, healing"},
+            headers=make_auth_headers(),
+        )
+        assert response.status_code == 200
+        assert response.json()["analysis_text"] == "Healing well"
+        assert response.json()["symptoms"] == "Cut on knee, healing"
+        assert FakeAnalyzer.received == [[first, second]]
+
+    def test_too_many_images_are_rejected(self, client, make_auth_headers):
+        with patch.object(main.settings, "IMAGE_BATCH_MAX_IMAGES", 1):
+            response = client.post(
+                "/api/analyze-images",
+                files=[("files", ("a.png", png_bytes(), "image/png")), ("files", ("b.png", png_bytes(), "image/png"))],
+                headers=make_auth_headers(),
+            )
+        assert response.status_code == 400
+        assert response.json()["detail"]["code"] == "INVALID_IMAGE_COUNT"
+        assert FakeAnalyzer.received == []
+
+    def test_undecodable_image_is_rejected(self, client, make_auth_headers):
+        response = client.post(
+            "/api/analyze-images",
+            files=[("files", ("a.png", png_bytes(), "image/png")), ("files", ("b.png", b"garbage", "image/png"))],
+            headers=make_auth_headers(),
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"]["code"] == "INVALID_IMAGE_DATA"
+
+
+    def test_app_shutdown_stops_the_process_pool(self, tmp_path, stub_postgrest):
+        store = AnalysisJobStore(str(tmp_path / "analysis_jobs.db"), workers=1)
+        with patch.object(main, "analysis_jobs", store), \
+                patch("models.processor.shutdown_process_pool") as shutdown:
+            with TestClient(app):
+                shutdown.assert_not_called()
+        shutdown.assert_called_once()
+
+
+class TestDecodeImageData:
+    """Base64 payloads with and without a data URI prefix"""
+
+    def test_data_uri_prefix_is_stripped(self):
+        data = png_bytes()
+        encoded = base64.b64encode(data).decode()
+        assert main._decode_image_data(f"data:image/png;base64,{encoded}") == data
+        assert main._decode_image_data(encoded) == data
+
+    def test_oversized_base64_is_rejected(self):
+        with patch.object(main.settings, "IMAGE_UPLOAD_MAX_BYTES", 10):
+            with pytest.raises(main.HTTPException) as exc:
+                main._decode_image_data(base64.b64encode(b"x" * 100).decode())
+        assert exc.value.status_code == 413
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,66 @@
+"""
+Tests for the Aho-Corasick keyword automaton.
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from keyword_automaton import KeywordAutomaton, VocabularyMatcher, load_vocabulary
+
+
+def keywords(matches):
+    return [m.keyword for m in matches]
+
+
+class TestKeywordAutomaton:
+    """One pass finds every keyword, overlapping or nested"""
+
+    def test_finds_overlapping_and_nested_keywords(self):
+        automaton = KeywordAutomaton({"he": 1, "she": 2, "his": 3, "hers": 4})
+        matches = automaton.find_all("ushers", whole_words=False)
+        assert sorted(keywords(matches)) == ["he", "hers", "she"]
+        assert [(m.start, m.end) for m in matches if m.keyword == "hers"] == [(2, 6)]
+
+    def test_case_and_apostrophes_are_folded(self):
+        automaton = KeywordAutomaton({"Can't Breathe": "emergency"})
+        [match] = automaton.find_all("I CAN’T BREATHE")
+        assert match.keyword == "can't breathe"
+        assert match.payload == "emergency"
+
+    def test_whole_words_only_by_default(self):
+        automaton = KeywordAutomaton({"fever": None})
+        assert automaton.find_all("feverish") == []
+        assert keywords(automaton.find_all("feverish", whole_words=False)) == ["fever"]
+        assert keywords(automaton.find_all("fever, cough")) == ["fever"]
+
+    def test_matches_agree_with_substring_search(self):
+        terms = ["pain", "chest pain", "ache", "headache", "he", "a"]
+        automaton = KeywordAutomaton((term, None) for term in terms)
+        text = "chest pain and a headache"
+        found = {(m.start, m.keyword) for m in automaton.find_all(text, whole_words=False)}
+        expected = {
+            (i, term) for term in terms for i in range(len(text)) if text.startswith(term, i)
+        }
+        assert found == expected
+
+    def test_vocabulary_matcher_reports_each_list_in_order(self):
+        matcher = VocabularyMatcher({"symptoms": ["rash", "pain", "cut"], "conditions": ["eczema", "infection"]})
+        found = matcher.match("Infection and pain near a rash; more pain later")
+        assert found == {"symptoms": ["rash", "pain"], "conditions": ["infection"]}
+
+    def test_vocabulary_matcher_substring_mode(self):
+        matcher = VocabularyMatcher({"levels": ["urgent", "mild"]}, whole_words=False)
+        assert matcher.match("Urgently") == {"levels": ["urgent"]}
+
+    def test_triage_vocabulary_loads(self):
+        rules = load_vocabulary("triage_rules.json")
+        assert "chest pain" in rules["levels"]["emergency"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,111 @@
+"""
+Tests for the local rule-based triage and its use in /api/analyze.
+"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from analysis_cache import AnalysisCache
+from analysis_jobs import AnalysisJobStore
+from local_triage import local_triage
+from main import app
+
+
+class TestLocalTriage:
+    """Verdicts from symptom text and profile"""
+
+    def test_emergency_terms(self):
+        verdict = local_triage.assess("Sudden chest pain and I can't breathe")
+        assert verdict["urgency"] == "emergency"
+        assert verdict["confidence"] >= 0.9
+        assert {"chest pain", "can't breathe"} <= set(verdict["matched"])
+        assert "emergency" in verdict["guidance"]
+
+    def test_negated_terms_are_ignored(self):
+        verdict = local_triage.assess("No chest pain, just a runny nose")
+        assert verdict["urgency"] == "low"
+        assert "chest pain" not in verdict["matched"]
+
+    def test_minor_complaint_is_confident(self):
+        verdict = local_triage.assess("Runny nose and sneezing since yesterday")
+        assert verdict["urgency"] == "low"
+        assert verdict["confidence"] >= 0.9
+
+    def test_longer_term_wins_and_unknown_words_lower_confidence(self):
+        assert local_triage.assess("mild headache")["matched"] == ["mild headache"]
+        assert local_triage.assess("runny nose, and my elbow looks odd")["confidence"] < 0.9
+
+    def test_chronic_condition_escalates(self):
+        assert local_triage.assess("wheezing tonight")["urgency"] == "medium"
+        verdict = local_triage.assess("wheezing tonight", {"chronic_conditions": "Asthma since childhood"})
+        assert verdict["urgency"] == "emergency"
+        # Minor for most people is left to the model for someone with a condition
+        assert local_triage.assess("runny nose", {"chronic_conditions": "type 2 diabetes"})["confidence"] < 0.9
+
+    def test_allergies_raise_reaction_signs(self):
+        assert local_triage.assess("hives on my arms", {"allergies": "None"})["urgency"] == "unknown"
+        assert local_triage.assess("hives on my arms", {"allergies": "Peanuts"})["urgency"] == "high"
+
+
+@pytest.fixture
+def client(tmp_path):
+    calls = []
+
+    def fake_triage(symptoms):
+        calls.append(symptoms)
+        return f"Triage for: {symptoms}"
+
+    store = AnalysisJobStore(str(tmp_path / "analysis_jobs.db"), workers=1)
+    with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+            patch.object(main, "analysis_cache", AnalysisCache(None)), \
+            patch.object(main, "analysis_jobs", store), \
+            patch.object(main, "run_text_triage", fake_triage):
+        yield TestClient(app), calls, store
+
+
+class TestAnalyzeEndpointTriage:
+    """/api/analyze answers confident verdicts without the model"""
+
+    def test_emergency_skips_model_even_without_key(self, client, make_auth_headers):
+        test_client, calls, _ = client
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "", "GOOGLE_API_KEY": ""}):
+            response = test_client.post("/api/analyze", json={"symptoms": "crushing chest pain"}, headers=make_auth_headers())
+        assert response.status_code == 200
+        body = response.json()
+        assert body["triage"]["urgency"] == "emergency"
+        assert body["analysis"] == body["triage"]["guidance"]
+        assert calls == []
+
+    def test_minor_complaint_defers_model(self, client, make_auth_headers):
+        test_client, calls, store = client
+        headers = make_auth_headers("user-minor")
+        response = test_client.post("/api/analyze", json={"symptoms": "runny nose and sneezing"}, headers=headers)
+        body = response.json()
+        assert body["triage"]["urgency"] == "low"
+        assert calls == []
+        job = store.get("user-minor", body["analysis_job_id"])
+        assert job["status"] == "queued"
+
+    def test_uncertain_symptoms_go_to_model(self, client, make_auth_headers):
+        test_client, calls, _ = client
+        response = test_client.post("/api/analyze", json={"symptoms": "Fever and headache"}, headers=make_auth_headers())
+        assert response.json() == {"analysis": "Triage for: Fever and headache"}
+        assert calls == ["Fever and headache"]
+
+    def test_disabled(self, client, make_auth_headers):
+        test_client, calls, _ = client
+        with patch.object(main.settings, "LOCAL_TRIAGE_ENABLED", False):
+            response = test_client.post("/api/analyze", json={"symptoms": "chest pain"}, headers=make_auth_headers())
+        assert response.json() == {"analysis": "Triage for: chest pain"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,62 @@
+"""
+Tests for the shared Gemini client and per-thread agents.
+"""
+
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+import pytest
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models import clients
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    clients.reset_clients()
+    with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key", "GOOGLE_API_KEY": ""}):
+        yield
+    clients.reset_clients()
+
+
+class TestSharedClients:
+    """Gemini clients and agents are built once and reused"""
+
+    def test_client_is_created_once(self):
+        assert clients.get_genai_client() is clients.get_genai_client()
+
+    def test_agent_is_reused_within_a_thread(self):
+        first = clients.get_agent("triage", "gemini-2.0-flash-exp", markdown=True)
+        assert clients.get_agent("triage", "gemini-2.0-flash-exp", markdown=True) is first
+        assert first.model.client is clients.get_genai_client()
+
+    def test_threads_get_own_agents_sharing_one_client(self):
+        main_agent = clients.get_agent("triage", "gemini-2.0-flash-exp")
+        other = {}
+
+        def build():
+            other["agent"] = clients.get_agent("triage", "gemini-2.0-flash-exp")
+
+        thread = threading.Thread(target=build)
+        thread.start()
+        thread.join()
+        assert other["agent"] is not main_agent
+        assert other["agent"].model.client is main_agent.model.client
+
+    def test_key_change_rebuilds_client(self):
+        old = clients.get_genai_client()
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "rotated-key"}):
+            assert clients.get_genai_client() is not old
+
+    def test_missing_key_raises(self):
+        with patch.dict(os.environ, {"GEMINI_API_KEY": ""}):
+            with pytest.raises(ValueError):
+                clients.get_genai_client()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
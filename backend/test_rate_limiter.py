@@ -0,0 +1,125 @@
+"""
+Tests for the sliding-window rate limiter and the endpoints it protects.
+"""
+
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rate_limiter
+from rate_limiter import SlidingWindowLimiter
+from main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_limiter(request, tmp_path):
+    """Build limiters backed by either the in-memory rings or SQLite."""
+    db_path = str(tmp_path / "limits.db") if request.param == "sqlite" else None
+
+    def _make(limit, window):
+        return SlidingWindowLimiter("test", limit, window, db_path)
+
+    return _make
+
+
+class TestSlidingWindowLimiter:
+    """Unit tests for SlidingWindowLimiter"""
+
+    def test_allows_up_to_limit(self, make_limiter):
+        limiter = make_limiter(3, 60)
+        for _ in range(3):
+            assert limiter.hit("a") == 0.0
+        assert limiter.hit("a") > 0
+
+    def test_keys_are_independent(self, make_limiter):
+        limiter = make_limiter(1, 60)
+        assert limiter.hit("a") == 0.0
+        assert limiter.hit("b") == 0.0
+        assert limiter.hit("a") > 0
+
+    def test_record_then_retry_after(self, make_limiter):
+        limiter = make_limiter(2, 60)
+        limiter.record("a")
+        assert limiter.retry_after("a") == 0.0
+        limiter.record("a")
+        assert 0 < limiter.retry_after("a") <= 60
+
+    def test_window_expiry(self, make_limiter):
+        limiter = make_limiter(2, 10)
+        start = time.time()
+        with patch("rate_limiter.time.time", return_value=start):
+            limiter.record("a")
+            limiter.record("a")
+            assert limiter.retry_after("a") > 0
+        with patch("rate_limiter.time.time", return_value=start + 10.5):
+            assert limiter.retry_after("a") == 0.0
+
+    def test_reset(self, make_limiter):
+        limiter = make_limiter(1, 60)
+        limiter.record("a")
+        limiter.reset("a")
+        assert limiter.retry_after("a") == 0.0
+
+    def test_invalid_limit(self):
+        with pytest.raises(ValueError):
+            SlidingWindowLimiter("bad", 0, 60)
+
+
+class TestLoginRateLimit:
+    """Login is rejected once an email exceeds its failure budget"""
+
+    @pytest.fixture(autouse=True)
+    def isolated_limiters(self):
+        email_limiter = SlidingWindowLimiter("login_email", 3, 60)
+        ip_limiter = SlidingWindowLimiter("login_ip", 100, 60)
+        with patch.object(rate_limiter, "login_email_limiter", email_limiter), \
+             patch.object(rate_limiter, "login_ip_limiter", ip_limiter):
+            yield
+
+    def test_login_locked_after_failures(self):
+        email = f"bruteforce_{os.urandom(4).hex()}@example.com"
+        for _ in range(3):
+            response = client.post("/api/auth/login", json={"email": email, "password": "wrong-password"})
+            assert response.status_code == 401
+
+        with patch("auth_routes.verify_password_or_dummy") as verify:
+            response = client.post("/api/auth/login", json={"email": email, "password": "wrong-password"})
+            verify.assert_not_called()
+
+        assert response.status_code == 429
+        assert response.json()["detail"]["code"] == "RATE_LIMITED"
+        assert int(response.headers["Retry-After"]) >= 1
+
+
+class TestPublicEndpointRateLimit:
+    """Unauthenticated AI endpoints are limited per client IP"""
+
+    def test_public_image_analysis_limited(self):
+        limiter = SlidingWindowLimiter("public_analysis", 1, 60)
+        limiter.hit("testclient")
+        with patch.object(rate_limiter, "public_analysis_limiter", limiter):
+            response = client.post("/api/analyze-image-public", json={"image": "abc"})
+        assert response.status_code == 429
+
+    def test_public_transcription_limited(self):
+        limiter = SlidingWindowLimiter("public_transcription", 1, 60)
+        limiter.hit("testclient")
+        with patch.object(rate_limiter, "public_transcription_limiter", limiter):
+            response = client.post(
+                "/api/transcribe-public",
+                files={"file": ("clip.wav", b"RIFF", "audio/wav")},
+            )
+        assert response.status_code == 429
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,138 @@
+"""
+Tests for single-flight coalescing of identical analyses.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from analysis_cache import AnalysisCache
+from main import app
+from ai_limiter import AIBusyError
+from single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Concurrent calls with one key share a single upstream call"""
+
+    def test_concurrent_calls_share_result(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def scenario():
+            return await asyncio.gather(*(flights.do("k", work) for _ in range(5)))
+
+        assert asyncio.run(scenario()) == ["result"] * 5
+        assert len(calls) == 1
+        assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": 4, "retried": 0}
+
+    def test_exception_reaches_every_caller(self):
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        async def scenario():
+            return await asyncio.gather(flights.do("k", work), flights.do("k", work), return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    def test_follower_retries_when_leader_is_rejected(self):
+        flights = SingleFlight()
+
+        def work_for(busy):
+            async def work():
+                await asyncio.sleep(0.02)
+                if busy:
+                    raise AIBusyError(429, "AI_TENANT_BUSY", "busy", 1.0)
+                return "result"
+            return work
+
+        async def scenario():
+            leader = asyncio.create_task(flights.do("k", work_for(True), retry_on=(AIBusyError,)))
+            await asyncio.sleep(0)
+            follower = flights.do("k", work_for(False), retry_on=(AIBusyError,))
+            return await asyncio.gather(leader, follower, return_exceptions=True)
+
+        leader, follower = asyncio.run(scenario())
+        assert isinstance(leader, AIBusyError)
+        assert follower == "result"
+        assert flights.stats()["retried"] == 1
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        flights = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def scenario():
+            leader = asyncio.create_task(flights.do("k", work))
+            follower = asyncio.create_task(flights.do("k", work))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        assert asyncio.run(scenario()) == "done"
+
+    def test_sequential_calls_run_again(self):
+        flights = SingleFlight()
+
+        async def work():
+            return "x"
+
+        async def scenario():
+            await flights.do("k", work)
+            await flights.do("k", work)
+
+        asyncio.run(scenario())
+        assert flights.stats()["started"] == 2
+
+
+class TestAnalyzeCoalescing:
+    """Identical concurrent /api/analyze requests make one model call"""
+
+    def test_duplicate_requests_share_one_call(self, tmp_path, make_auth_headers):
+        calls = []
+
+        def slow_triage(symptoms):
+            calls.append(symptoms)
+            time.sleep(0.2)
+            return f"Triage for: {symptoms}"
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(
+                    client.post("/api/analyze", json={"symptoms": text}, headers=make_auth_headers())
+                    for text in ("Sore throat", "sore throat!", "Sore Throat")
+                ))
+
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "test-key"}), \
+                patch.object(main, "analysis_cache", AnalysisCache(None)), \
+                patch.object(main, "analysis_flights", SingleFlight()), \
+                patch.object(main, "run_text_triage", slow_triage):
+            responses = asyncio.run(scenario())
+        assert [r.status_code for r in responses] == [200, 200, 200]
+        assert len({r.json()["analysis"] for r in responses}) == 1
+        assert len(calls) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,131 @@
+"""
+Tests for the Bloom-filtered user lookup cache.
+"""
+
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+# Add backend directory to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from auth_utils import hash_password, verify_password_or_dummy
+from user_cache import BloomFilter, UserLookupCache
+
+
+USERS = {
+    "alice@example.com": {"id": "1", "email": "alice@example.com", "password_hash": "x"},
+    "bob@example.com": {"id": "2", "email": "bob@example.com", "password_hash": "y"},
+}
+
+
+@pytest.fixture
+def fake_db():
+    """Stand-in for the users table with call counters."""
+    rows = [(i + 1, email) for i, email in enumerate(USERS)]
+    calls = {"by_email": 0, "since": 0}
+
+    def get_user_by_email(email):
+        calls["by_email"] += 1
+        return USERS.get(email)
+
+    def get_user_emails_since(last_rowid=0):
+        calls["since"] += 1
+        return [row for row in rows if row[0] > last_rowid]
+
+    with patch("user_cache.get_user_by_email", side_effect=get_user_by_email), \
+         patch("user_cache.get_user_emails_since", side_effect=get_user_emails_since):
+        yield rows, calls
+
+
+class TestBloomFilter:
+    """Unit tests for BloomFilter"""
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=500)
+        emails = [f"user{i}@example.com" for i in range(500)]
+        for email in emails:
+            bloom.add(email)
+        assert all(email in bloom for email in emails)
+
+    def test_false_positive_rate_is_low(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f"user{i}@example.com")
+        false_positives = sum(f"other{i}@example.com" in bloom for i in range(5000))
+        assert false_positives < 150
+
+
+class TestUserLookupCache:
+    """Unit tests for UserLookupCache"""
+
+    def test_unknown_email_skips_query(self, fake_db):
+        _, calls = fake_db
+        cache = UserLookupCache(refresh_seconds=60)
+        assert cache.lookup("nobody@example.com") is None
+        assert calls["by_email"] == 0
+
+    def test_hit_is_cached(self, fake_db):
+        _, calls = fake_db
+        cache = UserLookupCache(refresh_seconds=60)
+        assert cache.lookup("alice@example.com")["id"] == "1"
+        assert cache.lookup("alice@example.com")["id"] == "1"
+        assert calls["by_email"] == 1
+
+    def test_expired_entry_is_refetched(self, fake_db):
+        _, calls = fake_db
+        cache = UserLookupCache(ttl_seconds=0, refresh_seconds=60)
+        cache.lookup("bob@example.com")
+        cache.lookup("bob@example.com")
+        assert calls["by_email"] == 2
+
+    def test_user_created_elsewhere_is_found_after_refresh(self, fake_db):
+        rows, _ = fake_db
+        cache = UserLookupCache(refresh_seconds=0)
+        assert cache.lookup("carol@example.com") is None
+
+        rows.append((3, "carol@example.com"))
+        USERS["carol@example.com"] = {"id": "3", "email": "carol@example.com", "password_hash": "z"}
+        try:
+            assert cache.lookup("carol@example.com")["id"] == "3"
+        finally:
+            del USERS["carol@example.com"]
+
+    def test_add_makes_user_visible(self, fake_db):
+        rows, _ = fake_db
+        cache = UserLookupCache(refresh_seconds=60)
+        cache.lookup("alice@example.com")
+
+        rows.append((3, "dave@example.com"))
+        USERS["dave@example.com"] = {"id": "4", "email": "dave@example.com", "password_hash": "w"}
+        try:
+            cache.add("dave@example.com")
+            assert cache.lookup("dave@example.com")["id"] == "4"
+        finally:
+            del USERS["dave@example.com"]
+
+    def test_added_email_is_not_counted_again_by_refresh(self, fake_db):
+        rows, _ = fake_db
+        cache = UserLookupCache(refresh_seconds=0)
+        cache.lookup("alice@example.com")
+        assert cache._bloom.count == 2
+
+        rows.append((3, "erin@example.com"))
+        cache.add("erin@example.com")
+        cache.lookup("nobody@example.com")
+        assert cache._bloom.count == 3
+        assert cache._last_rowid == 3
+
+
+def test_verify_password_or_dummy():
+    """Missing hashes still run bcrypt and always fail"""
+    password_hash = hash_password("correct-password")
+    assert verify_password_or_dummy("correct-password", password_hash) is True
+    assert verify_password_or_dummy("wrong-password", password_hash) is False
+    assert verify_password_or_dummy("correct-password", None) is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,154 @@
+"""
+Cached user lookups for the auth routes.
+
+A Bloom filter of every known email answers "definitely not registered"
+without touching SQLite, and found users are kept in a short-lived LRU so
+repeated logins skip the query too. The filter is topped up incrementally
+from the users table (by rowid) so accounts created by other workers show
+up within USER_BLOOM_REFRESH_SECONDS.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+try:
+    from .config import settings
+    from .database import get_user_by_email, get_user_emails_since
+except ImportError:
+    from config import settings
+    from database import get_user_by_email, get_user_emails_since
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using double hashing."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class UserLookupCache:
+    """Bloom-filtered, TTL-bounded cache in front of `get_user_by_email`."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = 30.0,
+        max_entries: int = 10000,
+        refresh_seconds: float = 1.0,
+    ):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._bloom: Optional[BloomFilter] = None
+        self._last_rowid = 0
+        self._last_sync = 0.0
+        # Emails already put in the filter by `add`, skipped when the
+        # incremental sync reads their rows back
+        self._added: set = set()
+
+    def _rebuild_bloom(self) -> None:
+        rows = get_user_emails_since(0)
+        bloom = BloomFilter(capacity=max(1000, 2 * len(rows)))
+        for _, email in rows:
+            bloom.add(email)
+        self._bloom = bloom
+        self._added.clear()
+        self._last_rowid = rows[-1][0] if rows else 0
+        self._last_sync = time.monotonic()
+        logger.info(f"User Bloom filter built with {len(rows)} emails")
+
+    def _sync_bloom(self) -> None:
+        """Add emails registered since the last sync (possibly by another worker)."""
+        if self._bloom is None:
+            self._rebuild_bloom()
+            return
+        rows = get_user_emails_since(self._last_rowid)
+        self._last_sync = time.monotonic()
+        if not rows:
+            return
+        new_emails = [email for _, email in rows if email not in self._added]
+        self._added.difference_update(email for _, email in rows)
+        if self._bloom.count + len(new_emails) > self._bloom.capacity:
+            self._rebuild_bloom()
+            return
+        for email in new_emails:
+            self._bloom.add(email)
+        self._last_rowid = rows[-1][0]
+
+    def _might_exist(self, email: str) -> bool:
+        if self._bloom is None:
+            self._rebuild_bloom()
+        if email in self._bloom:
+            return True
+        if time.monotonic() - self._last_sync >= self.refresh_seconds:
+            self._sync_bloom()
+            return email in self._bloom
+        return False
+
+    def lookup(self, email: str) -> Optional[dict]:
+        """Return the user row for `email`, or None if no such user exists."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._users.get(email)
+            if cached is not None:
+                if cached[0] > now:
+                    self._users.move_to_end(email)
+                    return cached[1]
+                del self._users[email]
+            if not self._might_exist(email):
+                return None
+
+        user = get_user_by_email(email)
+        if user is not None:
+            with self._lock:
+                self._users[email] = (now + self.ttl, user)
+                self._users.move_to_end(email)
+                while len(self._users) > self.max_entries:
+                    self._users.popitem(last=False)
+        return user
+
+    def add(self, email: str) -> None:
+        """Record a newly created account so it is visible to `lookup` at once."""
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(email)
+                self._added.add(email)
+                if self._bloom.count > self._bloom.capacity:
+                    # Rebuild at a larger size on the next lookup
+                    self._bloom = None
+            self._users.pop(email, None)
+
+
+user_lookup = UserLookupCache(
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    refresh_seconds=settings.USER_BLOOM_REFRESH_SECONDS,
+)